@@ -0,0 +1,145 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import json
+import time
+import threading
+import collections
+
+from ztp.ZTPLib import getCfg, getTimestamp
+
+class ActivityHistory:
+    '''!
+    \brief This class is used to keep the last activities of ZTP service along with the time
+           spent in each of them.
+
+    Activities are kept in memory in a ring of activity-history-size entries which is saved in a
+    compact form to ztp-activity-history each time a new activity starts. Start of an activity
+    is recorded using the monotonic clock so that durations are not affected by system time changes
+    and can be computed by other processes. Activities are recorded only after start() has been called.
+
+    Examples of class usage:
+
+    \code
+    activityHistory.start()
+    activityHistory.record('Waiting for system online')
+    \endcode
+    '''
+
+    def __init__(self, history_file=None):
+        '''!
+        Constructor for the class.
+
+        @param history_file (str, optional) File used to save the history. ztp-activity-history is used if not specified.
+        '''
+        ## File used to save the history
+        self.__history_file = history_file
+        ## Activities: [timestamp, monotonic start time, duration, message], None if not started
+        self.__ring = None
+        ## Protects the ring, activities are also reported by the status socket threads
+        self.__lock = threading.Lock()
+
+    def start(self):
+        '''!
+        Start recording activities. Activities recorded by a previous instance of the service are discarded.
+        '''
+        if self.__history_file is None:
+            self.__history_file = getCfg('ztp-activity-history')
+        with self.__lock:
+            self.__ring = collections.deque(maxlen=max(1, getCfg('activity-history-size')))
+            self.__save()
+
+    def stop(self):
+        '''!
+        Stop recording activities, when ZTP service exits. The duration of the current activity is set.
+        '''
+        with self.__lock:
+            if self.__ring is None:
+                return
+            if len(self.__ring) != 0 and self.__ring[-1][2] is None:
+                self.__ring[-1][2] = round(time.monotonic() - self.__ring[-1][1], 3)
+                self.__save()
+            self.__ring = None
+
+    def last(self):
+        '''!
+        Return message of the current activity, None if unknown.
+        '''
+        with self.__lock:
+            if self.__ring is None or len(self.__ring) == 0:
+                return None
+            return self.__ring[-1][3]
+
+    def record(self, message):
+        '''!
+        Record start of an activity. The duration of the current activity is set. Nothing is
+        recorded if the activity is the current activity.
+
+        @param message (str) Activity description
+        '''
+        message = message.strip()
+        with self.__lock:
+            if self.__ring is None:
+                return
+            if len(self.__ring) != 0 and self.__ring[-1][3] == message:
+                return
+            now = time.monotonic()
+            if len(self.__ring) != 0:
+                self.__ring[-1][2] = round(now - self.__ring[-1][1], 3)
+            self.__ring.append([getTimestamp(), round(now, 3), None, message])
+            self.__save()
+
+    def __save(self):
+        '''!
+        Save the history. The file is replaced atomically so that readers never see a partial history.
+        '''
+        tmp_file = self.__history_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as fh:
+                json.dump(list(self.__ring), fh, separators=(',', ':'))
+            os.replace(tmp_file, self.__history_file)
+        except (IOError, OSError):
+            pass
+
+def readActivityHistory(history_file):
+    '''!
+    Read activities saved by ZTP service.
+
+    @param history_file (str) File used to save the history
+
+    @return List of activities, oldest first. Each activity is a dict with timestamp, message and duration.
+            Duration of the current activity is computed up to now and it is marked as in-progress.
+    '''
+    try:
+        with open(history_file) as fh:
+            entries = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return []
+    activities = []
+    now = time.monotonic()
+    for e in entries if isinstance(entries, list) else []:
+        if not isinstance(e, list) or len(e) != 4:
+            continue
+        activity = dict({'timestamp': e[0], 'message': e[3], 'duration': e[2], 'in-progress': e[2] is None})
+        if e[2] is None and isinstance(e[1], (int, float)):
+            activity['duration'] = round(max(0, now - e[1]), 3)
+        activities.append(activity)
+    return activities
+
+## Global instance of the activity history of ZTP service
+activityHistory = ActivityHistory()
@@ -20,10 +20,15 @@ import os
 import shlex
 import stat
 import time
+import signal
+import threading
 
 from ztp.Logger import logger
 from ztp.DecodeSysEeprom import sysEeprom
 from ztp.ZTPLib import runCommand, get_sonic_version, getCfg
+from ztp.Tracer import tracer
+from ztp.StatusServer import statusServer
+from ztp.SessionHistory import sessionHistory
 
 class Downloader:
 
@@ -131,6 +136,47 @@ class Downloader:
         if self.__sonic_version is not None:
             self.__http_headers.append('SONiC-VERSION: ' + self.__sonic_version)
 
+        ## Set when the download in progress has to be abandoned
+        self.__cancelled = threading.Event()
+        ## PID of the curl process in progress
+        self.__pid = None
+
+    def cancel(self):
+        '''!
+        Cancel the download in progress, if any. It can be called from another thread.
+        The curl process is terminated and getUrl() returns with an error.
+        '''
+        self.__cancelled.set()
+        self.__terminate(self.__pid)
+
+    def isCancelled(self):
+        '''!
+        Check if the download has been cancelled using cancel().
+        '''
+        return self.__cancelled.is_set()
+
+    def __started(self, pid):
+        '''!
+        Record PID of the curl process which has just been started.
+
+        @param pid (int) PID of the curl process
+        '''
+        self.__pid = pid
+        if self.__cancelled.is_set():
+            self.__terminate(pid)
+
+    def __terminate(self, pid):
+        '''!
+        Terminate the curl process.
+
+        @param pid (int) PID of the curl process
+        '''
+        if pid is not None:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
     def getUrl(self, url=None, dst_file=None, incl_http_headers=None, is_secure=True, timeout=None, retry=None, curl_args=None, encrypted=None, verbose=False):
         '''!
         Fetch a file using a given url. The content retrieved from the server is stored into a file.
@@ -169,7 +215,25 @@ class Downloader:
             https://ec.haxx.se/usingcurl-returns.html \n
             Note that we return error 20 in case of an unknown error.
         '''
-
+        _url = url if url is not None else self.__url
+        statusServer.downloadStarted(_url, dst_file if dst_file is not None else self.__dst_file)
+        rc = -1
+        fname = None
+        _start = time.monotonic()
+        try:
+            with tracer.span('download', {'url': _url}) as span:
+                (rc, fname) = self.__getUrl(url, dst_file, incl_http_headers, is_secure, timeout, retry, curl_args, encrypted, verbose)
+                span.set('exit-code', rc)
+                return (rc, fname)
+        finally:
+            statusServer.downloadFinished(_url, rc)
+            size = os.path.getsize(fname) if rc == 0 and fname is not None and os.path.isfile(fname) else 0
+            sessionHistory.download(_url, rc, time.monotonic() - _start, size)
+
+    def __getUrl(self, url, dst_file, incl_http_headers, is_secure, timeout, retry, curl_args, encrypted, verbose):
+        '''!
+        Fetch a file using a given url, see getUrl().
+        '''
         # Use arguments provided in the constructor
         if url is None and self.__url is not None:
             url = self.__url
@@ -226,17 +290,26 @@ class Downloader:
                 return (1, None)
         cmd += ['--', url]
         if verbose is True:
-            logger.debug('%s' % (cmd))
+            logger.debug('%s', cmd)
 
         # Execute curl command
         _retries = retry
         while True:
             _start_time = time.time()
-            (rc, cmd_stdout, cmd_stderr) = runCommand(cmd)
+            if self.__cancelled.is_set():
+                rc = -1
+            else:
+                (rc, cmd_stdout, cmd_stderr) = runCommand(cmd, on_start=self.__started)
+                self.__pid = None
             _current_time = time.time()
+            if self.__cancelled.is_set():
+                logger.debug('Download of %s cancelled.', url)
+                if os.path.isfile(dst_file):
+                    os.remove(dst_file)
+                return (20, None)
             if rc !=0 and rc in [5, 6, 7] and _retries != 0 and (_current_time - _start_time) < timeout:
-                logger.debug("!Error (%d) encountered while processing the command : %s" % (rc, cmd))
-                time.sleep(timeout - (_current_time - _start_time))
+                logger.debug("!Error (%d) encountered while processing the command : %s", rc, cmd)
+                self.__cancelled.wait(timeout - (_current_time - _start_time))
                 _retries = _retries -1
                 continue
 
@@ -0,0 +1,284 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import time
+import hashlib
+import select
+import signal
+import threading
+
+from ztp.Logger import logger
+from ztp.Inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
+from ztp.LinkMonitor import LinkMonitor
+
+## Event reported when a network interface becomes operationally up
+EVENT_LINK_UP = 'link-up'
+## Event reported when a signal has been received
+EVENT_SIGNAL = 'signal'
+
+class EventWait:
+    '''!
+    \brief This class is used by ZTP service to sleep till a deadline or till an event which
+           may change the course of provisioning occurs.
+
+    Below events can be registered:
+
+      - A file is written, created or moved in place with contents different from the ones it had
+        when it was last reported or when clear() was called. The event is the file name.
+      - A network interface becomes operationally up (EVENT_LINK_UP)
+      - A signal handled by a Python signal handler is received (EVENT_SIGNAL). Only
+        available if registered from the main thread.
+      - Any event name passed to notify(), from any thread
+
+    Events which occur while nobody is waiting are reported by the next call to wait().
+
+    Examples of class usage:
+
+    \code
+    eventWait.watchFile('/var/run/ztp/dhcp_67-ztp_data_url')
+    eventWait.watchLinks()
+    events = eventWait.wait(10)
+    \endcode
+    '''
+
+    def __init__(self):
+        '''!
+        Constructor for the class.
+        '''
+        ## inotify instance used to watch files, None if not created
+        self.__inotify = None
+        ## Watched files: watch descriptor -> file name -> event name
+        self.__files = dict()
+        ## Digest of the contents of watched files, None if the file does not exist
+        self.__digests = dict()
+        ## Link monitor, None if link events are not watched
+        self.__linkMonitor = None
+        ## Pipe used to wake up wait(), (read end, write end)
+        self.__pipe = None
+        ## Events posted by notify()
+        self.__notified = []
+        ## Flag to indicate that signals wake up wait()
+        self.__signals = False
+        ## Protects pipe creation and notified events
+        self.__lock = threading.Lock()
+
+    def __wakeupPipe(self):
+        '''!
+        Create the pipe used to wake up wait() if it does not exist.
+        '''
+        with self.__lock:
+            if self.__pipe is None:
+                (r, w) = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+                self.__pipe = (r, w)
+            return self.__pipe
+
+    def watchFile(self, path):
+        '''!
+        Report an event when a file is written, created or moved in place and its contents have
+        changed. The parent directory of the file has to exist.
+
+        @param path (str) File name
+
+        @return True if the file is being watched
+        '''
+        try:
+            if self.__inotify is None:
+                self.__inotify = Inotify()
+            wd = self.__inotify.addWatch(os.path.dirname(os.path.abspath(path)), IN_CLOSE_WRITE | IN_MOVED_TO)
+        except (AttributeError, OSError) as e:
+            logger.debug('Exception [%s] encountered while watching file %s.' % (str(e), path))
+            return False
+        self.__files.setdefault(wd, dict())[os.path.basename(path)] = path
+        self.__digests[path] = _digest(path)
+        return True
+
+    def watchLinks(self):
+        '''!
+        Report an event when a network interface becomes operationally up.
+
+        @return True if network interfaces are being watched
+        '''
+        if self.__linkMonitor is not None:
+            return True
+        try:
+            self.__linkMonitor = LinkMonitor()
+        except OSError as e:
+            logger.debug('Exception [%s] encountered while monitoring network interfaces.' % str(e))
+            return False
+        return True
+
+    def watchSignals(self):
+        '''!
+        Report an event when a signal handled by a Python signal handler is received. It has to be
+        called from the main thread.
+
+        @return True if signals wake up wait()
+        '''
+        if self.__signals:
+            return True
+        (r, w) = self.__wakeupPipe()
+        try:
+            signal.set_wakeup_fd(w, warn_on_full_buffer=False)
+        except ValueError as e:
+            logger.debug('Exception [%s] encountered while watching signals.' % str(e))
+            return False
+        self.__signals = True
+        return True
+
+    def notify(self, event):
+        '''!
+        Post an event. Can be called from any thread.
+
+        @param event (str) Event name
+        '''
+        (r, w) = self.__wakeupPipe()
+        with self.__lock:
+            if event not in self.__notified:
+                self.__notified.append(event)
+        try:
+            os.write(w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def clear(self):
+        '''!
+        Discard events which have occurred so far. Current contents of watched files are the ones
+        later changes are compared to.
+        '''
+        while len(self.wait(0)) != 0:
+            pass
+        for path in self.__digests:
+            self.__digests[path] = _digest(path)
+
+    def wait(self, timeout):
+        '''!
+        Sleep till an event occurs or till timeout.
+
+        @param timeout (float) Maximum time in seconds to sleep
+
+        @return List of events which have occurred, empty if timeout expired
+        '''
+        deadline = time.monotonic() + max(timeout, 0)
+        # Events can be posted by notify() while waiting
+        self.__wakeupPipe()
+        while True:
+            fds = [f for f in [self.__inotify, self.__linkMonitor] if f is not None]
+            fds.append(self.__pipe[0])
+            remaining = max(deadline - time.monotonic(), 0)
+            (r, w, x) = select.select(fds, [], [], remaining)
+            events = self.__read(r)
+            if len(events) != 0 or time.monotonic() >= deadline:
+                return events
+
+    def __read(self, ready):
+        '''!
+        Read events from file descriptors which are ready.
+        '''
+        events = []
+        if self.__inotify is not None and self.__inotify in ready:
+            for (wd, mask, name) in self.__inotify.read(0):
+                path = self.__files.get(wd, dict()).get(name)
+                if path is not None:
+                    # Files are rewritten with the same contents, e.g. DHCP options on lease renewal
+                    digest = _digest(path)
+                    if digest != self.__digests.get(path):
+                        self.__digests[path] = digest
+                        events.append(path)
+        if self.__linkMonitor is not None and self.__linkMonitor in ready:
+            try:
+                changed = self.__linkMonitor.process(0)
+            except OSError:
+                changed = []
+            if any(self.__linkMonitor.isUp(n) for n in changed):
+                events.append(EVENT_LINK_UP)
+        if self.__pipe is not None and self.__pipe[0] in ready:
+            try:
+                data = os.read(self.__pipe[0], 512)
+            except BlockingIOError:
+                data = b''
+            if len(data.replace(b'\0', b'')) != 0:
+                events.append(EVENT_SIGNAL)
+            with self.__lock:
+                events.extend(self.__notified)
+                self.__notified = []
+        # Remove duplicates, keep order
+        return list(dict.fromkeys(events))
+
+    def close(self):
+        '''!
+        Stop watching events.
+        '''
+        if self.__signals:
+            try:
+                signal.set_wakeup_fd(-1)
+            except ValueError:
+                pass
+            self.__signals = False
+        if self.__inotify is not None:
+            self.__inotify.close()
+            self.__inotify = None
+        self.__files = dict()
+        self.__digests = dict()
+        if self.__linkMonitor is not None:
+            self.__linkMonitor.close()
+            self.__linkMonitor = None
+        with self.__lock:
+            if self.__pipe is not None:
+                os.close(self.__pipe[0])
+                os.close(self.__pipe[1])
+                self.__pipe = None
+            self.__notified = []
+
+def _digest(path):
+    '''!
+    Digest of the contents of a file, None if it can't be read.
+    '''
+    try:
+        with open(path, 'rb') as fh:
+            return hashlib.sha256(fh.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+def waitAnyProcess(pids, timeout):
+    '''!
+    Sleep till one of the specified processes exits or till timeout. Process exit is detected using
+    process file descriptors, if they are not supported the function sleeps for at most one second.
+
+    @param pids (list) Process ids
+    @param timeout (float) Maximum time in seconds to sleep
+    '''
+    timeout = max(timeout, 0)
+    pidfds = []
+    try:
+        for pid in pids:
+            try:
+                pidfds.append(os.pidfd_open(pid))
+            except ProcessLookupError:
+                # Process has already exited
+                return
+        if len(pidfds) == 0:
+            return
+        select.select(pidfds, [], [], timeout)
+    except (AttributeError, OSError):
+        time.sleep(min(timeout, 1))
+    finally:
+        for fd in pidfds:
+            os.close(fd)
+
+## Global instance used by ZTP service to wait for events
+eventWait = EventWait()
@@ -0,0 +1,151 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+## File was modified
+IN_MODIFY = 0x00000002
+## Writable file was closed
+IN_CLOSE_WRITE = 0x00000008
+## File was moved from the watched directory
+IN_MOVED_FROM = 0x00000040
+## File was moved to the watched directory
+IN_MOVED_TO = 0x00000080
+## File was created
+IN_CREATE = 0x00000100
+## File was deleted
+IN_DELETE = 0x00000200
+## Watched file or directory was deleted
+IN_DELETE_SELF = 0x00000400
+## Watch was removed
+IN_IGNORED = 0x00008000
+
+## Flags used to create the inotify instance
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+## struct inotify_event header: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+
+def _getLibc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    return _libc
+
+class Inotify:
+
+    '''!
+    \brief This class is a minimal wrapper of Linux inotify API used to wait for changes of files.
+
+    Examples of class usage:
+
+    \code
+    with Inotify() as objInotify:
+        objInotify.addWatch('/host/ztp', IN_CLOSE_WRITE | IN_MOVED_TO)
+        for (wd, mask, name) in objInotify.read(timeout=5):
+            print(name)
+    \endcode
+    '''
+
+    def __init__(self):
+        '''!
+        Constructor for the class.
+
+        @exception Raise OSError if an inotify instance could not be created
+        '''
+        fd = _getLibc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        ## inotify file descriptor
+        self.__fd = fd
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self):
+        '''!
+        Return inotify file descriptor, -1 if closed.
+        '''
+        return self.__fd
+
+    def addWatch(self, path, mask):
+        '''!
+        Watch a file or a directory.
+
+        @param path (str) File or directory to be watched
+        @param mask (int) Events to be reported
+
+        @return Watch descriptor
+        @exception Raise OSError if the watch could not be added
+        '''
+        wd = _getLibc().inotify_add_watch(self.__fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self, timeout=None):
+        '''!
+        Wait for events.
+
+        @param timeout (float, optional) Time in seconds to wait for events, wait forever if not specified
+
+        @return List of (watch descriptor, event mask, file name) tuples, empty if no event was received
+                before timeout
+        '''
+        if self.__fd < 0:
+            return []
+        try:
+            (r, w, x) = select.select([self.__fd], [], [], timeout)
+            if len(r) == 0:
+                return []
+            data = os.read(self.__fd, 65536)
+        except (InterruptedError, BlockingIOError):
+            return []
+        except OSError as e:
+            if e.errno == errno.EBADF:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            (wd, mask, cookie, length) = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset+length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        '''!
+        Close inotify instance.
+        '''
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
@@ -18,8 +18,166 @@ limitations under the License.
 import sys
 import os
 import json
+from contextlib import contextmanager
 from functools import partial
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JsonSerializer(object):
+
+    '''!
+    \brief This class converts JSON data to and from its serialized form using the Python json module.
+
+    Data is serialized as UTF-8 encoded bytes with sorted keys, non-ASCII characters are not escaped, as
+    done by orjson. Pretty output is generated if an indentation level is provided, otherwise output is
+    compact and meant for files only read by programs.
+    '''
+
+    ## Serializer name
+    name = 'json'
+
+    def loads(self, data):
+        '''!
+        Convert serialized JSON data to Python objects.
+
+        @param data (bytes or str) Serialized JSON data
+
+        @exception Raise ValueError if data is not valid JSON
+        '''
+        return json.loads(data)
+
+    def dumps(self, obj, indent=None):
+        '''!
+        Serialize Python objects as JSON data.
+
+        @param obj (object) Python objects
+        @param indent (int, optional) Indentation level, compact output is generated if not specified
+
+        @return UTF-8 encoded JSON data
+        @exception Raise TypeError or ValueError if obj can't be serialized
+        '''
+        if indent is not None:
+            return json.dumps(obj, indent=indent, sort_keys=True, ensure_ascii=False).encode()
+        return json.dumps(obj, separators=(',', ':'), sort_keys=True, ensure_ascii=False).encode()
+
+class OrjsonSerializer(JsonSerializer):
+
+    '''!
+    \brief This class converts JSON data to and from its serialized form using the orjson module.
+
+    orjson only generates pretty output with an indentation level of 2, other indentation levels and
+    data not supported by orjson (e.g. integers larger than 64 bits) are serialized using the Python
+    json module.
+    '''
+
+    ## Serializer name
+    name = 'orjson'
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj, indent=None):
+        if indent is None or indent == 2:
+            option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            if indent == 2:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, option=option)
+            except orjson.JSONEncodeError:
+                pass
+        return JsonSerializer.dumps(self, obj, indent)
+
+def getSerializer(name=None):
+    '''!
+    Get a JSON serializer.
+
+    @param name (str, optional) Serializer name, 'json' or 'orjson'. The fastest serializer installed is used if
+                                not specified.
+
+    @return JSON serializer object
+    @exception Raise ValueError if requested serializer is not available
+    '''
+    if name == 'orjson' or (name is None and orjson is not None):
+        if orjson is None:
+            raise ValueError('JSON serializer orjson is not installed')
+        return OrjsonSerializer()
+    elif name is None or name == 'json':
+        return JsonSerializer()
+    raise ValueError('Unknown JSON serializer %s' % str(name))
+
+def setSerializer(name=None):
+    '''!
+    Change the JSON serializer used to read and write JSON files.
+
+    @param name (str, optional) Serializer name, 'json' or 'orjson'. The fastest serializer installed is used if
+                                not specified.
+
+    @exception Raise ValueError if requested serializer is not available
+    '''
+    global serializer
+    serializer = getSerializer(name)
+
+## JSON serializer used to read and write JSON files
+serializer = getSerializer()
+
+def _syncDir(dirname):
+    '''!
+    Flush directory entries to disk so that a file replaced in it survives a power loss.
+
+    @param dirname (str) Directory name
+    '''
+    try:
+        fd = os.open(dirname if dirname != '' else '.', os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def writeJsonFile(file, dict, indent=None, create_dirs=True):
+    '''!
+    Write a dict object as a Json file. The file is replaced atomically, so that readers either see the
+    old or the new contents of the file, never a partially written one, and it is flushed to disk.
+
+    @param file (str) Filename where to store the json
+    @param dict (dict) dict object to be written
+    @param indent (int, optional) Indentation level, compact output is written if not set
+    @param create_dirs (bool, optional) Create the directory hierarchy of the file if required
+
+    @exception Raise an exception if an error happen when writing the file
+    '''
+    if create_dirs:
+        if os.path.dirname(file) != '':
+            if os.path.isdir(os.path.dirname(file)) is False:
+                os.makedirs(os.path.dirname(file))
+    tmp_file = '%s.%d.tmp' % (file, os.getpid())
+    try:
+        # Retain permissions of the file being replaced
+        try:
+            mode = os.stat(file).st_mode & 0o7777
+        except OSError:
+            mode = None
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        data = serializer.dumps(dict, indent)
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.write(data)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        if mode is not None:
+            os.chmod(tmp_file, mode)
+        os.replace(tmp_file, file)
+        _syncDir(os.path.dirname(file))
+    except (IOError, OSError, ValueError, TypeError) as e:
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        raise Exception(e)
+
 class JsonReader(object):
 
     '''!
@@ -35,6 +193,14 @@ class JsonReader(object):
     data_dict = url_dict.get('data')
     objJson.set(data_dict, 'first_name', "William", save=True)
     \endcode
+
+    Several changes can be saved using a single write of the file:
+
+    \code
+    with objJson.transaction():
+        objJson.set(data_dict, 'first_name', "William", save=True)
+        objJson.set(data_dict, 'last_name', "Shakespeare", save=True)
+    \endcode
     '''
 
     def __init__(self, src_json_file=None, dst_json_file=None, create_dst_file_parent_dirs=True, indent=None):
@@ -64,6 +230,12 @@ class JsonReader(object):
         ## Store the indentation level which will is used when the watcher function will write back the json file
         self.__indent = indent
 
+        ## Nesting level of transactions in progress
+        self.__txn_depth = 0
+
+        ## Flag to indicate that a write of the destination file has been deferred till end of transaction
+        self.__txn_dirty = False
+
     def __new__(cls, src_json_file=None, dst_json_file=None, create_dst_file_parent_dirs=True, indent=None):
         '''!
         Since we return a tuple when the class object is instanciated, we needed to override this method which create
@@ -92,9 +264,9 @@ class JsonReader(object):
         @exception Raise an exception in case of an error
         '''
         try:
-            with open(src_json_file) as json_file:
+            with open(src_json_file, 'rb') as json_file:
                 ## dict object read from the input json file
-                self.__json_dict = json.load(json_file)
+                self.__json_dict = serializer.loads(json_file.read())
                 json_file.close()
         except IOError as e:
             raise Exception(e)
@@ -103,18 +275,40 @@ class JsonReader(object):
 
         return self.__json_dict
 
+    @contextmanager
+    def transaction(self):
+        '''!
+        Defer writes of the destination file till the outermost transaction is completed. All the
+        changes made within the transaction are saved using a single write of the file.
+        '''
+        self.__txn_depth += 1
+        try:
+            yield self
+        finally:
+            self.__txn_depth -= 1
+            if self.__txn_depth == 0 and self.__txn_dirty:
+                self.__txn_dirty = False
+                self.writeJson()
+
     def writeJson(self, file=None, dict=None, indent=None, create_dirs=None):
         '''!
-        Write the current dictionary as a Json file
+        Write the current dictionary as a Json file. The file is replaced atomically, so that
+        readers either see the old or the new contents of the file, never a partially written one.
+        If a transaction is in progress, writing the current dictionary to the destination file is
+        deferred till end of the transaction.
 
         @param file (str, optional) Filename where to store the json
         @param dict (dict, optional) dic object (read from json source file)
-        @param indent (int, optional) Indentation level which is used when the watcher function will write back the json file
+        @param indent (int, optional) Indentation level which is used when the watcher function will write back the json file.
+                                      Compact output is written if no indentation level is set, for files only read by programs.
         @param create_dirs (bool, optional) Allow to create the directy hierarchy of the destination file, in case
                                             some directoris would not exist.
 
         @exception Raise an exception if an error happen when writing the file
         '''
+        if self.__txn_depth > 0 and dict is None and file is None:
+            self.__txn_dirty = True
+            return
         if dict is None:
             dict = self.__json_dict
         if file is None:
@@ -124,20 +318,7 @@ class JsonReader(object):
         if create_dirs is None:
             create_dirs = self.__create_dst_file_parent_dirs
 
-        if create_dirs:
-            if os.path.dirname(file) != '':
-                if os.path.isdir(os.path.dirname(file)) is False:
-                    os.makedirs(os.path.dirname(file))
-        try:
-            with open(file, 'w') as outfile:
-                if indent is not None:
-                    json.dump(dict, outfile, indent=indent, sort_keys=True)
-                else:
-                    json.dump(dict, outfile, sort_keys=True)
-                outfile.flush()
-                outfile.close()
-        except (IOError, ValueError) as e:
-            raise Exception(e)
+        writeJsonFile(file, dict, indent, create_dirs)
 
     def set(self, obj, key, value, save=False):
         '''!
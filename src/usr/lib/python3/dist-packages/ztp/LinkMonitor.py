@@ -0,0 +1,237 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import errno
+import select
+import socket
+import struct
+import time
+
+## rtnetlink multicast group used to receive link notifications
+RTMGRP_LINK = 1
+## Netlink message types
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+## Netlink message flags
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+## Link attributes
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+## Link flags and operational state indicating that link is up
+IFF_RUNNING = 0x40
+IF_OPER_UNKNOWN = 0
+IF_OPER_UP = 6
+
+_NLMSGHDR = struct.Struct('=LHHLL')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_RTATTR = struct.Struct('=HH')
+
+class LinkMonitor:
+    '''!
+    \brief This class is used to track network interfaces using rtnetlink notifications,
+           so that callers can wait for interfaces to be created or to become operationally
+           up without polling.
+
+    Examples of class usage:
+
+    \code
+    with LinkMonitor() as monitor:
+        missing = monitor.waitFor(['Ethernet0', 'Ethernet4'], timeout=120)
+    \endcode
+    '''
+
+    def __init__(self):
+        '''!
+        Constructor for the class. Subscribes to link notifications and reads the current
+        list of network interfaces.
+
+        @exception Raise OSError if rtnetlink socket could not be opened
+        '''
+        ## rtnetlink socket subscribed to link notifications
+        self.__sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.__sock.bind((0, RTMGRP_LINK))
+        ## Sequence number of the last request sent
+        self.__seq = 0
+        ## Known network interfaces: name -> (flags, operational state)
+        self.__links = dict()
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''!
+        Close the rtnetlink socket.
+        '''
+        if self.__sock is not None:
+            self.__sock.close()
+            self.__sock = None
+
+    def fileno(self):
+        '''!
+        File descriptor which becomes readable when link notifications are available.
+        Use process() to consume them.
+        '''
+        return self.__sock.fileno()
+
+    def links(self):
+        '''!
+        Return list of names of known network interfaces.
+        '''
+        return list(self.__links.keys())
+
+    def isPresent(self, name):
+        '''!
+        Check if specified network interface exists.
+
+        @param name (str) Network interface name
+        '''
+        return name in self.__links
+
+    def isUp(self, name):
+        '''!
+        Check if specified network interface is operationally up.
+
+        @param name (str) Network interface name
+        '''
+        link = self.__links.get(name)
+        if link is None:
+            return False
+        (flags, operstate) = link
+        if operstate is None or operstate == IF_OPER_UNKNOWN:
+            # Drivers which do not report operational state
+            return (flags & IFF_RUNNING) != 0
+        return operstate == IF_OPER_UP
+
+    def refresh(self):
+        '''!
+        Read the complete list of network interfaces from kernel.
+        '''
+        self.__seq += 1
+        seq = self.__seq
+        req = _NLMSGHDR.pack(_NLMSGHDR.size + _IFINFOMSG.size, RTM_GETLINK, NLM_F_REQUEST | NLM_F_DUMP, seq, 0) + \
+              _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        self.__sock.send(req)
+        self.__links = dict()
+        done = False
+        while not done:
+            done = self.__receive(seq)
+
+    def process(self, timeout=0):
+        '''!
+        Process pending link notifications.
+
+        @param timeout (float) Maximum time in seconds to wait for a notification
+
+        @return List of names of network interfaces which have changed
+        '''
+        changed = []
+        r, w, x = select.select([self.__sock], [], [], max(timeout, 0))
+        if r:
+            try:
+                self.__receive(None, changed)
+            except OSError as e:
+                # Notifications have been lost, read the complete list again
+                if e.errno != errno.ENOBUFS:
+                    raise
+                self.refresh()
+                changed = self.links()
+        return changed
+
+    def waitFor(self, names, timeout, up=False):
+        '''!
+        Wait for network interfaces to be created or to become operationally up.
+
+        @param names (list) Names of network interfaces
+        @param timeout (float) Maximum time in seconds to wait
+        @param up (bool, optional) Wait for interfaces to become operationally up
+
+        @return List of network interfaces which are still not available. Empty list if all are available.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            if up:
+                missing = [n for n in names if not self.isUp(n)]
+            else:
+                missing = [n for n in names if not self.isPresent(n)]
+            remaining = deadline - time.monotonic()
+            if len(missing) == 0 or remaining <= 0:
+                return missing
+            self.process(remaining)
+
+    def __receive(self, seq, changed=None):
+        '''!
+        Read and parse a buffer of netlink messages.
+
+        @param seq (int) Sequence number of the dump request in progress, None if none
+        @param changed (list, optional) Names of network interfaces which have changed are appended to it
+
+        @return True if end of the dump request has been reached
+        '''
+        data = self.__sock.recv(65536)
+        done = False
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            (msg_len, msg_type, flags, msg_seq, pid) = _NLMSGHDR.unpack_from(data, offset)
+            if msg_len < _NLMSGHDR.size:
+                break
+            if msg_type == NLMSG_DONE and msg_seq == seq:
+                done = True
+            elif msg_type == NLMSG_ERROR and msg_seq == seq:
+                (err,) = struct.unpack_from('=i', data, offset + _NLMSGHDR.size)
+                raise OSError(-err, os.strerror(-err))
+            elif msg_type in (RTM_NEWLINK, RTM_DELLINK):
+                name = self.__parseLink(data, offset + _NLMSGHDR.size, offset + msg_len, msg_type)
+                if name is not None and changed is not None:
+                    changed.append(name)
+            offset += (msg_len + 3) & ~3
+        return done
+
+    def __parseLink(self, data, start, end, msg_type):
+        '''!
+        Parse a link message and update list of known network interfaces.
+
+        @return Name of network interface
+        '''
+        (family, dev_type, index, flags, change) = _IFINFOMSG.unpack_from(data, start)
+        name = None
+        operstate = None
+        offset = start + _IFINFOMSG.size
+        while offset + _RTATTR.size <= end:
+            (rta_len, rta_type) = _RTATTR.unpack_from(data, offset)
+            if rta_len < _RTATTR.size:
+                break
+            payload = data[offset + _RTATTR.size:offset + rta_len]
+            if rta_type == IFLA_IFNAME:
+                name = payload.split(b'\0', 1)[0].decode()
+            elif rta_type == IFLA_OPERSTATE and len(payload) >= 1:
+                operstate = payload[0]
+            offset += (rta_len + 3) & ~3
+        if name is not None:
+            if msg_type == RTM_DELLINK:
+                self.__links.pop(name, None)
+            else:
+                self.__links[name] = (flags, operstate)
+        return name
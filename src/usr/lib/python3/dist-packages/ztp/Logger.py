@@ -17,9 +17,23 @@ limitations under the License.
 
 import sys
 import os
+import time
+import atexit
 import syslog
+import threading
+import weakref
+import collections
 from ztp.ZTPLib import isString, getTimestamp, getCfg, runCommand
 
+## Logger instances, their writer state is reset in child processes created using fork()
+_instances = weakref.WeakSet()
+
+def _afterFork():
+    for l in list(_instances):
+        l._afterFork()
+
+os.register_at_fork(after_in_child=_afterFork)
+
 class Logger:
 
     '''!
@@ -33,12 +47,18 @@ class Logger:
       - one for the text being shown on stdout
       - one for the text sent to a log file
 
+    Messages are queued and written to syslog and console by a background thread so that the
+    caller never blocks on a slow syslog daemon or serial console. Arguments are only formatted
+    if the message is logged. A message identical to one logged less than log-dedup-interval
+    seconds earlier is suppressed, and the number of times it has been repeated is logged when
+    the interval expires.
+
     Examples of class usage:
 
     \code
     logger = Logger()
     logger.setLevel(Logger.ERROR)
-    logger.debug('cmd="%s"' % (cmd))
+    logger.debug('cmd="%s"', cmd)
     logger.error('An error happened  here')
     \endcode
     '''
@@ -80,7 +100,37 @@ class Logger:
         ## Log to stdout, useful for test-mode
         self.__log_console = False
 
+        ## Messages waiting to be written: (level, message)
+        self.__queue = collections.deque()
+        ## Maximum number of messages waiting to be written
+        self.__queue_size = getCfg('log-queue-size', 4096)
+        ## Number of messages dropped because the queue was full
+        self.__dropped = 0
+        ## Number of queued messages not yet written
+        self.__pending = 0
+        ## Signals queued messages to the writer and written messages to flush()
+        self.__cond = threading.Condition()
+        ## Background writer thread
+        self.__writer = None
+        ## Recently written messages: (level, message) -> [time written, times suppressed]
+        self.__recent = collections.OrderedDict()
+
         syslog.openlog(ident='sonic-ztp', logoption=syslog.LOG_PID)
+        atexit.register(self.flush)
+        _instances.add(self)
+
+    def _afterFork(self):
+        '''!
+        Reset the state of the writer in a child process created using fork(). The writer thread
+        does not exist in the child and its lock may have been held when the process was forked.
+        Messages queued by the parent process are written by the parent process.
+        '''
+        self.__queue = collections.deque()
+        self.__dropped = 0
+        self.__pending = 0
+        self.__cond = threading.Condition()
+        self.__writer = None
+        self.__recent = collections.OrderedDict()
 
     def __str_to_int_level(self, str_level):
         '''!
@@ -200,11 +250,123 @@ class Logger:
 
         @param log_level (int) Log level for this particular log message. Depending on 
                                log level, the message will be shown or not.
+        @param fmt (str) Message, used as format string if arguments are provided
+        @param args Arguments of the format string, only formatted if the message is logged
+
+        '''
+        if log_level > self.__log_level and not self.__log_console:
+            return
+        msg = fmt % args if args else fmt
+        with self.__cond:
+            if len(self.__queue) >= self.__queue_size:
+                self.__dropped += 1
+                return
+            self.__queue.append((log_level, msg))
+            self.__pending += 1
+            if self.__writer is None:
+                self.__writer = threading.Thread(target=self.__run, name='ztp-logger', daemon=True)
+                self.__writer.start()
+            self.__cond.notify_all()
+
+    def flush(self, timeout=5):
+        '''!
+        Wait for queued messages to be written.
+
+        @param timeout (float, optional) Maximum time to wait in seconds
+        '''
+        deadline = time.monotonic() + timeout
+        with self.__cond:
+            while self.__pending > 0 and self.__writer is not None and self.__writer.is_alive():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.__cond.wait(remaining)
+        return True
+
+    def __run(self):
+        '''!
+        Background writer thread. Writes queued messages and summaries of suppressed duplicates.
+        '''
+        while True:
+            with self.__cond:
+                if len(self.__queue) == 0 and self.__dropped == 0:
+                    self.__cond.wait(self.__nextExpiry())
+                batch = list(self.__queue)
+                self.__queue.clear()
+                dropped = self.__dropped
+                self.__dropped = 0
+            # Messages are written without holding the lock so that callers never wait for syslog
+            if dropped != 0:
+                self.__write(self.WARNING, '%d log messages dropped as logging could not keep up.' % dropped)
+            for (log_level, msg) in batch:
+                self.__dedup(log_level, msg)
+            self.__expire()
+            with self.__cond:
+                self.__pending -= len(batch)
+                self.__cond.notify_all()
+
+    def __dedup(self, log_level, msg):
+        '''!
+        Write a message unless an identical message has been written less than log-dedup-interval seconds ago.
+        '''
+        interval = getCfg('log-dedup-interval', 300)
+        if interval <= 0:
+            self.__write(log_level, msg)
+            return
+        key = (log_level, msg)
+        entry = self.__recent.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] < interval:
+            entry[1] += 1
+            return
+        if entry is not None:
+            self.__summary(key, entry)
+            del self.__recent[key]
+        self.__write(log_level, msg)
+        self.__recent[key] = [now, 0]
+        # Bound the number of messages being tracked
+        while len(self.__recent) > 256:
+            (old_key, old_entry) = self.__recent.popitem(last=False)
+            self.__summary(old_key, old_entry)
+
+    def __expire(self):
+        '''!
+        Write summaries of suppressed messages whose interval has expired.
+        '''
+        interval = getCfg('log-dedup-interval', 300)
+        now = time.monotonic()
+        for (key, entry) in list(self.__recent.items()):
+            if now - entry[0] >= interval:
+                self.__summary(key, entry)
+                del self.__recent[key]
+
+    def __nextExpiry(self):
+        '''!
+        Return time in seconds till the interval of the oldest suppressed message expires, None if none.
+        '''
+        pending = [e[0] for e in self.__recent.values() if e[1] != 0]
+        if len(pending) == 0:
+            return None
+        return max(0, min(pending) + getCfg('log-dedup-interval', 300) - time.monotonic())
 
+    def __summary(self, key, entry):
+        '''!
+        Write number of times a message has been suppressed.
+        '''
+        if entry[1] != 0:
+            self.__write(key[0], 'Message repeated %d times in the last %d seconds: %s' % (entry[1], int(time.monotonic() - entry[0]), key[1]))
+
+    def __write(self, log_level, msg):
+        '''!
+        Write a message to syslog and to the console.
         '''
-        syslog.syslog(log_level, fmt + '\n' % args)
-        if self.__log_console:
-            print('sonic-ztp '+ self.__int_level_to_str(log_level)  + ' ' +fmt % args)
+        try:
+            if log_level <= self.__log_level:
+                syslog.syslog(log_level, msg)
+            if self.__log_console:
+                print('sonic-ztp '+ self.__int_level_to_str(log_level)  + ' ' + msg, flush=True)
+        except Exception:
+            pass
 
     def debug(self, fmt, *args):
         '''!
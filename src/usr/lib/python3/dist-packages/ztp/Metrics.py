@@ -0,0 +1,279 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import re
+import math
+import time
+import threading
+
+from ztp.ZTPLib import getCfg
+from ztp.Logger import logger
+
+## Metrics exported by ZTP service: name -> (type, help)
+METRICS = dict({
+    'ztp_discovery_iterations_total' : ('counter', 'Number of provisioning data discovery iterations'),
+    'ztp_link_scan_restarts_total' : ('counter', 'Number of network discovery restarts caused by link up events'),
+    'ztp_interfaces_config_restarts_total' : ('counter', 'Number of interfaces-config service restarts'),
+    'ztp_downloads_total' : ('counter', 'Number of provisioning data downloads by result'),
+    'ztp_download_bytes_total' : ('counter', 'Number of provisioning data bytes downloaded by result'),
+    'ztp_download_duration_seconds' : ('histogram', 'Duration of provisioning data downloads'),
+    'ztp_plugin_exit_codes_total' : ('counter', 'Number of plugin executions by configuration section and exit code'),
+    'ztp_section_duration_seconds' : ('gauge', 'Duration of the last plugin execution of a configuration section'),
+    'ztp_section_retries_total' : ('counter', 'Number of retries of failed configuration sections'),
+    'ztp_sections_skipped_total' : ('counter', 'Number of configuration sections skipped as unchanged'),
+    'ztp_restarts_total' : ('counter', 'Number of ZTP discovery restarts'),
+    'ztp_reboots_total' : ('counter', 'Number of system reboots requested by ZTP'),
+    'ztp_last_update_timestamp_seconds' : ('gauge', 'Time at which ZTP metrics were last updated'),
+})
+
+## Upper bounds of the buckets of histograms, in seconds
+HISTOGRAM_BUCKETS = dict({
+    'ztp_download_duration_seconds' : [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300],
+})
+
+## Suffixes of the samples of a histogram
+_HISTOGRAM_SUFFIXES = ['_bucket', '_sum', '_count']
+_SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})?\s+(\S+)$')
+_LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+_ESCAPE_RE = re.compile(r'\\(.)')
+
+class Metrics:
+    '''!
+    \brief This class is used to maintain ZTP service metrics in a file read by the textfile
+           collector of Prometheus node exporter.
+
+    The metrics file is replaced atomically and at most once per metrics-interval seconds, unless
+    a flush is forced. Metrics saved in the metrics file are reloaded when the service is restarted
+    so that counters keep increasing across service restarts and reboots. Metrics are only maintained
+    after start() has been called and if the directory of the metrics file exists.
+
+    Examples of class usage:
+
+    \code
+    metrics.start()
+    metrics.inc('ztp_downloads_total', {'result': 'success'})
+    metrics.observe('ztp_download_duration_seconds', 1.2)
+    metrics.flush()
+    \endcode
+    '''
+
+    def __init__(self, metrics_file=None):
+        '''!
+        Constructor for the class.
+
+        @param metrics_file (str, optional) Metrics file. metrics-file is used if not specified.
+        '''
+        ## Metrics file
+        self.__metrics_file = metrics_file
+        ## Samples: (name, labels) -> value
+        self.__samples = None
+        ## Protects samples, updated by concurrent downloads
+        self.__lock = threading.Lock()
+        ## Time at which metrics file was last written
+        self.__last_flush = None
+        ## Flag to indicate samples not yet written
+        self.__dirty = False
+
+    def start(self):
+        '''!
+        Start maintaining metrics. Metrics saved by a previous instance of the service are reloaded.
+        '''
+        if self.__metrics_file is None:
+            self.__metrics_file = getCfg('metrics-file')
+        with self.__lock:
+            self.__samples = dict()
+            self.__last_flush = None
+            self.__load()
+
+    def inc(self, name, labels=None, value=1):
+        '''!
+        Increment a counter.
+
+        @param name (str) Metric name
+        @param labels (dict, optional) Metric labels
+        @param value (int, optional) Increment
+        '''
+        with self.__lock:
+            if self.__samples is None:
+                return
+            key = (name, self.__labels(labels))
+            self.__samples[key] = self.__samples.get(key, 0) + value
+            self.__dirty = True
+
+    def set(self, name, value, labels=None):
+        '''!
+        Set value of a gauge.
+
+        @param name (str) Metric name
+        @param value (float) Value
+        @param labels (dict, optional) Metric labels
+        '''
+        with self.__lock:
+            if self.__samples is None:
+                return
+            self.__samples[(name, self.__labels(labels))] = value
+            self.__dirty = True
+
+    def observe(self, name, value, labels=None):
+        '''!
+        Add an observation to a histogram.
+
+        @param name (str) Metric name
+        @param value (float) Observed value
+        @param labels (dict, optional) Metric labels
+        '''
+        with self.__lock:
+            if self.__samples is None:
+                return
+            _labels = self.__labels(labels)
+            for le in HISTOGRAM_BUCKETS[name] + ['+Inf']:
+                key = (name + '_bucket', _labels + (('le', self.__number(le)),))
+                self.__samples[key] = self.__samples.get(key, 0) + (1 if le == '+Inf' or value <= le else 0)
+            for (suffix, inc) in [('_sum', value), ('_count', 1)]:
+                key = (name + suffix, _labels)
+                self.__samples[key] = self.__samples.get(key, 0) + inc
+            self.__dirty = True
+
+    def get(self, name, labels=None):
+        '''!
+        Return value of a sample, None if it has not been recorded.
+
+        @param name (str) Sample name
+        @param labels (dict, optional) Sample labels
+        '''
+        with self.__lock:
+            if self.__samples is None:
+                return None
+            return self.__samples.get((name, self.__labels(labels)))
+
+    def flush(self, force=False):
+        '''!
+        Write metrics file if metrics have changed. Writes are rate limited to one per metrics-interval seconds.
+
+        @param force (bool, optional) Write metrics file irrespective of the time of the last write
+
+        @return True if metrics file has been written
+        '''
+        with self.__lock:
+            if self.__samples is None or self.__dirty is False:
+                return False
+            now = time.monotonic()
+            if force is False and self.__last_flush is not None and \
+               now - self.__last_flush < getCfg('metrics-interval'):
+                return False
+            if os.path.isdir(os.path.dirname(self.__metrics_file)) is False:
+                return False
+            self.__samples[('ztp_last_update_timestamp_seconds', ())] = int(time.time())
+            self.__last_flush = now
+            self.__dirty = False
+            tmp_file = '%s.%d.tmp' % (self.__metrics_file, os.getpid())
+            try:
+                with open(tmp_file, 'w') as fh:
+                    fh.write(self.__text())
+                os.chmod(tmp_file, 0o644)
+                os.replace(tmp_file, self.__metrics_file)
+            except (IOError, OSError) as e:
+                logger.debug('Exception [%s] encountered while writing metrics file %s.' % (str(e), self.__metrics_file))
+                if os.path.isfile(tmp_file):
+                    os.remove(tmp_file)
+                return False
+            return True
+
+    def __text(self):
+        '''!
+        Format samples using Prometheus text exposition format.
+        '''
+        lines = []
+        for (metric, (metric_type, metric_help)) in METRICS.items():
+            if metric_type == 'histogram':
+                names = [metric + s for s in _HISTOGRAM_SUFFIXES]
+            else:
+                names = [metric]
+            samples = [(k, v) for (k, v) in self.__samples.items() if k[0] in names]
+            if len(samples) == 0:
+                continue
+            lines.append('# HELP %s %s' % (metric, metric_help))
+            lines.append('# TYPE %s %s' % (metric, metric_type))
+            for ((name, labels), value) in samples:
+                if len(labels) != 0:
+                    label_str = ','.join(['%s="%s"' % (k, self.__escape(v)) for (k, v) in labels])
+                    lines.append('%s{%s} %s' % (name, label_str, self.__number(value)))
+                else:
+                    lines.append('%s %s' % (name, self.__number(value)))
+        return '\n'.join(lines) + '\n'
+
+    def __load(self):
+        '''!
+        Reload samples from metrics file written by a previous instance of the service.
+        '''
+        try:
+            with open(self.__metrics_file) as fh:
+                lines = fh.readlines()
+        except IOError:
+            return
+        for l in lines:
+            match = _SAMPLE_RE.match(l.strip())
+            if match is None:
+                continue
+            name = match.group(1)
+            base = name
+            for suffix in _HISTOGRAM_SUFFIXES:
+                if name.endswith(suffix) and name[:-len(suffix)] in HISTOGRAM_BUCKETS:
+                    base = name[:-len(suffix)]
+            if base not in METRICS:
+                continue
+            labels = tuple(_LABEL_RE.findall(match.group(3) or ''))
+            labels = tuple((k, self.__unescape(v)) for (k, v) in labels)
+            try:
+                value = float(match.group(4))
+            except ValueError:
+                continue
+            if math.isfinite(value) and value == int(value):
+                value = int(value)
+            self.__samples[(name, labels)] = value
+
+    def __labels(self, labels):
+        '''!
+        Convert labels to a sorted tuple of (name, value) tuples.
+        '''
+        if labels is None:
+            return ()
+        return tuple(sorted((k, str(v)) for (k, v) in labels.items()))
+
+    def __escape(self, value):
+        '''!
+        Escape a label value.
+        '''
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def __unescape(self, value):
+        '''!
+        Unescape a label value read from the metrics file. Escape sequences are parsed in a single pass.
+        '''
+        return _ESCAPE_RE.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+    def __number(self, value):
+        '''!
+        Format a sample value.
+        '''
+        if isinstance(value, float):
+            return repr(round(value, 6))
+        return str(value)
+
+## Global instance of ZTP service metrics
+metrics = Metrics()
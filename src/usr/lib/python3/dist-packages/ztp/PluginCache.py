@@ -0,0 +1,247 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import json
+import time
+import shlex
+import shutil
+import hashlib
+
+from ztp.ZTPLib import getCfg
+from ztp.Logger import logger
+
+class PluginCache:
+    '''!
+    \brief This class is used to keep downloaded plugins in a store shared by configuration sections
+           and ZTP sessions.
+
+    Plugins are stored under plugin-cache-dir as objects named after the SHA-256 hash of their content,
+    and an index maps each source URL to its object along with the ETag and Last-Modified headers
+    returned by the server. A plugin is downloaded at most once per instance of this class for a given
+    source URL. Plugins downloaded using HTTP(S) in an earlier session are revalidated with a conditional
+    request and are not downloaded again if the server reports them as not modified. Plugin files used
+    by configuration sections are hard links to the stored objects. The least recently used objects are
+    removed when the store exceeds plugin-cache-size bytes, a size of 0 disables the store.
+
+    Examples of class usage:
+
+    \code
+    objCache = PluginCache()
+    rc, plugin_file = objCache.fetch(URL('http://server/plugin.sh'), '/var/lib/ztp/sections/0001-test/plugin')
+    \endcode
+    '''
+
+    def __init__(self, cache_dir=None):
+        '''!
+        Constructor for the class.
+
+        @param cache_dir (str, optional) Store directory. plugin-cache-dir is used if not specified.
+        '''
+        ## Store directory
+        self.__cache_dir = cache_dir if cache_dir is not None else getCfg('plugin-cache-dir')
+        ## Index file: source URL -> object information
+        self.__index_file = os.path.join(self.__cache_dir, 'index.json')
+        ## Directory of stored objects
+        self.__objects_dir = os.path.join(self.__cache_dir, 'objects')
+        ## Source URLs which have been downloaded or revalidated by this instance
+        self.__fresh = set()
+
+    def enabled(self):
+        '''!
+        Check if plugins are kept in the store.
+        '''
+        return getCfg('plugin-cache-size') > 0
+
+    def fetch(self, objUrl, target, curl_args=None):
+        '''!
+        Provide a plugin file using the store, downloading it if required.
+
+        @param objUrl (URL or DynamicURL) Plugin source
+        @param target (str) Plugin file to be created
+        @param curl_args (str, optional) Additional curl arguments provided for the plugin source
+
+        @return
+            Return a tuple: \n
+            - In case of success: (0, target)\n
+            - In case of error:   (error_code, None)
+        '''
+        source = objUrl.getSource()
+        index = self.__readIndex()
+        entry = index.get(source)
+        obj_file = self.__validObject(entry)
+        if obj_file is not None and source in self.__fresh:
+            logger.debug('Using stored plugin %s.', source)
+            return self.__use(index, source, obj_file, target)
+
+        os.makedirs(self.__objects_dir, exist_ok=True)
+        tmp_file = os.path.join(self.__cache_dir, 'download.tmp')
+        hdr_file = os.path.join(self.__cache_dir, 'headers.tmp')
+        extra = ['-D', hdr_file]
+        if obj_file is not None and source.lower().startswith(('http://', 'https://')):
+            if entry.get('etag'):
+                extra += ['-H', 'If-None-Match: %s' % entry.get('etag')]
+            elif entry.get('last-modified'):
+                extra += ['-H', 'If-Modified-Since: %s' % entry.get('last-modified')]
+        args = ' '.join(shlex.quote(a) for a in extra)
+        if curl_args:
+            args = curl_args + ' ' + args
+        try:
+            # A response without a body does not create the output file
+            open(tmp_file, 'w').close()
+            (rc, fname) = objUrl.objDownload.getUrl(dst_file=tmp_file, curl_args=args)
+            if rc != 0:
+                return (rc, None)
+            (status, headers) = self.__readHeaders(hdr_file)
+            if status == 304 and obj_file is not None:
+                logger.debug('Stored plugin %s has not been modified.', source)
+            else:
+                digest = self.__digest(tmp_file)
+                obj_file = os.path.join(self.__objects_dir, digest)
+                if os.path.isfile(obj_file):
+                    os.remove(tmp_file)
+                else:
+                    os.replace(tmp_file, obj_file)
+                entry = dict({'sha256': digest, 'size': os.path.getsize(obj_file),
+                              'etag': headers.get('etag'), 'last-modified': headers.get('last-modified')})
+                index[source] = entry
+            self.__fresh.add(source)
+            return self.__use(index, source, obj_file, target)
+        finally:
+            for f in [tmp_file, hdr_file]:
+                if os.path.isfile(f):
+                    os.remove(f)
+
+    def __use(self, index, source, obj_file, target):
+        '''!
+        Create plugin file as a hard link to a stored object and update the store.
+        '''
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = target + '.tmp'
+        if os.path.lexists(tmp_target):
+            os.remove(tmp_target)
+        try:
+            os.link(obj_file, tmp_target)
+        except OSError:
+            # Store and plugin file are not on the same file system
+            shutil.copy2(obj_file, tmp_target)
+        os.replace(tmp_target, target)
+        index[source]['last-used'] = time.time()
+        self.__evict(index)
+        self.__writeIndex(index)
+        return (0, target)
+
+    def __validObject(self, entry):
+        '''!
+        Return stored object of an index entry, None if missing or altered.
+        '''
+        if not isinstance(entry, dict) or not isinstance(entry.get('sha256'), str):
+            return None
+        obj_file = os.path.join(self.__objects_dir, os.path.basename(entry.get('sha256')))
+        try:
+            if os.path.getsize(obj_file) == entry.get('size'):
+                return obj_file
+        except OSError:
+            pass
+        return None
+
+    def __evict(self, index):
+        '''!
+        Remove least recently used objects, and objects not referenced by the index, till the
+        store does not exceed plugin-cache-size bytes.
+        '''
+        last_used = dict()
+        for (source, entry) in list(index.items()):
+            if self.__validObject(entry) is None:
+                del index[source]
+                continue
+            digest = entry.get('sha256')
+            last_used[digest] = max(last_used.get(digest, 0), entry.get('last-used', 0))
+        sizes = dict()
+        for name in os.listdir(self.__objects_dir):
+            if name in last_used:
+                sizes[name] = os.path.getsize(os.path.join(self.__objects_dir, name))
+            else:
+                os.remove(os.path.join(self.__objects_dir, name))
+        total = sum(sizes.values())
+        for digest in sorted(sizes, key=lambda d: last_used.get(d)):
+            if total <= getCfg('plugin-cache-size'):
+                break
+            os.remove(os.path.join(self.__objects_dir, digest))
+            total -= sizes.get(digest)
+            for source in [s for (s, e) in index.items() if e.get('sha256') == digest]:
+                del index[source]
+
+    def __readIndex(self):
+        '''!
+        Read the index of the store.
+        '''
+        try:
+            with open(self.__index_file) as fh:
+                index = json.load(fh)
+            if isinstance(index, dict):
+                return index
+        except (IOError, OSError, ValueError):
+            pass
+        return dict()
+
+    def __writeIndex(self, index):
+        '''!
+        Save the index of the store. The file is replaced atomically.
+        '''
+        tmp_file = self.__index_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as fh:
+                json.dump(index, fh, indent=4)
+            os.replace(tmp_file, self.__index_file)
+        except (IOError, OSError) as e:
+            logger.error('Exception [%s] encountered while writing plugin store index %s.' % (str(e), self.__index_file))
+
+    def __readHeaders(self, hdr_file):
+        '''!
+        Read response headers saved by curl. Only headers of the last response are used when
+        redirects are followed.
+
+        @return Tuple (status code, dict of lower case header names to values). Status code is None
+                for protocols other than HTTP.
+        '''
+        status = None
+        headers = dict()
+        try:
+            with open(hdr_file, errors='replace') as fh:
+                for line in fh:
+                    line = line.strip()
+                    if line.startswith('HTTP/'):
+                        fields = line.split()
+                        status = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else None
+                        headers = dict()
+                    elif ':' in line:
+                        (name, value) = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+        except (IOError, OSError):
+            pass
+        return (status, headers)
+
+    def __digest(self, fname):
+        '''!
+        Compute SHA-256 hash of a file.
+        '''
+        h = hashlib.sha256()
+        with open(fname, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(65536), b''):
+                h.update(chunk)
+        return h.hexdigest()
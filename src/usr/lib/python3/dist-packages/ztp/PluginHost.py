@@ -0,0 +1,452 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import sys
+import gc
+import json
+import time
+import shlex
+import select
+import signal
+import socket
+import threading
+import subprocess
+
+import ztp.ZTPLib
+from ztp.ZTPLib import getCfg, getRusage
+from ztp.Logger import logger
+from ztp.Tracer import tracer
+from ztp.Profiler import profiler
+
+## Modules imported by the plugin host before plugins are run
+PRELOAD_MODULES = ['ztp.ZTPLib', 'ztp.Logger', 'ztp.ZTPObjects', 'ztp.ZTPSections', 'ztp.Downloader',
+                   'ztp.DecodeSysEeprom', 'ztp.Identifier', 'json', 'shutil', 'fcntl', 'select', 'stat',
+                   'traceback', 'types', 'swsscommon.swsscommon']
+
+class PluginHost:
+    '''!
+    \brief This class is used by ZTP service to run built-in plugins from a pre-initialized process.
+
+    The plugin host is a process started along with ZTP service which imports the ZTP library,
+    reads the configuration and decodes the system EEPROM once. Each plugin is run in a new
+    process forked from the plugin host, so that plugins do not pay for interpreter and library
+    startup while still being isolated from each other and from ZTP service. Plugins are run with
+    the same argv, environment, umask and exit code semantics as when they are executed directly.
+
+    Only Python plugins installed in plugins-dir are run by the plugin host. run() returns None
+    when a plugin can't be run by the plugin host, in which case it has to be executed using
+    runCommand(). It is also the case if the plugin host exits while a plugin is running: the plugin
+    is waited for up to plugin-host-wait-interval seconds and killed if it is still running.
+
+    The plugin host runs one plugin at a time. run() does not wait for a plugin started by another
+    thread to complete, it returns None right away so that the plugin is executed directly.
+
+    Examples of class usage:
+
+    \code
+    pluginHost.start()
+    rc = pluginHost.run('/usr/lib/ztp/plugins/snmp /var/lib/ztp/sections/0001-snmp/input.json')
+    if rc is None:
+        rc = runCommand(...)
+    \endcode
+    '''
+
+    def __init__(self):
+        '''!
+        Constructor for the class.
+        '''
+        ## Plugin host process
+        self.__proc = None
+        ## Socket connected to the plugin host
+        self.__sock = None
+        ## Stream used to read responses from the plugin host
+        self.__rfile = None
+        ## Held while the plugin host is started or is running a plugin
+        self.__lock = threading.Lock()
+
+    def start(self):
+        '''!
+        Start the plugin host process if it is not running.
+
+        @return True if the plugin host is running
+        '''
+        with self.__lock:
+            return self.__start()
+
+    def __start(self):
+        '''!
+        Start the plugin host process if it is not running. Must be called with the lock held.
+
+        @return True if the plugin host is running
+        '''
+        if self.__proc is not None and self.__proc.poll() is None:
+            return True
+        self.__close()
+        (sock, child_sock) = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        env = dict(os.environ)
+        # Plugin host uses the same ZTP library as ZTP service
+        lib_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([lib_dir] + ([env.get('PYTHONPATH')] if env.get('PYTHONPATH') else []))
+        try:
+            self.__proc = subprocess.Popen([sys.executable, '-m', 'ztp.PluginHost', str(child_sock.fileno())],
+                                           pass_fds=(child_sock.fileno(),), env=env)
+        except (OSError, ValueError) as e:
+            logger.error('Exception [%s] encountered while starting plugin host.' % str(e))
+            sock.close()
+            return False
+        finally:
+            child_sock.close()
+        self.__sock = sock
+        self.__rfile = sock.makefile('rb')
+        logger.debug('Started plugin host pid %d.', self.__proc.pid)
+        return True
+
+    def stop(self):
+        '''!
+        Stop the plugin host process. The plugin host exits when the connection is closed.
+        '''
+        with self.__lock:
+            self.__close()
+
+    def running(self):
+        '''!
+        Check if the plugin host process is running.
+        '''
+        return self.__proc is not None and self.__proc.poll() is None
+
+    def accepts(self, plugin):
+        '''!
+        Check if a plugin can be run by the plugin host: it has to be a Python program installed in plugins-dir.
+
+        @param plugin (str) Plugin file
+        '''
+        if getCfg('plugin-host') is False:
+            return False
+        try:
+            plugins_dir = os.path.realpath(getCfg('plugins-dir'))
+            if os.path.dirname(os.path.realpath(plugin)) != plugins_dir:
+                return False
+            with open(plugin, 'rb') as fh:
+                first_line = fh.readline(256)
+            return first_line.startswith(b'#!') and b'python3' in first_line
+        except (IOError, OSError):
+            return False
+
+    def run(self, cmd, umask=-1, usage=None):
+        '''!
+        Run a plugin in a process forked from the plugin host and wait for its completion.
+
+        @param cmd (str or list) Plugin command line, plugin file followed by its arguments
+        @param umask (int, optional) File mode creation mask of the plugin process, -1 to keep the current one
+        @param usage (dict, optional) If provided, it is populated with the resource usage of the plugin process
+
+        @return Exit code of the plugin process, negative if it has been terminated by a signal.
+                None if the plugin could not be started or completed by the plugin host, or if the
+                plugin host is running another plugin.
+        '''
+        argv = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+        if len(argv) == 0:
+            return None
+        if self.__lock.acquire(blocking=False) is False:
+            logger.debug('Plugin host is busy, plugin %s will be executed directly.' % argv[0])
+            return None
+        try:
+            if self.__start() is False:
+                return None
+            return self.__run(argv, umask, usage)
+        finally:
+            self.__lock.release()
+
+    def __run(self, argv, umask, usage):
+        '''!
+        Run a plugin using the plugin host. Must be called with the lock held.
+        '''
+        with tracer.span('command', {'command': ' '.join(argv), 'plugin-host': True}) as span:
+            env = span.environ()
+            request = dict({'argv': argv, 'umask': umask, 'cwd': os.getcwd(), 'env': env if env is not None else dict(os.environ)})
+            try:
+                self.__sock.sendall((json.dumps(request) + '\n').encode())
+                response = self.__response()
+            except (IOError, OSError, ValueError) as e:
+                response = None
+            if response is None or response.get('pid') is None:
+                logger.error('Plugin host could not start plugin %s.' % argv[0])
+                self.__close()
+                return None
+            pid = response.get('pid')
+            ztp.ZTPLib.runcmd_pids.append(pid)
+            try:
+                try:
+                    response = self.__response()
+                except (IOError, OSError, ValueError):
+                    response = None
+                if response is None:
+                    # Plugin host exited, exit code of the plugin can't be determined. The plugin is
+                    # run again using runCommand() once it has exited or has been killed.
+                    logger.error('Plugin host exited while running plugin %s. Plugin will be executed directly.' % argv[0])
+                    self.__close()
+                    _waitExit(pid, getCfg('plugin-host-wait-interval'))
+                    rc = None
+                else:
+                    rc = os.waitstatus_to_exitcode(response.get('status'))
+                    if usage is not None and response.get('usage') is not None:
+                        usage.update(response.get('usage'))
+            finally:
+                if pid in ztp.ZTPLib.runcmd_pids:
+                    ztp.ZTPLib.runcmd_pids.remove(pid)
+            span.set('exit-code', rc)
+            return rc
+
+    def __response(self):
+        '''!
+        Read a response of the plugin host, None if the connection has been closed.
+        '''
+        line = self.__rfile.readline()
+        return json.loads(line.decode()) if line else None
+
+    def __close(self):
+        '''!
+        Close the connection to the plugin host.
+        '''
+        if self.__rfile is not None:
+            self.__rfile.close()
+            self.__rfile = None
+        if self.__sock is not None:
+            self.__sock.close()
+            self.__sock = None
+        if self.__proc is not None:
+            self.__proc.poll()
+            self.__proc = None
+
+def _alive(pid):
+    '''!
+    Check if a process exists.
+    '''
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+def _waitExit(pid, timeout):
+    '''!
+    Wait for a process which is not a child of the current process to exit. It is killed if it
+    is still running after timeout seconds.
+
+    @param pid (int) Process id
+    @param timeout (int) Maximum time to wait in seconds
+    '''
+    try:
+        pidfd = os.pidfd_open(pid)
+    except AttributeError:
+        # pidfd is not supported, poll the process
+        deadline = time.monotonic() + timeout
+        while _alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if _alive(pid):
+            logger.error('Plugin process %d still running after %d seconds, killing it.' % (pid, timeout))
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        return
+    except OSError:
+        # Process has already exited
+        return
+    try:
+        (readable, writable, exceptional) = select.select([pidfd], [], [], timeout)
+        if len(readable) == 0:
+            logger.error('Plugin process %d still running after %d seconds, killing it.' % (pid, timeout))
+            signal.pidfd_send_signal(pidfd, signal.SIGKILL)
+            select.select([pidfd], [], [], timeout)
+    except OSError:
+        pass
+    finally:
+        os.close(pidfd)
+
+def _exitCode(e):
+    '''!
+    Exit code of an interpreter exiting due to SystemExit exception e.
+    '''
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr)
+    return 1
+
+def _runExitHandlers(exit_handlers):
+    '''!
+    Run exit handlers in reverse order of registration. Exceptions they raise, other than SystemExit,
+    are printed.
+
+    @param exit_handlers (list) List of (function, args, kwargs) tuples, emptied
+    '''
+    import traceback
+    while len(exit_handlers) != 0:
+        (func, args, kwargs) = exit_handlers.pop()
+        try:
+            func(*args, **kwargs)
+        except SystemExit:
+            pass
+        except BaseException:
+            traceback.print_exc()
+
+def _runPlugin(request):
+    '''!
+    Run a plugin in the current process, a child of the plugin host, the same way the interpreter runs a
+    program. It does not return.
+
+    The process exits as follows once the plugin has returned, called sys.exit() or raised an exception:
+    - Non-daemon threads started by the plugin are joined.
+    - Exit handlers registered by the plugin using atexit.register() are run in reverse order of
+      registration. Exceptions they raise, other than SystemExit, are printed and do not change the
+      exit code. Exit handlers registered by the plugin host before the process was forked are not run.
+    - Globals of the plugin are released and objects it created are garbage collected, so that files
+      it left open are flushed and closed.
+    - Messages queued by the ZTP logger are written, stdout and stderr are flushed.
+    - If the plugin was interrupted by SIGINT, the process kills itself with SIGINT. Otherwise it exits
+      using os._exit() with the exit code the interpreter would use: 0 if the plugin returned, the
+      code passed to sys.exit(), 1 for a message passed to sys.exit() or an uncaught exception.
+      Interpreter finalization is not performed, it would run the exit handlers of the plugin host.
+
+    @param request (dict) Plugin argv, umask, working directory and environment
+    '''
+    import types
+    import atexit
+    import traceback
+    code = 1
+    interrupted = False
+    # Exit handlers registered by the plugin, kept apart from the ones inherited from the plugin host
+    exit_handlers = []
+    def register(func, *args, **kwargs):
+        exit_handlers.append((func, args, kwargs))
+        return func
+    def unregister(func):
+        exit_handlers[:] = [h for h in exit_handlers if h[0] != func]
+    atexit.register = register
+    atexit.unregister = unregister
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        if request.get('umask', -1) != -1:
+            os.umask(request.get('umask'))
+        os.chdir(request.get('cwd'))
+        os.environ.clear()
+        os.environ.update(request.get('env'))
+        # Plugin spans are nested under the span of ZTP service given in the request environment
+        tracer.reinit()
+        # Configuration may have changed since the plugin host started
+        import ztp.ZTPCfg
+        ztp.ZTPCfg.ztpCfg.reload()
+        logger.setLevel(getCfg('log-level') or 'INFO')
+        argv = request.get('argv')
+        sys.argv = list(argv)
+        sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+        # Plugin runs as the __main__ module, kept to release its globals once it has exited
+        main = types.ModuleType('__main__')
+        main.__file__ = argv[0]
+        main.__cached__ = None
+        sys.modules['__main__'] = main
+        try:
+            with open(argv[0], 'rb') as fh:
+                source = fh.read()
+            with profiler.profiling(profiler.pluginFile(argv[0])):
+                exec(compile(source, argv[0], 'exec'), main.__dict__)
+            code = 0
+        except SystemExit as e:
+            code = _exitCode(e)
+        except KeyboardInterrupt:
+            traceback.print_exc()
+            interrupted = True
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        # Wait for threads started by the plugin, and run its exit handlers
+        for t in threading.enumerate():
+            if t is not threading.main_thread() and not t.daemon:
+                t.join()
+        _runExitHandlers(exit_handlers)
+        # Release globals of the plugin as interpreter finalization would, then objects left in cycles
+        main.__dict__.clear()
+        gc.collect()
+        logger.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if interrupted:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGINT)
+    except SystemExit as e:
+        code = _exitCode(e)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(code & 0xff if isinstance(code, int) else 1)
+
+def _serve(fd):
+    '''!
+    Plugin host main loop. Requests are read from the socket inherited from ZTP service, one JSON object
+    per line. For each request, the process id of the plugin process and, when it exits, its wait status
+    and resource usage are sent back. Returns when the connection is closed.
+
+    @param fd (int) File descriptor of the socket connected to ZTP service
+    '''
+    # ZTP service handles termination of plugins
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for m in PRELOAD_MODULES:
+        try:
+            __import__(m)
+        except ImportError:
+            pass
+
+    sock = socket.socket(fileno=fd)
+    try:
+        with sock, sock.makefile('rb') as rfile:
+            for line in rfile:
+                try:
+                    request = json.loads(line.decode())
+                    if not isinstance(request.get('argv'), list) or len(request.get('argv')) == 0:
+                        raise ValueError('Invalid request')
+                except (ValueError, AttributeError):
+                    sock.sendall(b'{}\n')
+                    continue
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(fd)
+                    _runPlugin(request)
+                try:
+                    sock.sendall((json.dumps(dict({'pid': pid})) + '\n').encode())
+                except OSError:
+                    pass
+                (wpid, status, rusage) = os.wait4(pid, 0)
+                try:
+                    sock.sendall((json.dumps(dict({'pid': pid, 'status': status, 'usage': getRusage(rusage)})) + '\n').encode())
+                except OSError:
+                    pass
+    except ConnectionResetError:
+        # ZTP service exited without closing the connection
+        pass
+
+## Global instance of the plugin host used by ZTP service
+pluginHost = PluginHost()
+
+if __name__ == '__main__':
+    _serve(int(sys.argv[1]))
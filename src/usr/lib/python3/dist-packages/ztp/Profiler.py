@@ -0,0 +1,293 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import sys
+import time
+import shlex
+import atexit
+import signal
+import marshal
+import cProfile
+import threading
+import traceback
+import tracemalloc
+import contextlib
+
+from ztp.ZTPLib import getCfg
+from ztp.Logger import logger
+
+## Number of allocation sites reported in a stack dump when memory allocations are traced
+TRACEMALLOC_TOP = 25
+
+class Profiler:
+    '''!
+    \brief This class is used to profile ZTP service and its plugins on demand.
+
+    Below profiling data can be collected in profile-dir:
+
+      - stacks-<time>.txt: stack of all threads of ZTP service and its current activity, written on
+        SIGUSR1. When profile-tracemalloc is non-zero, memory allocations are traced using the
+        specified number of frames and the top allocation sites are added to the file.
+      - engine-<time>.prof: cProfile statistics of the main thread of ZTP service. Collection is
+        started and stopped by SIGUSR2, or started along with ZTP service if profile-engine is
+        set. Statistics being collected are written when ZTP service exits.
+      - plugin-<name>-<time>.prof: cProfile statistics of Python plugins, if profile-plugins
+        is set.
+
+    Statistics can be read using 'python3 -m pstats <file>'. Oldest files are removed so that
+    profile-dir never holds more than profile-max-files files or profile-max-size bytes.
+
+    Examples of class usage:
+
+    \code
+    profiler.install()
+    with profiler.profiling(profiler.pluginFile('/usr/lib/ztp/plugins/snmp')):
+        runpy.run_path('/usr/lib/ztp/plugins/snmp', run_name='__main__')
+    \endcode
+    '''
+
+    def __init__(self, profile_dir=None):
+        '''!
+        Constructor for the class.
+
+        @param profile_dir (str, optional) Output directory. profile-dir is used if not specified.
+        '''
+        ## Output directory
+        self.__profile_dir = profile_dir
+        ## cProfile object collecting statistics of ZTP service, None if not collecting
+        self.__profile = None
+        ## Serializes collection changes and file writes
+        self.__lock = threading.RLock()
+
+    def profileDir(self):
+        '''!
+        Return output directory.
+        '''
+        if self.__profile_dir is not None:
+            return self.__profile_dir
+        return getCfg('profile-dir')
+
+    def install(self):
+        '''!
+        Register SIGUSR1 and SIGUSR2 handlers and start the profilers enabled in the configuration.
+        It has to be called from the main thread of ZTP service.
+        '''
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.dumpStacks())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle())
+        if getCfg('profile-tracemalloc') > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(getCfg('profile-tracemalloc'))
+        if getCfg('profile-engine'):
+            self.start()
+        atexit.register(self.stop)
+
+    def collecting(self):
+        '''!
+        Check if statistics of ZTP service are being collected.
+        '''
+        return self.__profile is not None
+
+    def start(self):
+        '''!
+        Start collecting statistics of the calling thread.
+        '''
+        with self.__lock:
+            if self.__profile is None:
+                self.__profile = cProfile.Profile()
+                self.__profile.enable()
+                logger.info('Started collecting profiling statistics.')
+
+    def stop(self):
+        '''!
+        Stop collecting statistics and write them to profile-dir.
+
+        @return Name of the file written, None if statistics were not being collected
+        '''
+        with self.__lock:
+            if self.__profile is None:
+                return None
+            prof = self.__profile
+            self.__profile = None
+            prof.disable()
+            fname = self.__save(prof, 'engine-%s.prof' % self.__timestamp())
+            if fname is not None:
+                logger.info('Profiling statistics written to %s.' % fname)
+            return fname
+
+    def toggle(self):
+        '''!
+        Start collecting statistics, or stop and write them if already collecting.
+        '''
+        if self.collecting():
+            self.stop()
+        else:
+            self.start()
+
+    def dumpStacks(self, activity=None):
+        '''!
+        Write the stack of all threads, the current activity and, if memory allocations are traced,
+        the top allocation sites to profile-dir.
+
+        @param activity (str, optional) Current activity. The last recorded activity is used if not specified.
+
+        @return Name of the file written, None in case of error
+        '''
+        if activity is None:
+            from ztp.ActivityHistory import activityHistory
+            activity = activityHistory.last()
+        lines = ['Time: %s' % time.strftime('%Y-%m-%d %H:%M:%S %Z', time.localtime()),
+                 'PID: %d' % os.getpid(),
+                 'Activity: %s' % activity,
+                 'Profiling: %s' % ('collecting' if self.collecting() else 'stopped'),
+                 '']
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        for (ident, frame) in sys._current_frames().items():
+            lines.append('Thread %s (%d):' % (names.get(ident, 'unknown'), ident))
+            lines.extend(l.rstrip('\n') for l in traceback.format_stack(frame))
+            lines.append('')
+        if tracemalloc.is_tracing():
+            (current, peak) = tracemalloc.get_traced_memory()
+            lines.append('Traced memory: current %d bytes, peak %d bytes' % (current, peak))
+            for stat in tracemalloc.take_snapshot().statistics('traceback')[:TRACEMALLOC_TOP]:
+                lines.append('%d bytes in %d blocks' % (stat.size, stat.count))
+                lines.extend(stat.traceback.format())
+            lines.append('')
+        fname = self.__write('stacks-%s.txt' % self.__timestamp(), '\n'.join(lines).encode(errors='replace'))
+        if fname is not None:
+            logger.info('Thread stacks written to %s.' % fname)
+        return fname
+
+    def pluginFile(self, plugin):
+        '''!
+        Return the file receiving cProfile statistics of a Python plugin run by the calling process.
+
+        @param plugin (str) Plugin file
+
+        @return File name, None if plugins are not profiled
+        '''
+        if getCfg('profile-plugins') is not True:
+            return None
+        return os.path.join(self.profileDir(), 'plugin-%s-%s.prof' % (os.path.basename(plugin), self.__timestamp()))
+
+    def pluginCommand(self, plugin, cmd):
+        '''!
+        Return the command used to execute a plugin, which is run under cProfile if it is a Python
+        program and plugins are profiled.
+
+        @param plugin (str) Plugin file
+        @param cmd (str) Plugin command line, plugin file followed by its arguments
+        '''
+        if getCfg('profile-plugins') is not True:
+            return cmd
+        try:
+            with open(plugin, 'rb') as fh:
+                first_line = fh.readline(256)
+        except (IOError, OSError):
+            return cmd
+        if not first_line.startswith(b'#!') or b'python3' not in first_line:
+            return cmd
+        try:
+            os.makedirs(self.profileDir(), exist_ok=True)
+        except OSError:
+            return cmd
+        self.__prune(1)
+        name = 'plugin-%s-%s.prof' % (os.path.basename(plugin), self.__timestamp())
+        # python3 -m cProfile does not preserve the exit code of the program
+        return ' '.join([shlex.quote(sys.executable), '-m', 'ztp.Profiler',
+                         shlex.quote(os.path.join(self.profileDir(), name)), cmd])
+
+    @contextlib.contextmanager
+    def profiling(self, fname):
+        '''!
+        Collect cProfile statistics of the calling thread while in the context and write them to a file.
+
+        @param fname (str) Output file, nothing is collected if None
+        '''
+        if fname is None:
+            yield
+            return
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self.__save(prof, os.path.basename(fname))
+
+    def __save(self, prof, name):
+        '''!
+        Write cProfile statistics to profile-dir.
+        '''
+        try:
+            prof.create_stats()
+            return self.__write(name, marshal.dumps(prof.stats))
+        except (ValueError, TypeError) as e:
+            logger.error('Exception [%s] encountered while saving profiling statistics.' % str(e))
+            return None
+
+    def __write(self, name, data):
+        '''!
+        Write a file to profile-dir after removing oldest files to keep it bounded.
+        '''
+        with self.__lock:
+            fname = os.path.join(self.profileDir(), name)
+            try:
+                os.makedirs(self.profileDir(), exist_ok=True)
+                self.__prune(1, len(data))
+                with open(fname, 'wb') as fh:
+                    fh.write(data)
+                return fname
+            except (IOError, OSError) as e:
+                logger.error('Exception [%s] encountered while writing %s.' % (str(e), fname))
+                return None
+
+    def __prune(self, count, size=0):
+        '''!
+        Remove oldest files from profile-dir so that count more files holding size more bytes can be added.
+        '''
+        try:
+            files = [e for e in os.scandir(self.profileDir()) if e.is_file()]
+        except OSError:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in files)
+        while len(files) > 0 and (len(files) + count > getCfg('profile-max-files') or total + size > getCfg('profile-max-size')):
+            e = files.pop(0)
+            total -= e.stat().st_size
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+    def __timestamp(self):
+        '''!
+        Return current time used in file names.
+        '''
+        now = time.time()
+        return time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + '.%03d' % (int(now * 1000) % 1000)
+
+## Global instance of the profiler
+profiler = Profiler()
+
+if __name__ == '__main__':
+    # Run a Python program under cProfile: Profiler.py <output file> <program> [args]
+    import runpy
+    out_file = sys.argv[1]
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(os.path.abspath(sys.argv[0]))
+    with Profiler(os.path.dirname(out_file)).profiling(out_file):
+        runpy.run_path(sys.argv[0], run_name='__main__')
@@ -0,0 +1,313 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urlparse, unquote
+
+from ztp.ZTPObjects import URL, DynamicURL
+from ztp.JsonReader import writeJsonFile
+from ztp.ZTPLib import getCfg, getTimestamp
+from ztp.Logger import logger
+
+## Configuration section keys updated by ZTP service, they are not part of the fingerprint
+STATUS_KEYS = ['status', 'timestamp', 'start-timestamp', 'error', 'exit-code', 'timing', 'rusage', \
+               'retries', 'inline', 'always-run', 'skipped-unchanged']
+
+class SectionFingerprints:
+    '''!
+    \brief This class is used to detect configuration sections which have not changed since they
+           were last processed successfully.
+
+    The fingerprint of a configuration section is the SHA-256 hash of its data, of the plugin used
+    to process it and of the identity of each file referenced by its url and dynamic-url objects.
+    The identity of a local file is the hash of its content. The identity of a remote file is its
+    ETag, or its Last-Modified and Content-Length headers, obtained using a HEAD request. No
+    fingerprint is computed if the identity of a file cannot be determined.
+
+    Fingerprints of successful configuration sections are kept in the ztp-fingerprints file. When a
+    ZTP session completes successfully, the device state it produced, the hash of the config-db-json
+    file, is saved along with the fingerprints of its configuration sections. A configuration section
+    is unchanged only if its fingerprint matches and the device state has not changed since, so that
+    sections are processed again if the startup configuration has been removed or modified, as done
+    by 'ztp run'. Skipping unchanged configuration sections is enabled by skip-unchanged.
+
+    Examples of class usage:
+
+    \code
+    fingerprint = None
+    if sectionFingerprints.known('0001-firmware'):
+        fingerprint = sectionFingerprints.compute(section_data, plugin)
+    if sectionFingerprints.unchanged('0001-firmware', fingerprint) is False:
+        rc = runCommand(plugin)
+        if rc == 0:
+            sectionFingerprints.record('0001-firmware', fingerprint or sectionFingerprints.compute(section_data, plugin))
+    sectionFingerprints.commit(['0001-firmware'])
+    \endcode
+    '''
+
+    def __init__(self, store_file=None):
+        '''!
+        Constructor for the class.
+
+        @param store_file (str, optional) File storing fingerprints. ztp-fingerprints is used if not specified.
+        '''
+        ## File storing fingerprints
+        self.__store_file = store_file
+        ## Serializes updates of the store
+        self.__lock = threading.Lock()
+
+    def enabled(self):
+        '''!
+        Check if unchanged configuration sections are skipped.
+        '''
+        return getCfg('skip-unchanged') is True
+
+    def storeFile(self):
+        '''!
+        Return file storing fingerprints.
+        '''
+        if self.__store_file is not None:
+            return self.__store_file
+        return getCfg('ztp-fingerprints')
+
+    def compute(self, section, plugin):
+        '''!
+        Compute fingerprint of a configuration section.
+
+        @param section (dict) Configuration section data
+        @param plugin (str) Plugin file used to process the configuration section
+
+        @return Fingerprint string, None if it cannot be determined
+        '''
+        if isinstance(section, dict) is False or plugin is None:
+            return None
+        data = dict([(k, v) for (k, v) in section.items() if k not in STATUS_KEYS])
+        h = hashlib.sha256()
+        try:
+            h.update(json.dumps(data, sort_keys=True, separators=(',', ':')).encode())
+            h.update(('\0plugin\0%s\0%s' % (os.path.basename(plugin), self.__digest(plugin))).encode())
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.debug('Exception [%s] encountered while computing fingerprint of plugin %s.', str(e), plugin)
+            return None
+        # Plugin is identified by its content
+        data.pop('plugin', None)
+        for (url_type, url_data) in self.__artifacts(data):
+            identity = self.__identity(url_type, url_data)
+            if identity is None:
+                return None
+            h.update(('\0%s\0%s' % (url_type, identity)).encode())
+        return h.hexdigest()
+
+    def deviceState(self):
+        '''!
+        Return hash of the device state produced by configuration sections, the config-db-json file.
+        '''
+        try:
+            return self.__digest(getCfg('config-db-json'))
+        except (IOError, OSError):
+            return 'none'
+
+    def known(self, section_name):
+        '''!
+        Check if a configuration section may be unchanged: its fingerprint has been saved and the
+        device state has not changed since. It avoids computing fingerprints which cannot match.
+
+        @param section_name (str) Configuration section name
+        '''
+        entry = self.__read().get(section_name)
+        return isinstance(entry, dict) and entry.get('device-state') is not None and \
+               entry.get('device-state') == self.deviceState()
+
+    def unchanged(self, section_name, fingerprint):
+        '''!
+        Check if a configuration section with the given fingerprint has been processed successfully
+        and the device state has not changed since.
+
+        @param section_name (str) Configuration section name
+        @param fingerprint (str) Fingerprint of the configuration section
+        '''
+        if fingerprint is None or self.known(section_name) is False:
+            return False
+        return self.__read().get(section_name).get('fingerprint') == fingerprint
+
+    def record(self, section_name, fingerprint):
+        '''!
+        Save fingerprint of a configuration section processed successfully. It is used once the
+        device state has been saved by commit().
+
+        @param section_name (str) Configuration section name
+        @param fingerprint (str) Fingerprint of the configuration section, saved fingerprint is removed if None
+        '''
+        with self.__lock:
+            store = self.__read()
+            if fingerprint is None:
+                if store.pop(section_name, None) is None:
+                    return
+            else:
+                store[section_name] = dict({'fingerprint': fingerprint, 'timestamp': getTimestamp()})
+            self.__write(store)
+
+    def commit(self, section_names):
+        '''!
+        Save the current device state along with fingerprints of the given configuration sections.
+        Called when a ZTP session completes successfully.
+
+        @param section_names (list) Names of configuration sections processed successfully or skipped
+        '''
+        with self.__lock:
+            store = self.__read()
+            state = self.deviceState()
+            updated = False
+            for section_name in section_names:
+                entry = store.get(section_name)
+                if isinstance(entry, dict) and entry.get('device-state') != state:
+                    entry['device-state'] = state
+                    updated = True
+            if updated:
+                self.__write(store)
+
+    def forget(self, section_name):
+        '''!
+        Remove saved fingerprint of a configuration section.
+
+        @param section_name (str) Configuration section name
+        '''
+        self.record(section_name, None)
+
+    def __artifacts(self, data):
+        '''!
+        Return url and dynamic-url objects found in configuration section data, in a stable order.
+        '''
+        result = []
+        if isinstance(data, dict):
+            for k in sorted(data.keys()):
+                if k in ['url', 'dynamic-url']:
+                    result.append((k, data.get(k)))
+                else:
+                    result.extend(self.__artifacts(data.get(k)))
+        elif isinstance(data, list):
+            for v in data:
+                result.extend(self.__artifacts(v))
+        return result
+
+    def __identity(self, url_type, url_data):
+        '''!
+        Return identity of a file referenced by a url or dynamic-url object, None if it cannot be determined.
+        '''
+        try:
+            if url_type == 'dynamic-url':
+                objUrl = DynamicURL(url_data)
+            else:
+                objUrl = URL(url_data)
+            source = objUrl.getSource()
+        except (TypeError, ValueError) as e:
+            logger.debug('Exception [%s] encountered while resolving %s object.', str(e), url_type)
+            return None
+        if source is None:
+            return None
+
+        parsed = urlparse(source)
+        if parsed.scheme in ['', 'file']:
+            try:
+                return '%s sha256=%s' % (source, self.__digest(unquote(parsed.path)))
+            except (IOError, OSError):
+                return None
+
+        # Obtain response headers of the remote file
+        try:
+            (fd, hdr_file) = tempfile.mkstemp(prefix='fingerprint_', dir=getCfg('ztp-tmp'))
+            os.close(fd)
+        except OSError:
+            return None
+        try:
+            curl_args = '-I'
+            if isinstance(url_data, dict) and url_data.get('curl-arguments'):
+                curl_args = url_data.get('curl-arguments') + ' ' + curl_args
+            (rc, fname) = objUrl.objDownload.getUrl(dst_file=hdr_file, curl_args=curl_args)
+            if rc != 0:
+                return None
+            headers = self.__readHeaders(hdr_file)
+        finally:
+            if os.path.isfile(hdr_file):
+                os.remove(hdr_file)
+        if headers.get('etag'):
+            return '%s etag=%s' % (source, headers.get('etag'))
+        if headers.get('last-modified') and headers.get('content-length'):
+            return '%s last-modified=%s content-length=%s' % (source, headers.get('last-modified'), headers.get('content-length'))
+        logger.debug('Identity of %s could not be determined.', source)
+        return None
+
+    def __readHeaders(self, hdr_file):
+        '''!
+        Read response headers saved by curl. Only headers of the last response are used when
+        redirects are followed.
+
+        @return dict of lower case header names to values
+        '''
+        headers = dict()
+        try:
+            with open(hdr_file, errors='replace') as fh:
+                for line in fh:
+                    line = line.strip()
+                    if line.startswith('HTTP/'):
+                        headers = dict()
+                    elif ':' in line:
+                        (name, value) = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+        except (IOError, OSError):
+            pass
+        return headers
+
+    def __digest(self, fname):
+        '''!
+        Compute SHA-256 hash of a file.
+        '''
+        h = hashlib.sha256()
+        with open(fname, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(65536), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def __read(self):
+        '''!
+        Read saved fingerprints.
+        '''
+        try:
+            with open(self.storeFile()) as fh:
+                store = json.load(fh)
+            if isinstance(store, dict):
+                return store
+        except (IOError, OSError, ValueError):
+            pass
+        return dict()
+
+    def __write(self, store):
+        '''!
+        Save fingerprints. The file is replaced atomically.
+        '''
+        store_file = self.storeFile()
+        try:
+            writeJsonFile(store_file, store, 4)
+        except Exception as e:
+            logger.error('Exception [%s] encountered while writing section fingerprints %s.' % (str(e), store_file))
+
+## Global instance of the section fingerprint store
+sectionFingerprints = SectionFingerprints()
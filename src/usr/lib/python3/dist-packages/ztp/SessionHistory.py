@@ -0,0 +1,438 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import time
+import sqlite3
+import threading
+import contextlib
+
+from ztp.ZTPLib import getCfg, getTimestamp, get_sonic_version
+from ztp.Timeline import bootId
+from ztp.Logger import logger
+
+## Version of the database schema, stored as user_version
+SCHEMA_VERSION = 1
+
+## Statement adding time spent in a phase of a session
+PHASE_STMT = 'INSERT INTO phases (session_id, name, duration) VALUES (?, ?, ?) ' \
+             'ON CONFLICT (session_id, name) DO UPDATE SET duration = duration + excluded.duration'
+
+## Tables of the database
+SCHEMA = ['''CREATE TABLE IF NOT EXISTS sessions (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               status TEXT,
+               source TEXT,
+               version TEXT,
+               start_time TEXT,
+               end_time TEXT,
+               start_epoch REAL,
+               end_epoch REAL,
+               updated_epoch REAL,
+               boot_id TEXT,
+               reboots INTEGER DEFAULT 0,
+               restarts INTEGER DEFAULT 0)''',
+          '''CREATE TABLE IF NOT EXISTS phases (
+               session_id INTEGER,
+               name TEXT,
+               duration REAL,
+               PRIMARY KEY (session_id, name))''',
+          '''CREATE TABLE IF NOT EXISTS sections (
+               session_id INTEGER,
+               name TEXT,
+               status TEXT,
+               exit_code INTEGER,
+               attempts INTEGER,
+               duration REAL,
+               user_cpu REAL,
+               sys_cpu REAL,
+               max_rss INTEGER,
+               PRIMARY KEY (session_id, name))''',
+          '''CREATE TABLE IF NOT EXISTS downloads (
+               session_id INTEGER,
+               timestamp TEXT,
+               url TEXT,
+               exit_code INTEGER,
+               bytes INTEGER,
+               duration REAL)''']
+
+class SessionHistory:
+    '''!
+    \brief This class is used to keep a history of ZTP sessions in a SQLite database stored in
+           persistent storage. The history is not deleted by 'ztp erase', so that sessions run
+           with different images or provisioning servers can be compared.
+
+    Each session records its source, result, start and end time, image version, number of reboots
+    and discovery restarts, time spent in each phase, result and duration of each configuration
+    section, and each download along with its size and duration. Only history-max-sessions
+    sessions started in the last history-max-age days are kept.
+
+    Data is recorded only after start() has been called, in ZTP service. Until then, methods do
+    nothing so that modules shared with plugins and ZTP utilities can record data unconditionally.
+    A session is created when its first data is recorded and ends when finish() is called. Errors
+    accessing the database are logged once and disable the history, they never affect provisioning.
+    The database uses write-ahead logging and each recorded item is a single transaction.
+
+    Examples of class usage:
+
+    \code
+    sessionHistory.start(new_session=True)
+    sessionHistory.addPhase('discovery', 12.5)
+    sessionHistory.section('0001-snmp', 'SUCCESS', 0, 1.2)
+    sessionHistory.finish('SUCCESS')
+    \endcode
+    '''
+
+    def __init__(self, db_file=None):
+        '''!
+        Constructor for the class.
+
+        @param db_file (str, optional) Database file. ztp-history is used if not specified.
+        '''
+        ## Database file
+        self.__db_file = db_file
+        ## Database connection, None if the history is not recorded
+        self.__conn = None
+        ## Identifier of the session being recorded, None if none
+        self.__session_id = None
+        ## Serializes database updates, downloads are recorded by discovery threads
+        self.__lock = threading.RLock()
+
+    def start(self, new_session=False):
+        '''!
+        Start recording the history. If a session was in progress when the service stopped, it is
+        continued and the time elapsed since its last update is recorded in the 'reboot' phase if
+        the system has been rebooted since then.
+
+        @param new_session (bool, optional) End the session in progress, if any, with ABORTED status
+        '''
+        if self.__db_file is None:
+            self.__db_file = getCfg('ztp-history')
+        with self.__lock:
+            try:
+                if os.path.isdir(os.path.dirname(self.__db_file)) is False:
+                    os.makedirs(os.path.dirname(self.__db_file))
+                self.__conn = _connect(self.__db_file)
+                with self.__conn:
+                    for stmt in SCHEMA:
+                        self.__conn.execute(stmt)
+                    self.__conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+                row = self.__conn.execute('SELECT id, boot_id, updated_epoch FROM sessions WHERE end_epoch IS NULL '
+                                          'ORDER BY id DESC LIMIT 1').fetchone()
+                self.__session_id = row[0] if row is not None else None
+            except (sqlite3.Error, OSError) as e:
+                self.__disable(e)
+                return
+        if self.__session_id is None:
+            return
+        if new_session:
+            self.finish('ABORTED')
+        elif row[1] != bootId():
+            now = time.time()
+            self.__update('UPDATE sessions SET reboots = reboots + 1, boot_id = ? WHERE id = ?', (bootId(), self.__session_id))
+            self.addPhase('reboot', max(now - (row[2] or now), 0))
+
+    def stop(self):
+        '''!
+        Stop recording the history.
+        '''
+        with self.__lock:
+            if self.__conn is not None:
+                self.__conn.close()
+                self.__conn = None
+            self.__session_id = None
+
+    def enabled(self):
+        '''!
+        Check if the history is being recorded.
+        '''
+        return self.__conn is not None
+
+    def sessionId(self):
+        '''!
+        Return identifier of the session being recorded, None if none.
+        '''
+        return self.__session_id
+
+    def update(self, status=None, source=None):
+        '''!
+        Update the session being recorded.
+
+        @param status (str, optional) Session status
+        @param source (str, optional) Source of provisioning data
+        '''
+        if status is not None:
+            self.__update('UPDATE sessions SET status = ? WHERE id = ?', (status, None), create=True)
+        if source is not None:
+            self.__update('UPDATE sessions SET source = ? WHERE id = ?', (source, None), create=True)
+
+    def addPhase(self, name, duration):
+        '''!
+        Add time spent in a phase of the session being recorded.
+
+        @param name (str) Phase name
+        @param duration (float) Time in seconds
+        '''
+        self.__update(PHASE_STMT, (None, name, round(duration, 3)), create=True)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''!
+        Add time spent in the context to a phase of the session being recorded.
+
+        @param name (str) Phase name
+        '''
+        _start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.addPhase(name, time.monotonic() - _start)
+
+    def section(self, name, status, exit_code, duration, usage=None):
+        '''!
+        Record an attempt to process a configuration section. Duration and CPU time are accumulated
+        across attempts, the latest result is kept. The duration is also added to the 'sections' phase.
+
+        @param name (str) Configuration section name
+        @param status (str) Configuration section status
+        @param exit_code (int) Plugin exit code
+        @param duration (float) Time in seconds spent in this attempt
+        @param usage (dict, optional) Resource usage of the plugin process as returned by runCommand()
+        '''
+        usage = usage if isinstance(usage, dict) else dict()
+        # Both updates are done in a single transaction
+        self.__execute([('INSERT INTO sections (session_id, name, status, exit_code, attempts, duration, user_cpu, sys_cpu, max_rss) '
+                         'VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) '
+                         'ON CONFLICT (session_id, name) DO UPDATE SET status = excluded.status, exit_code = excluded.exit_code, '
+                         'attempts = attempts + 1, duration = duration + excluded.duration, '
+                         'user_cpu = user_cpu + excluded.user_cpu, sys_cpu = sys_cpu + excluded.sys_cpu, '
+                         'max_rss = max(max_rss, excluded.max_rss)',
+                         (None, name, status, exit_code, round(duration, 3), usage.get('user-cpu', 0.0),
+                          usage.get('sys-cpu', 0.0), usage.get('max-rss', 0))),
+                        (PHASE_STMT, (None, 'sections', round(duration, 3)))], create=True)
+
+    def download(self, url, exit_code, duration, size=0):
+        '''!
+        Record a download performed during the session being recorded.
+
+        @param url (str) Downloaded URL
+        @param exit_code (int) Download exit code, 0 in case of success
+        @param duration (float) Download duration in seconds
+        @param size (int, optional) Number of bytes downloaded
+        '''
+        self.__update('INSERT INTO downloads (session_id, timestamp, url, exit_code, bytes, duration) VALUES (?, ?, ?, ?, ?, ?)',
+                      (None, getTimestamp(), url, exit_code, size, round(duration, 3)), create=True)
+
+    def restart(self):
+        '''!
+        Record a restart of provisioning data discovery in the session being recorded, if any.
+        '''
+        self.__update('UPDATE sessions SET restarts = restarts + 1 WHERE id = ?', (None,))
+
+    def reboot(self):
+        '''!
+        Record a reboot requested once the last session has completed.
+        '''
+        with self.__lock:
+            if self.__conn is None:
+                return
+            try:
+                with self.__conn:
+                    self.__conn.execute('UPDATE sessions SET reboots = reboots + 1 WHERE id = (SELECT max(id) FROM sessions)')
+            except sqlite3.Error as e:
+                self.__disable(e)
+
+    def finish(self, status):
+        '''!
+        End the session being recorded, if any.
+
+        @param status (str) Session result
+        '''
+        with self.__lock:
+            if self.__session_id is None:
+                return
+            self.__update('UPDATE sessions SET status = ?, end_time = ?, end_epoch = ? WHERE id = ?',
+                          (status, getTimestamp(), time.time(), None))
+            self.__session_id = None
+            self.__prune()
+
+    def __update(self, stmt, params, create=False):
+        '''!
+        Execute a statement updating the session being recorded. None in params is replaced by its identifier.
+        '''
+        self.__execute([(stmt, params)], create)
+
+    def __execute(self, statements, create=False):
+        '''!
+        Execute statements updating the session being recorded in a single transaction. None in
+        params is replaced by its identifier.
+
+        @param statements (list) List of (statement, params) tuples
+        @param create (bool, optional) Create a new session if none is being recorded
+        '''
+        with self.__lock:
+            if self.__conn is None:
+                return
+            try:
+                with self.__conn:
+                    if self.__session_id is None:
+                        if not create:
+                            return
+                        self.__session_id = self.__create()
+                    for (stmt, params) in statements:
+                        params = tuple(self.__session_id if p is None else p for p in params)
+                        self.__conn.execute(stmt, params)
+                    self.__conn.execute('UPDATE sessions SET updated_epoch = ? WHERE id = ?', (time.time(), self.__session_id))
+            except sqlite3.Error as e:
+                self.__disable(e)
+
+    def __create(self):
+        '''!
+        Create a new session and apply retention limits.
+        '''
+        now = time.time()
+        cur = self.__conn.execute('INSERT INTO sessions (status, version, start_time, start_epoch, updated_epoch, boot_id) '
+                                  'VALUES (?, ?, ?, ?, ?, ?)', ('IN-PROGRESS', get_sonic_version(), getTimestamp(), now, now, bootId()))
+        session_id = cur.lastrowid
+        self.__prune(session_id)
+        return session_id
+
+    def __prune(self, keep=None):
+        '''!
+        Delete sessions beyond history-max-sessions and sessions started more than history-max-age days ago.
+        '''
+        try:
+            with self.__conn:
+                ids = [r[0] for r in self.__conn.execute('SELECT id FROM sessions ORDER BY id DESC LIMIT -1 OFFSET ?',
+                                                         (max(getCfg('history-max-sessions'), 1),))]
+                if getCfg('history-max-age') > 0:
+                    ids += [r[0] for r in self.__conn.execute('SELECT id FROM sessions WHERE start_epoch < ?',
+                                                              (time.time() - getCfg('history-max-age') * 86400,))]
+                for session_id in set(ids):
+                    if session_id == keep or session_id == self.__session_id:
+                        continue
+                    for table in ['phases', 'sections', 'downloads']:
+                        self.__conn.execute('DELETE FROM %s WHERE session_id = ?' % table, (session_id,))
+                    self.__conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+        except sqlite3.Error as e:
+            self.__disable(e)
+
+    def __disable(self, e):
+        '''!
+        Stop recording the history after an error.
+        '''
+        logger.warning('Exception [%s] encountered while recording ZTP session history %s. History disabled.' % (str(e), self.__db_file))
+        if self.__conn is not None:
+            try:
+                self.__conn.close()
+            except sqlite3.Error:
+                pass
+        self.__conn = None
+        self.__session_id = None
+
+def _connect(db_file, read_only=False):
+    '''!
+    Open the history database.
+    '''
+    if read_only:
+        return sqlite3.connect('file:%s?mode=ro' % db_file, uri=True, timeout=5)
+    conn = sqlite3.connect(db_file, timeout=5, check_same_thread=False)
+    # Write-ahead logging appends each transaction to a single file and synchronous=NORMAL syncs it
+    # only on checkpoints, instead of syncing the rollback journal and the database on every commit
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+def _rows(conn, query, params=()):
+    '''!
+    Return result of a query as a list of dictionaries, column names use hyphens.
+    '''
+    cur = conn.execute(query, params)
+    names = [d[0].replace('_', '-') for d in cur.description]
+    return [dict(zip(names, r)) for r in cur.fetchall()]
+
+def _session(conn, row):
+    '''!
+    Add durations, download totals and rate to a session row.
+    '''
+    end = row.get('end-epoch') if row.get('end-epoch') is not None else row.get('updated-epoch')
+    row['duration'] = round(end - row.get('start-epoch'), 3) if end is not None and row.get('start-epoch') is not None else None
+    (count, failed, size, duration) = conn.execute('SELECT count(*), coalesce(sum(exit_code != 0), 0), coalesce(sum(bytes), 0), '
+                                                   'coalesce(sum(duration), 0) FROM downloads WHERE session_id = ?',
+                                                   (row.get('id'),)).fetchone()
+    row['download-count'] = count
+    row['download-failures'] = failed
+    row['download-bytes'] = size
+    row['download-time'] = round(duration, 3)
+    row['download-rate'] = round(size / duration, 1) if duration > 0 else None
+    for k in ['start-epoch', 'end-epoch', 'updated-epoch', 'boot-id']:
+        row.pop(k, None)
+    return row
+
+def readSessions(db_file=None):
+    '''!
+    Read the sessions recorded in the history database, oldest first.
+
+    @param db_file (str, optional) Database file. ztp-history is used if not specified.
+
+    @return List of dictionaries, empty if the history is not available
+    '''
+    db_file = db_file if db_file is not None else getCfg('ztp-history')
+    if not os.path.isfile(db_file):
+        return []
+    try:
+        conn = _connect(db_file, read_only=True)
+        try:
+            return [_session(conn, r) for r in _rows(conn, 'SELECT * FROM sessions ORDER BY id')]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+
+def readSession(session_id, db_file=None):
+    '''!
+    Read a session recorded in the history database along with its phases, sections and downloads.
+
+    @param session_id (int) Session identifier
+    @param db_file (str, optional) Database file. ztp-history is used if not specified.
+
+    @return Dictionary, None if the session is not available
+    '''
+    db_file = db_file if db_file is not None else getCfg('ztp-history')
+    if not os.path.isfile(db_file):
+        return None
+    try:
+        conn = _connect(db_file, read_only=True)
+        try:
+            rows = _rows(conn, 'SELECT * FROM sessions WHERE id = ?', (session_id,))
+            if len(rows) == 0:
+                return None
+            session = _session(conn, rows[0])
+            session['phases'] = dict((r.get('name'), r.get('duration')) for r in
+                                     _rows(conn, 'SELECT name, duration FROM phases WHERE session_id = ?', (session_id,)))
+            session['sections'] = _rows(conn, 'SELECT name, status, exit_code, attempts, duration, user_cpu, sys_cpu, max_rss '
+                                              'FROM sections WHERE session_id = ? ORDER BY name', (session_id,))
+            session['downloads'] = _rows(conn, 'SELECT timestamp, url, exit_code, bytes, duration FROM downloads '
+                                                   'WHERE session_id = ? ORDER BY rowid', (session_id,))
+            return session
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+## Global instance of the ZTP session history
+sessionHistory = SessionHistory()
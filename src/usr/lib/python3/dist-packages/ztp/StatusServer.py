@@ -0,0 +1,400 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import json
+import time
+import queue
+import socket
+import threading
+import socketserver
+
+from ztp.ZTPLib import getCfg, getTimestamp
+from ztp.Logger import logger
+from ztp.ActivityHistory import activityHistory
+
+## Maximum number of events queued for a subscriber. Subscribers which do not keep up are disconnected.
+MAX_PENDING_EVENTS = 1024
+## Maximum size of a request
+MAX_REQUEST_SIZE = 65536
+
+class _Handler(socketserver.StreamRequestHandler):
+    '''!
+    \brief Handle a client connection. Each request is a JSON object on a single line.
+    '''
+
+    def handle(self):
+        server = self.server.status_server
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE)
+            if not line:
+                return
+            try:
+                request = json.loads(line.decode())
+                if not isinstance(request, dict):
+                    raise ValueError('Request must be a JSON object')
+            except ValueError as e:
+                self.__send(dict({'error': 'Invalid request: %s' % str(e)}))
+                continue
+            if request.get('request') == 'subscribe':
+                server.serveSubscriber(self.__send)
+                return
+            if self.__send(server.handle(request)) is False:
+                return
+
+    def __send(self, data):
+        '''!
+        Send a JSON object on a single line, return False if the client has disconnected.
+        '''
+        try:
+            self.wfile.write((json.dumps(data) + '\n').encode())
+            self.wfile.flush()
+        except (IOError, OSError):
+            return False
+        return True
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class StatusServer:
+    '''!
+    \brief This class is used by ZTP service to serve its status on a Unix domain socket.
+
+    Clients send requests as JSON objects, one per line, and receive one JSON object per line
+    in response. Below requests are supported:
+
+      - {"request": "state"} : ZTP service state, activity, configuration sections and downloads in progress
+      - {"request": "sections"} : Status of configuration sections
+      - {"request": "downloads"} : Downloads in progress
+      - {"request": "activity", "message": "..."} : Update current activity, used by plugins
+      - {"request": "subscribe"} : Stream events as newline delimited JSON. The first event is
+        a "state" event carrying the response to a "state" request.
+
+    Each event is a JSON object with "event", "timestamp" and "data" members. Events are only
+    published after start() has been called. In other processes, activity updates are forwarded
+    to ZTP service using the socket.
+
+    Examples of class usage:
+
+    \code
+    statusServer.provide(lambda: {'status': 'BOOT', 'sections': dict()})
+    statusServer.start()
+    statusServer.publish('section-status', {'section': '0001-snmp', 'status': 'SUCCESS'})
+    \endcode
+    '''
+
+    def __init__(self, socket_file=None):
+        '''!
+        Constructor for the class.
+
+        @param socket_file (str, optional) Unix domain socket file. ztp-status-socket is used if not specified.
+        '''
+        ## Unix domain socket file
+        self.__socket_file = socket_file
+        ## Socket server, None if not started
+        self.__server = None
+        ## Function returning ZTP status
+        self.__provider = None
+        ## Event queues of subscribers
+        self.__subscribers = []
+        ## Last activity reported
+        self.__activity = None
+        ## Downloads in progress: url -> download information
+        self.__downloads = dict()
+        ## Protects subscribers, activity and downloads
+        self.__lock = threading.Lock()
+
+    def socketFile(self):
+        '''!
+        Return Unix domain socket file.
+        '''
+        if self.__socket_file is None:
+            return getCfg('ztp-status-socket')
+        return self.__socket_file
+
+    def start(self):
+        '''!
+        Start serving requests on the Unix domain socket.
+
+        @return True if the socket server has been started
+        '''
+        if self.__server is not None:
+            return True
+        socket_file = self.socketFile()
+        try:
+            if os.path.exists(socket_file):
+                os.remove(socket_file)
+            server = _UnixServer(socket_file, _Handler)
+            os.chmod(socket_file, 0o600)
+        except (IOError, OSError) as e:
+            logger.warning('Exception [%s] encountered while creating status socket %s.' % (str(e), socket_file))
+            return False
+        server.status_server = self
+        self.__server = server
+        threading.Thread(target=server.serve_forever, name='ztp-status-server', daemon=True).start()
+        return True
+
+    def stop(self):
+        '''!
+        Stop serving requests. Subscribers are disconnected and the socket file is removed.
+        '''
+        if self.__server is None:
+            return
+        server = self.__server
+        self.__server = None
+        with self.__lock:
+            for q in self.__subscribers:
+                try:
+                    q.put_nowait(None)
+                except queue.Full:
+                    pass
+            self.__subscribers = []
+        server.shutdown()
+        server.server_close()
+        try:
+            os.remove(server.server_address)
+        except OSError:
+            pass
+
+    def running(self):
+        '''!
+        Check if the socket server is running in this process.
+        '''
+        return self.__server is not None
+
+    def provide(self, provider):
+        '''!
+        Register function returning ZTP status. It is called from the threads serving requests.
+
+        @param provider (function) Function returning a dict with ZTP status and a "sections" dict
+        '''
+        self.__provider = provider
+
+    def publish(self, event, data=None):
+        '''!
+        Publish an event to subscribers.
+
+        @param event (str) Event name
+        @param data (dict, optional) Event data
+        '''
+        if self.__server is None:
+            return
+        entry = dict({'event': event, 'timestamp': getTimestamp(), 'data': data})
+        with self.__lock:
+            for q in list(self.__subscribers):
+                try:
+                    q.put_nowait(entry)
+                except queue.Full:
+                    # Subscriber does not keep up, disconnect it
+                    self.__subscribers.remove(q)
+                    q.queue.clear()
+                    q.put_nowait(None)
+
+    def activity(self, message):
+        '''!
+        Report current activity of ZTP service. Activity reported by other processes is forwarded to
+        ZTP service if it is running, without waiting for ZTP service to process it.
+
+        @param message (str) Activity description
+        '''
+        if self.__server is None:
+            post(dict({'request': 'activity', 'message': message}), self.socketFile())
+            return
+        with self.__lock:
+            self.__activity = dict({'timestamp': getTimestamp(), 'message': message})
+        self.publish('activity', dict({'message': message}))
+
+    def downloadStarted(self, url, dst_file=None):
+        '''!
+        Report start of a download.
+
+        @param url (str) URL being downloaded
+        @param dst_file (str, optional) Destination file
+        '''
+        if self.__server is None:
+            return
+        with self.__lock:
+            self.__downloads[url] = dict({'url': url, 'dst-file': dst_file, 'start-timestamp': getTimestamp(), 'start': time.monotonic()})
+        self.publish('download-start', dict({'url': url, 'dst-file': dst_file}))
+
+    def downloadFinished(self, url, rc):
+        '''!
+        Report end of a download.
+
+        @param url (str) URL downloaded
+        @param rc (int) Download result, 0 on success
+        '''
+        if self.__server is None:
+            return
+        with self.__lock:
+            entry = self.__downloads.pop(url, None)
+        duration = round(time.monotonic() - entry.get('start'), 3) if entry is not None else None
+        self.publish('download-end', dict({'url': url, 'exit-code': rc, 'duration': duration}))
+
+    def downloads(self):
+        '''!
+        Return list of downloads in progress.
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            return [dict({'url': d.get('url'), 'dst-file': d.get('dst-file'), 'start-timestamp': d.get('start-timestamp'),
+                          'elapsed': round(now - d.get('start'), 3)}) for d in self.__downloads.values()]
+
+    def state(self):
+        '''!
+        Return ZTP service state.
+        '''
+        status = self.__provider() if self.__provider is not None else dict()
+        result = dict({'pid': os.getpid()})
+        result.update(status)
+        result.setdefault('sections', dict())
+        with self.__lock:
+            result['activity'] = self.__activity
+        result['downloads'] = self.downloads()
+        return result
+
+    def handle(self, request):
+        '''!
+        Handle a request and return the response.
+
+        @param request (dict) Request
+        '''
+        try:
+            name = request.get('request')
+            if name == 'state':
+                return self.state()
+            elif name == 'sections':
+                return self.state().get('sections')
+            elif name == 'downloads':
+                return self.downloads()
+            elif name == 'activity' and isinstance(request.get('message'), str):
+                activityHistory.record(request.get('message'))
+                self.activity(request.get('message'))
+                return dict({'result': 'ok'})
+            return dict({'error': 'Unknown request %s' % str(name)})
+        except Exception as e:
+            return dict({'error': 'Exception [%s] encountered while processing request.' % str(e)})
+
+    def serveSubscriber(self, send):
+        '''!
+        Stream events to a subscriber till it disconnects or the server is stopped.
+
+        @param send (function) Function sending an event to the subscriber, returning False on failure
+        '''
+        q = queue.Queue(MAX_PENDING_EVENTS)
+        with self.__lock:
+            if self.__server is None:
+                return
+            self.__subscribers.append(q)
+        try:
+            if send(dict({'event': 'state', 'timestamp': getTimestamp(), 'data': self.handle(dict({'request': 'state'}))})) is False:
+                return
+            while True:
+                entry = q.get()
+                if entry is None or send(entry) is False:
+                    return
+        finally:
+            with self.__lock:
+                if q in self.__subscribers:
+                    self.__subscribers.remove(q)
+
+def _connect(socket_file, timeout):
+    '''!
+    Connect to the status socket of ZTP service.
+    '''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_file)
+    except (IOError, OSError):
+        sock.close()
+        raise
+    return sock
+
+def query(request, socket_file=None, timeout=5):
+    '''!
+    Send a request to ZTP service.
+
+    @param request (dict) Request
+    @param socket_file (str, optional) Unix domain socket file. ztp-status-socket is used if not specified.
+    @param timeout (float, optional) Time in seconds to wait for the response
+
+    @return Response, None if ZTP service could not be reached
+    '''
+    if socket_file is None:
+        socket_file = getCfg('ztp-status-socket')
+    try:
+        sock = _connect(socket_file, timeout)
+    except (IOError, OSError):
+        return None
+    try:
+        with sock, sock.makefile('rwb') as fh:
+            fh.write((json.dumps(request) + '\n').encode())
+            fh.flush()
+            line = fh.readline()
+        return json.loads(line.decode()) if line else None
+    except (IOError, OSError, ValueError):
+        return None
+
+def post(request, socket_file=None):
+    '''!
+    Send a request to ZTP service without waiting for the response. The request is dropped if it
+    can't be sent right away.
+
+    @param request (dict) Request
+    @param socket_file (str, optional) Unix domain socket file. ztp-status-socket is used if not specified.
+
+    @return True if the request has been sent
+    '''
+    if socket_file is None:
+        socket_file = getCfg('ztp-status-socket')
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.setblocking(False)
+            sock.connect(socket_file)
+            sock.sendall((json.dumps(request) + '\n').encode())
+    except (IOError, OSError, ValueError):
+        return False
+    return True
+
+def subscribe(socket_file=None):
+    '''!
+    Subscribe to events published by ZTP service.
+
+    @param socket_file (str, optional) Unix domain socket file. ztp-status-socket is used if not specified.
+
+    @return Generator of events, it ends when ZTP service exits. None if ZTP service could not be reached.
+    '''
+    if socket_file is None:
+        socket_file = getCfg('ztp-status-socket')
+    try:
+        sock = _connect(socket_file, 5)
+        sock.sendall((json.dumps(dict({'request': 'subscribe'})) + '\n').encode())
+        sock.settimeout(None)
+    except (IOError, OSError):
+        return None
+    def _events():
+        with sock, sock.makefile('rb') as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line.decode())
+                except ValueError:
+                    continue
+    return _events()
+
+## Global instance of the status server of ZTP service
+statusServer = StatusServer()
@@ -0,0 +1,194 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import time
+
+from ztp.ZTPLib import getCfg, getTimestamp
+from ztp.JsonReader import JsonReader, writeJsonFile
+from ztp.Logger import logger
+
+## File providing an identifier which changes on every boot
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+def bootTime():
+    '''!
+    Return time in seconds elapsed since boot, including time spent in suspend.
+    '''
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+def bootId():
+    '''!
+    Return identifier of the current boot, None if it is not available.
+    '''
+    try:
+        with open(BOOT_ID_FILE) as fh:
+            return fh.readline().strip()
+    except IOError:
+        return None
+
+class Timeline:
+    '''!
+    \brief This class is used to record milestones of a ZTP session relative to system boot. The
+           timeline is saved in persistent storage so that it spans reboots performed during the
+           ZTP session.
+
+    Events are recorded only after start() has been called. Until then, mark() does nothing so that
+    modules shared with ZTP utilities can record milestones unconditionally.
+
+    Recorded events are saved in the ztp-timeline-volatile file, which does not survive a reboot. They
+    are saved to persistent storage, in the ztp-timeline file, only by checkpoint(), before a reboot and
+    when the ZTP session is completed. Only the last timeline-max-entries events are kept.
+
+    Examples of class usage:
+
+    \code
+    timeline.start(new_session=True)
+    timeline.mark('profile-installed')
+    timeline.mark('link-up', 'Ethernet0', once=True)
+    timeline.checkpoint()
+    \endcode
+    '''
+
+    def __init__(self, timeline_file=None, volatile_file=None):
+        '''!
+        Constructor for the class.
+
+        @param timeline_file (str, optional) File used to save the timeline. ztp-timeline is used if not specified.
+        @param volatile_file (str, optional) File used to save the timeline till the next checkpoint.
+                             ztp-timeline-volatile is used if not specified.
+        '''
+        ## File used to save the timeline
+        self.__timeline_file = timeline_file
+        ## File used to save the timeline till the next checkpoint
+        self.__volatile_file = volatile_file
+        ## Timeline data
+        self.__data = None
+        ## Events recorded since the last checkpoint
+        self.__dirty = False
+        ## Time since boot at which the service was started, recorded along with the first event
+        self.__start_time = None
+
+    def start(self, new_session=False):
+        '''!
+        Start recording events of the timeline. The service start event is recorded along with the
+        first event of this service instance.
+
+        @param new_session (bool, optional) Discard events recorded by a previous ZTP session
+        '''
+        self.__start_time = bootTime()
+        self.__load()
+        if new_session:
+            self.reset()
+
+    def reset(self):
+        '''!
+        Discard recorded events, when a new ZTP session is started.
+        '''
+        if self.__data is not None and len(self.__data['timeline']) != 0:
+            self.__data = dict({'timeline': []})
+            self.__save()
+
+    def events(self):
+        '''!
+        Return list of recorded events.
+        '''
+        if self.__data is None:
+            return []
+        return list(self.__data['timeline'])
+
+    def mark(self, event, detail=None, once=False):
+        '''!
+        Record an event of the timeline.
+
+        @param event (str) Event name
+        @param detail (str, optional) Additional information about the event
+        @param once (bool, optional) Record the event only if it has not been recorded already
+        '''
+        if self.__data is None:
+            return
+        events = self.__data['timeline']
+        if once and any(e.get('event') == event for e in events):
+            return
+        if self.__start_time is not None:
+            events.append(self.__event('service-start', None, self.__start_time))
+            self.__start_time = None
+        events.append(self.__event(event, detail, bootTime()))
+        # Discard oldest events, e.g. when discovery is restarted repeatedly
+        max_entries = max(getCfg('timeline-max-entries'), 1)
+        if len(events) > max_entries:
+            self.__data['dropped'] = self.__data.get('dropped', 0) + len(events) - max_entries
+            del events[:len(events) - max_entries]
+        self.__save()
+
+    def checkpoint(self):
+        '''!
+        Save events recorded since the last checkpoint to persistent storage. Used before a system
+        reboot and when the ZTP session is completed.
+        '''
+        if self.__data is None or self.__dirty is False:
+            return
+        try:
+            writeJsonFile(self.__timeline_file, self.__data, 4)
+            self.__dirty = False
+        except Exception as e:
+            logger.warning('Exception [%s] encountered while saving ZTP timeline %s.' % (str(e), self.__timeline_file))
+
+    def __event(self, event, detail, boot_time):
+        '''!
+        Create an event record.
+        '''
+        entry = dict({'event': event, 'boot-id': bootId(), 'boot-time': round(boot_time, 3), 'timestamp': getTimestamp()})
+        if detail is not None:
+            entry['detail'] = str(detail)
+        return entry
+
+    def __load(self):
+        '''!
+        Load timeline saved by a previous instance of the service. Events saved in the volatile file
+        are used if the service is restarted without a reboot.
+        '''
+        if self.__timeline_file is None:
+            self.__timeline_file = getCfg('ztp-timeline')
+        if self.__volatile_file is None:
+            self.__volatile_file = getCfg('ztp-timeline-volatile')
+        self.__data = None
+        self.__dirty = False
+        for fname in [self.__volatile_file, self.__timeline_file]:
+            if os.path.isfile(fname):
+                try:
+                    (objJson, self.__data) = JsonReader(fname, indent=4)
+                except Exception as e:
+                    logger.warning('Exception [%s] encountered while reading ZTP timeline %s.' % (str(e), fname))
+                    self.__data = None
+                if isinstance(self.__data, dict) and isinstance(self.__data.get('timeline'), list):
+                    self.__dirty = (fname == self.__volatile_file)
+                    return
+        self.__data = dict({'timeline': []})
+
+    def __save(self):
+        '''!
+        Save timeline to the volatile file, it is saved to persistent storage by checkpoint().
+        '''
+        self.__dirty = True
+        try:
+            writeJsonFile(self.__volatile_file, self.__data, 4)
+        except Exception as e:
+            logger.warning('Exception [%s] encountered while saving ZTP timeline %s.' % (str(e), self.__volatile_file))
+
+## Global instance of the ZTP session timeline
+timeline = Timeline()
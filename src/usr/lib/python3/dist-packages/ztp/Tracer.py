@@ -0,0 +1,427 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import sys
+import re
+import json
+import time
+import threading
+import functools
+import weakref
+
+## Environment variable used to propagate trace context to child processes (W3C Trace Context)
+TRACEPARENT = 'TRACEPARENT'
+## Name of the service recorded in spans
+SERVICE_NAME = 'sonic-ztp'
+
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+## Tracer instances, the trace context they inherited is reset in child processes created using fork()
+_instances = weakref.WeakSet()
+
+def _afterFork():
+    for t in list(_instances):
+        t._afterFork()
+
+os.register_at_fork(after_in_child=_afterFork)
+
+class Span:
+    '''!
+    \brief This class represents an operation being traced. A span is started when entering
+           its context, or using begin(), and is written to the trace file when it ends.
+           Spans started while another span is in progress in the same thread are nested
+           under it.
+
+    Examples of class usage:
+
+    \code
+    with tracer.span('download', {'url': url}) as span:
+        rc = download(url)
+        span.set('exit-code', rc)
+    \endcode
+    '''
+
+    def __init__(self, tracer, name, attributes=None, parent=None):
+        '''!
+        Constructor for the class.
+
+        @param tracer (Tracer) Tracer writing the span, None if tracing is disabled
+        @param name (str) Span name
+        @param attributes (dict, optional) Span attributes
+        @param parent (Span, optional) Parent span. Span in progress in the current thread is used if not specified.
+        '''
+        ## Tracer writing the span
+        self.__tracer = tracer
+        ## Span data
+        self.__data = None
+        ## Monotonic clock reading at start of span
+        self.__start = None
+        if tracer is not None:
+            if parent is None:
+                parent = tracer.current()
+            self.__data = dict({'name': name,
+                                'trace_id': parent.traceId() if parent is not None else tracer.traceId(),
+                                'span_id': os.urandom(8).hex(),
+                                'parent_span_id': parent.spanId() if parent is not None else tracer.parentSpanId(),
+                                'attributes': dict(attributes) if attributes is not None else dict()})
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and exc_type is not SystemExit:
+            self.error('%s: %s' % (exc_type.__name__, str(exc_value)))
+        self.end()
+
+    def traceId(self):
+        '''!
+        Return trace identifier, None if tracing is disabled.
+        '''
+        return self.__data.get('trace_id') if self.__data is not None else None
+
+    def spanId(self):
+        '''!
+        Return span identifier, None if tracing is disabled.
+        '''
+        return self.__data.get('span_id') if self.__data is not None else None
+
+    def set(self, key, value):
+        '''!
+        Set an attribute of the span.
+
+        @param key (str) Attribute name
+        @param value (str, int, float or bool) Attribute value
+        '''
+        if self.__data is not None:
+            self.__data['attributes'][key] = value
+
+    def error(self, message):
+        '''!
+        Mark the span as failed.
+
+        @param message (str) Error description
+        '''
+        if self.__data is not None:
+            self.__data['status'] = dict({'code': 'ERROR', 'message': message})
+
+    def environ(self):
+        '''!
+        Return environment to be used by a child process so that its spans are nested under this span.
+        None if tracing is disabled, meaning that the environment of the current process has to be used.
+        '''
+        if self.__data is None:
+            return None
+        env = dict(os.environ)
+        env[TRACEPARENT] = '00-%s-%s-01' % (self.traceId(), self.spanId())
+        return env
+
+    def begin(self):
+        '''!
+        Start the span and make it the span in progress in the current thread.
+        '''
+        if self.__data is not None and self.__start is None:
+            self.__data['start_time_unix_nano'] = time.time_ns()
+            self.__start = time.monotonic_ns()
+            self.__tracer.push(self)
+        return self
+
+    def end(self):
+        '''!
+        End the span and write it to the trace file.
+        '''
+        if self.__data is not None and self.__start is not None:
+            self.__data['end_time_unix_nano'] = self.__data['start_time_unix_nano'] + (time.monotonic_ns() - self.__start)
+            self.__data.setdefault('status', dict({'code': 'OK'}))
+            self.__tracer.pop(self)
+            self.__tracer.write(self.__data)
+            self.__start = None
+
+class Tracer:
+    '''!
+    \brief This class is used to record spans covering the operations performed by ZTP service
+           and its plugins. Spans are appended as JSON lines to the trace file.
+
+    Tracing is enabled in ZTP service using start(). Processes started by ZTP service inherit the
+    trace context through the TRACEPARENT environment variable, tracing is enabled in them as soon
+    as it is present. The trace context is read again whenever TRACEPARENT changes and in child
+    processes created using fork().
+
+    Examples of class usage:
+
+    \code
+    tracer.start()
+    with tracer.span('discover'):
+        discover()
+    \endcode
+    '''
+
+    def __init__(self, trace_file=None):
+        '''!
+        Constructor for the class.
+
+        @param trace_file (str, optional) Trace file. trace-file is used if not specified.
+        '''
+        ## Trace file
+        self.__trace_file = trace_file
+        ## Flag to indicate that tracing has been enabled using start()
+        self.__started = False
+        ## Value of TRACEPARENT the trace context was last read from
+        self.__traceparent = None
+        ## Flag to indicate that tracing is enabled
+        self.__enabled = False
+        ## Trace identifier used by spans without parent
+        self.__trace_id = None
+        ## Span identifier of the parent process span, if any
+        self.__parent_span_id = None
+        ## Spans in progress, per thread
+        self.__local = threading.local()
+        _instances.add(self)
+
+    def start(self, trace_id=None):
+        '''!
+        Enable tracing in ZTP service. A new trace is started and the trace file is rotated
+        if it has grown beyond trace-max-size bytes.
+
+        @param trace_id (str, optional) Trace identifier, a new one is generated if not specified
+        '''
+        from ztp.ZTPLib import getCfg
+        if self.__trace_file is None:
+            self.__trace_file = getCfg('trace-file')
+        self.__started = True
+        self.__enabled = self.__trace_file is not None and self.__trace_file != ''
+        self.__trace_id = trace_id if trace_id is not None else os.urandom(16).hex()
+        self.__parent_span_id = None
+        if self.__enabled:
+            try:
+                if os.path.getsize(self.__trace_file) > getCfg('trace-max-size'):
+                    os.replace(self.__trace_file, self.__trace_file + '.1')
+            except OSError:
+                pass
+
+    def enabled(self):
+        '''!
+        Check if tracing is enabled.
+        '''
+        if self.__started is False and os.environ.get(TRACEPARENT) != self.__traceparent:
+            self.__inherit()
+        return self.__enabled
+
+    def reinit(self):
+        '''!
+        Forget the trace context inherited from the parent process, it is read again from
+        TRACEPARENT on next use. Tracing enabled using start() is not affected.
+        '''
+        if self.__started is False:
+            self.__traceparent = None
+            self.__enabled = False
+            self.__trace_id = None
+            self.__parent_span_id = None
+            self.__local = threading.local()
+
+    def _afterFork(self):
+        '''!
+        Reset the inherited trace context in a child process created using fork(). The child
+        process may be given a different TRACEPARENT than the one its parent had.
+        '''
+        self.reinit()
+
+    def traceId(self):
+        '''!
+        Return trace identifier used by spans without parent.
+        '''
+        return self.__trace_id
+
+    def parentSpanId(self):
+        '''!
+        Return span identifier of the span of the parent process, None if none.
+        '''
+        return self.__parent_span_id
+
+    def span(self, name, attributes=None, parent=None):
+        '''!
+        Create a span. The span is started when entering its context or using Span.begin().
+
+        @param name (str) Span name
+        @param attributes (dict, optional) Span attributes
+        @param parent (Span, optional) Parent span. Span in progress in the current thread is used if not specified.
+
+        @return Span object
+        '''
+        return Span(self if self.enabled() else None, name, attributes, parent)
+
+    def traced(self, name):
+        '''!
+        Decorator which records a span covering each call of the decorated function.
+
+        @param name (str) Span name
+        '''
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current(self):
+        '''!
+        Return span in progress in the current thread, None if none.
+        '''
+        stack = getattr(self.__local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return None
+
+    def push(self, span):
+        '''!
+        Make a span the span in progress in the current thread.
+        '''
+        if getattr(self.__local, 'stack', None) is None:
+            self.__local.stack = []
+        self.__local.stack.append(span)
+
+    def pop(self, span):
+        '''!
+        Remove a span from the spans in progress in the current thread.
+        '''
+        stack = getattr(self.__local, 'stack', None)
+        if stack and span in stack:
+            stack.remove(span)
+
+    def write(self, data):
+        '''!
+        Append a span to the trace file. Each span is written using a single write so that spans
+        written concurrently by ZTP service and its plugins are not interleaved.
+
+        @param data (dict) Span data
+        '''
+        data['resource'] = dict({'service.name': SERVICE_NAME, 'process.pid': os.getpid(), 'thread.id': threading.get_native_id()})
+        line = json.dumps(data, sort_keys=True) + '\n'
+        try:
+            fd = os.open(self.__trace_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    def __inherit(self):
+        '''!
+        Enable tracing if trace context has been provided by the parent process.
+        '''
+        self.__traceparent = os.environ.get(TRACEPARENT)
+        self.__enabled = False
+        self.__trace_id = None
+        self.__parent_span_id = None
+        match = _TRACEPARENT_RE.match(self.__traceparent or '')
+        if match is None:
+            return
+        try:
+            from ztp.ZTPLib import getCfg
+            if self.__trace_file is None:
+                self.__trace_file = getCfg('trace-file')
+        except Exception:
+            return
+        if self.__trace_file is None or self.__trace_file == '':
+            return
+        self.__trace_id = match.group(1)
+        self.__parent_span_id = match.group(2)
+        self.__enabled = True
+
+## Global instance of the tracer
+tracer = Tracer()
+
+def readSpans(trace_file):
+    '''!
+    Read spans from a trace file.
+
+    @param trace_file (str) Trace file
+
+    @return List of spans. Lines which could not be parsed are skipped.
+    '''
+    spans = []
+    with open(trace_file) as fh:
+        for l in fh:
+            try:
+                span = json.loads(l)
+            except ValueError:
+                continue
+            if isinstance(span, dict) and span.get('start_time_unix_nano') is not None:
+                spans.append(span)
+    return spans
+
+def chromeTrace(spans):
+    '''!
+    Convert spans to Chrome trace event format, which can be loaded in chrome://tracing or Perfetto.
+
+    @param spans (list) List of spans
+
+    @return dict in Chrome trace event format
+    '''
+    events = []
+    for s in spans:
+        resource = s.get('resource', dict())
+        args = dict(s.get('attributes', dict()))
+        args.update({'trace_id': s.get('trace_id'), 'span_id': s.get('span_id'), 'parent_span_id': s.get('parent_span_id')})
+        if s.get('status', dict()).get('code') == 'ERROR':
+            args['error'] = s.get('status').get('message')
+        events.append(dict({'name': s.get('name'),
+                            'cat': 'ztp',
+                            'ph': 'X',
+                            'ts': s.get('start_time_unix_nano') / 1000.0,
+                            'dur': (s.get('end_time_unix_nano', s.get('start_time_unix_nano')) - s.get('start_time_unix_nano')) / 1000.0,
+                            'pid': resource.get('process.pid', 0),
+                            'tid': resource.get('thread.id', 0),
+                            'args': args}))
+    events.sort(key=lambda e: (e['ts'], -e['dur']))
+    return dict({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+def usage():
+    '''!
+    Display usage of the trace converter.
+    '''
+    print('Usage: python3 -m ztp.Tracer <trace-file> [<chrome-trace-file>]')
+    print('')
+    print('Convert ZTP trace file to Chrome trace event format, written to standard output if')
+    print('no output file is specified.')
+
+def main(argv):
+    '''!
+    Convert a trace file to Chrome trace event format.
+
+    @param argv (list) Command line arguments
+    '''
+    if len(argv) < 1 or len(argv) > 2:
+        usage()
+        return 1
+    try:
+        trace = chromeTrace(readSpans(argv[0]))
+        if len(argv) == 2:
+            with open(argv[1], 'w') as fh:
+                json.dump(trace, fh)
+        else:
+            json.dump(trace, sys.stdout)
+            print('')
+    except (IOError, OSError) as e:
+        print('Error! Exception[%s] occured while converting %s.' % (str(e), argv[0]))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
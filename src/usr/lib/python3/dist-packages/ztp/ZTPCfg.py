@@ -17,8 +17,10 @@ limitations under the License.
 
 import sys
 import os
+import threading
 
 from ztp.JsonReader import JsonReader
+from ztp.Inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO
 from ztp.defaults import *
 
 try:        # pragma: no cover
@@ -47,6 +49,83 @@ except NameError:
         '''
         return isinstance(strVal, str)
 
+class CfgSnapshot:
+
+    '''!
+    \brief This class is an immutable view of ZTP configuration.
+
+    Values of all configuration items are computed once from the default configuration and the
+    configuration file, using the data type of the default value, so that a lookup is a single
+    dictionary access. Items can also be accessed as attributes, using '_' in place of '-'.
+    An item whose value has an invalid data type has the value None and is reported by invalidKeys().
+
+    Examples of class usage:
+
+    \code
+    snapshot = ztpCfg.snapshot()
+    interval = snapshot.get('discovery-interval')
+    interval = snapshot.discovery_interval
+    \endcode
+    '''
+
+    def __init__(self, cfg_dict=None):
+        '''!
+        Constructor for the class.
+
+        @param cfg_dict (dict, optional) Configuration items read from the configuration file
+        '''
+        from ztp.ZTPLib import getValue
+        values = dict()
+        invalid = []
+        if not isinstance(cfg_dict, dict):
+            cfg_dict = dict()
+        for key in set(defaultCfg) | set(cfg_dict):
+            val = cfg_dict.get(key)
+            default = defaultCfg.get(key)
+            if val is None:
+                if default is not None:
+                    values[key] = default
+            elif default is not None:
+                values[key] = getValue(val, type(default))
+                if values[key] is None:
+                    invalid.append(key)
+            else:
+                values[key] = val
+        object.__setattr__(self, '_CfgSnapshot__values', values)
+        object.__setattr__(self, '_CfgSnapshot__invalid', sorted(invalid))
+        # Attributes are stored in the instance dictionary so that attribute lookups do not go through __getattr__
+        for (key, val) in values.items():
+            name = key.replace('-', '_')
+            if name.isidentifier() and not name.startswith('_') and not hasattr(CfgSnapshot, name):
+                self.__dict__[name] = val
+
+    def get(self, key, default_value=None):
+        '''!
+        Return the value of a configuration item.
+
+        @param key (str) Key for the particular configuration item
+        @param default_value Value returned if the configuration item is not defined
+        '''
+        return self.__values.get(key, default_value)
+
+    def invalidKeys(self):
+        '''!
+        Return the list of configuration items whose value has an invalid data type.
+        '''
+        return list(self.__invalid)
+
+    def __getattr__(self, name):
+        key = name.replace('_', '-')
+        if key in self.__values:
+            return self.__values[key]
+        raise AttributeError("Configuration item %s is not defined" % key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Configuration snapshot is immutable")
+
+    def __contains__(self, key):
+        return key in self.__values
+
 class ZTPCfg:
 
     '''!
@@ -89,6 +168,11 @@ class ZTPCfg:
             self.__cfg_json_file = cfg_file
 
         self.__objJson, self.json_dict = (None, None)
+        ## Snapshot of configuration, built on first use
+        self.__snapshot = None
+        ## Thread watching changes of the configuration file
+        self.__watcher = None
+        self.__indent = indent
 
         try:
             if os.path.isfile(self.__cfg_json_file) is False:
@@ -113,6 +197,70 @@ class ZTPCfg:
                 print("Unexpected error reading json file %s" % (self.__cfg_json_file))
                 self.__objJson, self.json_dict = (None, None)
 
+    def snapshot(self):
+        '''!
+        Return a snapshot of the configuration. A new snapshot is built when the configuration changes,
+        snapshots returned earlier are not modified.
+        '''
+        snapshot = self.__snapshot
+        if snapshot is None:
+            snapshot = CfgSnapshot(self.json_dict)
+            self.__snapshot = snapshot
+        return snapshot
+
+    def reload(self):
+        '''!
+        Read the configuration file again and replace the configuration snapshot. The current
+        configuration is kept if the file can't be read or fails validation, as done by validateZtpCfg().
+
+        @return True if the configuration has been reloaded
+        '''
+        try:
+            (objJson, json_dict) = JsonReader(self.__cfg_json_file, indent=self.__indent)
+        except Exception as ex:
+            return False
+        if not isinstance(json_dict, dict):
+            return False
+        snapshot = CfgSnapshot(json_dict)
+        if len(snapshot.invalidKeys()) != 0:
+            print("Invalid data type used for %s in configuration file %s, configuration not reloaded" % \
+                  (', '.join(snapshot.invalidKeys()), self.__cfg_json_file))
+            return False
+        self.__objJson, self.json_dict = (objJson, json_dict)
+        self.__snapshot = snapshot
+        return True
+
+    def watch(self, callback=None):
+        '''!
+        Reload the configuration when the configuration file changes. Changes are detected using inotify
+        by a background thread.
+
+        @param callback (function, optional) Function called with the new snapshot after the configuration
+                                             has been reloaded
+
+        @return True if the configuration file is being watched
+        '''
+        if self.__watcher is not None:
+            return True
+        try:
+            objInotify = Inotify()
+            objInotify.addWatch(os.path.dirname(os.path.abspath(self.__cfg_json_file)), IN_CLOSE_WRITE | IN_MOVED_TO)
+        except (AttributeError, OSError) as ex:
+            print("Exception [%s] occurred watching configuration file %s" % (str(ex), self.__cfg_json_file))
+            return False
+        name = os.path.basename(self.__cfg_json_file)
+        def _watch():
+            while True:
+                events = objInotify.read()
+                if any(e[2] == name for e in events) and self.reload() and callback is not None:
+                    try:
+                        callback(self.__snapshot)
+                    except Exception as ex:
+                        print("Exception [%s] occurred applying configuration file %s" % (str(ex), self.__cfg_json_file))
+        self.__watcher = threading.Thread(target=_watch, name='ztp-cfg-watch', daemon=True)
+        self.__watcher.start()
+        return True
+
     def __getitem__(self, key):
         '''!
         Return the value for a specific configuration item.
@@ -162,6 +310,7 @@ class ZTPCfg:
 
         @exception Raise an exception if the first parameter is not a dict object
         '''
+        self.__snapshot = None
         return self.__objJson.set(self.json_dict, key, value, True)
 
     def set(self, key, value, save=False):
@@ -177,6 +326,7 @@ class ZTPCfg:
         @exception Raise an exception if the first parameter is not a dict object
         '''
         if self.json_dict is not None:
+            self.__snapshot = None
             return self.__objJson.set(self.json_dict, key, value, save)
 
 ## Global instance of the class
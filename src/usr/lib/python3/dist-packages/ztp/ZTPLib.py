@@ -23,6 +23,7 @@ from curses.ascii import isprint
 import ztp.ZTPCfg
 import os.path
 from   ztp.defaults import *
+from   ztp.Tracer import tracer
 
 try:        # pragma: no cover
     isinstance("", basestring)
@@ -58,7 +59,7 @@ def getTimestamp():
 ## Global variable to keep track of the pid or process created by runCommand()
 runcmd_pids = []
 
-def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1):
+def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1, usage=None, on_start=None):
     '''!
     Execute a given command
 
@@ -74,12 +75,32 @@ def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1):
 
     @param use_shell (bool) Execute subprocess with shell access
 
+    @param usage (dict, optional) If provided, it is populated with the resource usage of the child
+                           process (see getRusage()). Used only when capture_stdout is False.
+
+    @param on_start (function, optional) If provided, it is called with the PID of the process as
+                           argument as soon as the process has been started.
+
     During the execution of the process, the global variable runcmd_pids (it's a list) is updated
     with the PID of the running process.
+
+    A trace span covers the execution of the process, and the trace context is passed to the process
+    so that spans recorded by it are nested under this span.
     '''
 
     if isString(cmd) is False and isinstance(cmd, list) is False:
         raise ValueError('Process to execute should be a string or a list')
+    with tracer.span('command', {'command': cmd if isString(cmd) else ' '.join(cmd)}) as span:
+        rv = _runCommand(cmd, capture_stdout, use_shell, umask, usage, on_start, span.environ())
+        span.set('exit-code', rv[0] if capture_stdout is True else rv)
+        return rv
+
+def _runCommand(cmd, capture_stdout, use_shell, umask, usage, on_start, env):
+    '''!
+    Execute a given command, see runCommand().
+
+    @param env (dict) Environment of the process, None to use the environment of the current process
+    '''
     pid = None
     try:
         if isinstance(cmd, list):
@@ -95,9 +116,11 @@ def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1):
             else:
                 shcmd = cmd
         if capture_stdout is True:
-            proc = subprocess.Popen(shcmd, shell=use_shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, umask=umask)
+            proc = subprocess.Popen(shcmd, shell=use_shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, umask=umask, env=env)
             pid = proc.pid
             runcmd_pids.append(pid)
+            if on_start is not None:
+                on_start(pid)
             output_stdout, output_stderr = proc.communicate()
             if pid in runcmd_pids:
                 runcmd_pids.remove(pid)
@@ -109,10 +132,18 @@ def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1):
                 list_stderr.append(str(l.decode()))
             return (proc.returncode, list_stdout, list_stderr)
         else:
-            proc = subprocess.Popen(shcmd, shell=use_shell, umask=umask)
+            proc = subprocess.Popen(shcmd, shell=use_shell, umask=umask, env=env)
             pid = proc.pid
             runcmd_pids.append(pid)
-            proc.communicate()
+            if on_start is not None:
+                on_start(pid)
+            if usage is not None:
+                # Reap the child ourselves to collect its resource usage
+                (wpid, status, rusage) = os.wait4(pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                usage.update(getRusage(rusage))
+            else:
+                proc.communicate()
             if pid in runcmd_pids:
                 runcmd_pids.remove(pid)
             return proc.returncode
@@ -125,6 +156,21 @@ def runCommand(cmd, capture_stdout=True, use_shell=False, umask=-1):
         else:
             return 1
 
+def getRusage(rusage):
+    '''!
+    Convert a resource.struct_rusage object to a dictionary which can be saved in a JSON file.
+
+    @param rusage (struct_rusage) Resource usage returned by os.wait4() or resource.getrusage()
+
+    @return dict with user/system CPU time in seconds, maximum resident set size in kilobytes
+            and number of block input/output operations
+    '''
+    return {'user-cpu' : round(rusage.ru_utime, 3),
+            'sys-cpu' : round(rusage.ru_stime, 3),
+            'max-rss' : rusage.ru_maxrss,
+            'block-in' : rusage.ru_inblock,
+            'block-out' : rusage.ru_oublock}
+
 ## Return build version of SONiC image
 def get_sonic_version():
     '''!
@@ -193,16 +239,7 @@ def getCfg(key, default_value=None, ztp_cfg=None):
     else:
         cfgObj = ztp.ZTPCfg.ztpCfg
 
-    if cfgObj[key] is None:
-        val = defaultCfg.get(key)
-        if val is None:
-            return default_value
-        return val
-    else:
-        if defaultCfg.get(key) is not None:
-            return getValue(cfgObj[key], type(defaultCfg[key]))
-        else:
-            return cfgObj[key]
+    return cfgObj.snapshot().get(key, default_value)
 
 def setCfg(key, value, ztp_cfg=None):
     '''!
@@ -244,36 +281,138 @@ def validateZtpCfg(ztp_cfg=None):
 def updateActivity(msg, overwrite=True):
     '''!
     Store ZTP activity status along with timestamp. Use overwrite=False to update status
-    only if new activity status is different from previous activity status.
+    only if new activity status is different from previous activity status. In ZTP service,
+    the activity is also added to the activity history.
     '''
 
     try:
+        from ztp.ActivityHistory import activityHistory
+        from ztp.StatusServer import statusServer
         activity_file = getCfg('ztp-activity')
-        if not overwrite and os.path.isfile(activity_file):
-            fh = open(activity_file, 'r')
-            activity_str = fh.readline().strip()
-            fh.close()
-            if activity_str != '':
-               split_strings = activity_str.split('|', 1)
-               if len(split_strings) == 2 and split_strings[1].strip() == msg.strip():
-                   return
+        if not overwrite:
+            # ZTP service knows its current activity, other processes read it from the activity file
+            activity_str = activityHistory.last()
+            if activity_str is not None:
+                if activity_str == msg.strip():
+                    return
+            elif os.path.isfile(activity_file):
+                fh = open(activity_file, 'r')
+                activity_str = fh.readline().strip()
+                fh.close()
+                if activity_str != '':
+                   split_strings = activity_str.split('|', 1)
+                   if len(split_strings) == 2 and split_strings[1].strip() == msg.strip():
+                       return
 
         fh = open(activity_file, 'w')
         fh.write('%s | %s' % (getTimestamp(), msg))
         fh.close()
+
+        activityHistory.record(msg)
+        # Notify status socket subscribers
+        statusServer.activity(msg)
     except:
         pass
 
+def writePidFile():
+    '''!
+    Record process id of ZTP service in ztp-pid-file. It is used by ZTP utilities to
+    determine service state without querying systemd.
+    '''
+    try:
+        pid_file = getCfg('ztp-pid-file')
+        tmp_file = pid_file + '.tmp'
+        with open(tmp_file, 'w') as fh:
+            fh.write('%d\n' % os.getpid())
+        os.replace(tmp_file, pid_file)
+    except (IOError, OSError):
+        pass
+
+def removePidFile():
+    '''!
+    Remove ztp-pid-file if it has been written by the current process.
+    '''
+    pid_file = getCfg('ztp-pid-file')
+    try:
+        with open(pid_file) as fh:
+            if int(fh.readline().strip()) == os.getpid():
+                os.remove(pid_file)
+    except (IOError, OSError, ValueError):
+        pass
+
+def servicePid(ztp_cfg=None):
+    '''!
+    Return process id of running ZTP service, as recorded in ztp-pid-file. A stale
+    process id left behind by a service which has not exited cleanly is ignored.
+
+    @param ztp_cfg (ZTPCfg, optional) ZTP configuration to use
+
+    @return Process id, None if ZTP service is not running
+    '''
+    try:
+        with open(getCfg('ztp-pid-file', ztp_cfg=ztp_cfg)) as fh:
+            pid = int(fh.readline().strip())
+        with open('/proc/%d/cmdline' % pid, 'rb') as fh:
+            cmdline = fh.read()
+    except (IOError, OSError, ValueError):
+        return None
+    if b'ztp-engine' not in cmdline:
+        return None
+    return pid
+
+def serviceUptime(pid):
+    '''!
+    Return time in seconds elapsed since a process has been started.
+
+    @param pid (int) Process id
+
+    @return Elapsed time in seconds, None if it could not be determined
+    '''
+    try:
+        with open('/proc/%d/stat' % pid) as fh:
+            stat = fh.read()
+        # Process name may contain spaces, fields are counted after it
+        start_ticks = int(stat.rsplit(')', 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
 def systemReboot():
     '''!
-    Helper API to reboot the device.
+    Helper API to reboot the device. Queued log messages and data cached by the kernel
+    are flushed to persistent storage before reboot is initiated.
     '''
+    from ztp.Logger import logger
+    logger.flush()
+    os.sync()
     (rc, reboot_help, errStr)  = runCommand('reboot -h | grep "\-y"', use_shell=True)
     if rc == 0:
         os.system('reboot -y')
     else:
         os.system('reboot')
 
+def deferReboot(reason):
+    '''!
+    Helper API used by plugins to request a system reboot from ZTP service instead of rebooting
+    the device. It is possible only if ZTP service defers reboots, in which case the
+    ZTP_DEFERRED_REBOOT environment variable of the plugin is set to the file receiving requests.
+    ZTP service reboots the device once, before processing a configuration section which is not
+    marked as safe-before-reboot or at the end of the ZTP session.
+
+    @param reason (str) Reason of the reboot request
+
+    @return True if reboot has been deferred, False if the caller has to reboot the device
+    '''
+    request_file = os.environ.get('ZTP_DEFERRED_REBOOT')
+    if not request_file:
+        return False
+    try:
+        with open(request_file, 'a') as fh:
+            fh.write(' '.join(str(reason).split()) + '\n')
+    except (IOError, OSError):
+        return False
+    return True
+
 def printable(input):
     '''!
          Filter out non-printable characters from an input string
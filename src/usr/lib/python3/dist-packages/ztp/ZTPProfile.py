@@ -0,0 +1,553 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import sys
+import os
+import glob
+import json
+import shutil
+import time
+
+from ztp.ZTPLib import runCommand, getCfg, updateActivity
+from ztp.LinkMonitor import LinkMonitor
+from ztp.Timeline import timeline
+from ztp.Metrics import metrics
+from ztp.Logger import logger
+
+## Temporary file used to build ZTP configuration profile
+TMP_ZTP_CONFIG_DB_JSON = '/tmp/ztp_config_db.json'
+## Template used to build ZTP configuration profile, relative to ztp-lib-dir
+ZTP_CONFIG_TEMPLATE = 'templates/ztp-config.j2'
+## Template used to build DHCP policy of interfaces participating in ZTP, relative to ztp-lib-dir
+DHCP_POLICY_TEMPLATE = 'templates/ifupdown2_dhcp_policy.j2'
+## DHCP policy used by ifupdown2
+DHCP_POLICY_FILE = '/etc/network/ifupdown2/policy.d/ztp_dhcp.json'
+## rsyslog configuration used to forward ZTP logs
+SYSLOG_CONF_FILE = '/etc/rsyslog.d/10-ztp-log-forwarding.conf'
+## DHCP client hook used to configure rsyslog forwarding
+DHCP_RSYSLOG_HOOK = '/etc/dhcp/dhclient-exit-hooks.d/ztp-rsyslog'
+## Maximum time in seconds to wait for in-band interfaces to be created
+SYSTEM_ONLINE_TIMEOUT = 120
+## Configuration merged with every configuration loaded using config reload
+INIT_CFG_JSON = '/etc/sonic/init_cfg.json'
+## Config DB tables maintained by system services, not part of any configuration. They are left untouched.
+RUNTIME_TABLES = ['VERSIONS']
+## Fields which require a configuration reload to be changed. Keys of these tables can't be added or
+## removed incrementally either. Other fields, keys and tables are added, changed or removed incrementally.
+PLATFORM_FIELDS = {'PORT' : ['index', 'lanes', 'alias', 'speed', 'valid_speeds', 'fec', 'role'],
+                   'DEVICE_METADATA' : ['hwsku', 'mac', 'platform']}
+
+class ZTPProfile:
+    r'''!
+    \brief This class is used to create, install and remove the ZTP configuration profile which
+           initializes switch ports to start DHCP discovery.
+
+    Examples of class usage:
+
+    \code
+    objProfile = ZTPProfile()
+    objProfile.install('discovery')
+    objProfile.remove(config_fallback=True)
+    \endcode
+    '''
+
+    def __init__(self, configdb=None):
+        '''!
+        Constructor for the class.
+
+        @param configdb (ConfigDBPipeConnector, optional) Connection to Config DB. If not specified,
+                        a connection is established when Config DB is first accessed.
+        '''
+        ## Connection to Config DB
+        self.__configdb = configdb
+        ## Hardware SKU of the platform
+        self.__hwsku = None
+
+    def featureString(self):
+        '''!
+        Return the ZTP profile string expected based on the ZTP features enabled.
+        '''
+        return 'ztp;inband:%s;ipv4:%s;ipv6:%s' % (self.__feature('inband'), self.__feature('ipv4'), self.__feature('ipv6'))
+
+    def profileString(self):
+        '''!
+        Return the ZTP profile string describing the ZTP configuration loaded in Config DB.
+        'no-ztp' is returned if ZTP configuration profile is not loaded.
+        '''
+        mode = self.__db().get_entry('ZTP', 'mode')
+        if mode.get('profile') == 'active':
+            return 'ztp;inband:%s;ipv4:%s;ipv6:%s' % (mode.get('inband', ''), mode.get('ipv4', ''), mode.get('ipv6', ''))
+        return 'no-ztp'
+
+    def ports(self):
+        '''!
+        Return the list of ports defined in Config DB.
+        '''
+        db = self.__db()
+        sep = db.KEY_SEPARATOR
+        try:
+            # Iterate over the keys incrementally instead of blocking redis using KEYS
+            client = db.get_redis_client(db.db_name)
+            keys = []
+            cursor = 0
+            while True:
+                (cursor, batch) = client.scan(cursor, 'PORT' + sep + '*', 1000)
+                keys.extend(batch)
+                if int(cursor) == 0:
+                    break
+            ports = [k.split(sep, 1)[1] for k in keys]
+        except AttributeError:
+            ports = db.get_keys('PORT')
+        return sorted(set(ports))
+
+    def create(self, dest_file=None):
+        '''!
+        Create ZTP configuration profile and DHCP policy. Also setup console logging of ZTP status.
+
+        @param dest_file (str, optional) File to which ZTP configuration profile is saved
+        '''
+        self.__createConfig(dest_file)
+        # setup console logging of ztp status
+        if getCfg('feat-console-logging') is True:
+            self.__writeFile(getCfg('rsyslog-ztp-consile-log-file-conf'), ':programname, contains, "sonic-ztp"  /dev/console\n')
+        runCommand(['systemctl', 'restart', 'rsyslog'], capture_stdout=False)
+
+    def install(self, event):
+        '''!
+        Create and load ZTP configuration profile if needed and wait for in-band interfaces
+        to be created.
+
+        @param event (str) 'discovery' to load ZTP configuration profile even if startup configuration
+                           is present, 'resume' to use configuration already loaded
+        '''
+        feature_string = self.featureString()
+        if feature_string != self.profileString():
+            if not os.path.isfile(getCfg('config-db-json')) or event == 'discovery':
+                # setup rsyslog forwarding
+                self.__writeFile(SYSLOG_CONF_FILE, None)
+                if getCfg('feat-console-logging') is True:
+                    self.__writeFile(getCfg('rsyslog-ztp-consile-log-file-conf'), ':programname, contains, "sonic-ztp"  /dev/console\n')
+                runCommand(['systemctl', 'restart', 'rsyslog'], capture_stdout=False)
+                self.__symlink(getCfg('ztp-lib-dir') + '/dhcp/ztp-rsyslog', DHCP_RSYSLOG_HOOK)
+                logger.info('Installing ZTP configuration profile to initiate ZTP discovery.')
+                # create and load ztp configuration along with DHCP policy for interfaces participating in ZTP
+                updateActivity('Installing ZTP configuration profile')
+                if self.__loadConfig('ztp'):
+                    timeline.mark('profile-installed')
+
+        # Wait for in-band interfaces to become available
+        updateActivity('Waiting for system online status before continuing ZTP')
+        logger.info('Waiting for system online status before continuing ZTP. (This may take up to %d seconds).' % SYSTEM_ONLINE_TIMEOUT)
+        if self.waitForSystemOnline() is False:
+            logger.error('System is not ready. Proceeding with ZTP after waiting for %d seconds.' % SYSTEM_ONLINE_TIMEOUT)
+        else:
+            logger.info('System is ready to respond.')
+            timeline.mark('system-online', once=True)
+
+        if event == 'resume' and self.profileString() == feature_string and self.__ztpInProgress():
+            # Restart interface configuration again to pickup newly created interfaces
+            # to start DHCP discovery
+            logger.info('Restarting network configuration.')
+            updateActivity('Restarting network configuration')
+            runCommand(['systemctl', 'restart', 'interfaces-config'], capture_stdout=False)
+            metrics.inc('ztp_interfaces_config_restarts_total')
+            logger.info('Restarted network configuration.')
+
+    def remove(self, config_fallback=False):
+        '''!
+        Remove ZTP configuration profile if it is loaded. Startup configuration or factory default
+        configuration is loaded if requested.
+
+        @param config_fallback (bool, optional) Load startup configuration, or factory default configuration
+                                                if startup configuration is missing
+        '''
+        if self.profileString() != 'no-ztp':
+            # Cleanup locks held by the ZTP session
+            shutil.rmtree(getCfg('ztp-run-dir') + '/ztp.lock', ignore_errors=True)
+
+            if config_fallback:
+                updateActivity('Waiting for system online status before stopping ZTP')
+                logger.info('Waiting for system online status before stopping ZTP. (This may take up to %d seconds).' % SYSTEM_ONLINE_TIMEOUT)
+                if self.waitForSystemOnline() is False:
+                    logger.error('System is not ready. Proceeding with stopping ZTP after waiting for %d seconds.' % SYSTEM_ONLINE_TIMEOUT)
+
+                if os.path.isfile(getCfg('config-db-json')):
+                    updateActivity('Removing ZTP configuration profile and loading startup configuration')
+                    logger.info('Removing ZTP configuration profile. Loading startup configuration.')
+                    runCommand(['config', 'reload', getCfg('config-db-json'), '-y', '-f'], capture_stdout=False)
+                else:
+                    updateActivity('Removing ZTP configuration profile and loading factory default configuration')
+                    logger.info('Removing ZTP configuration profile. Loading factory default configuration.')
+                    self.__loadConfig('factory')
+            else:
+                # Remove ZTP configuration from config-db
+                self.__db().set_entry('ZTP', 'mode', None)
+
+            updateActivity('Restarting network configuration')
+            # Restart interface configuration to stop DHCP
+            runCommand(['systemctl', 'restart', 'interfaces-config'], capture_stdout=False)
+            metrics.inc('ztp_interfaces_config_restarts_total')
+
+        # Remove ZTP DHCP policy
+        self.__removeFile(DHCP_POLICY_FILE)
+
+        # Remove syslog forwarding and console logging configuration
+        files = [DHCP_RSYSLOG_HOOK, SYSLOG_CONF_FILE, getCfg('rsyslog-ztp-consile-log-file-conf')]
+        if any(os.path.lexists(f) for f in files):
+            for f in files:
+                self.__removeFile(f)
+            # Restart rsyslog for syslog config changes to be applied
+            runCommand(['systemctl', 'restart', 'rsyslog'], capture_stdout=False)
+
+    def waitForSystemOnline(self, timeout=SYSTEM_ONLINE_TIMEOUT):
+        '''!
+        Wait for network interfaces of all the ports defined in Config DB to be created.
+
+        @param timeout (int, optional) Maximum time in seconds to wait
+
+        @return True if all network interfaces have been created, False otherwise
+        '''
+        ports = self.ports()
+        try:
+            with LinkMonitor() as monitor:
+                missing = monitor.waitFor(ports, timeout)
+        except OSError as e:
+            logger.debug('Exception [%s] encountered while monitoring network interfaces.' % str(e))
+            # Poll for network interfaces if link notifications are not available
+            deadline = time.monotonic() + timeout
+            while True:
+                missing = [p for p in ports if not os.path.isdir('/sys/class/net/' + p)]
+                if len(missing) == 0 or time.monotonic() >= deadline:
+                    break
+                time.sleep(1)
+        if len(missing) != 0:
+            logger.debug('Network interfaces not found: %s' % ', '.join(missing))
+            return False
+        return True
+
+    def changes(self, config):
+        '''!
+        Compare a configuration profile with the configuration in Config DB and return the changes
+        which need to be written to Config DB to apply it. The configuration expected in Config DB is
+        the one loaded by a configuration reload: init_cfg.json merged with the configuration profile.
+        Tables listed in RUNTIME_TABLES are ignored. A configuration reload is only required to change
+        the platform fields and keys listed in PLATFORM_FIELDS.
+
+        @param config (dict) Configuration profile as loaded from its JSON file
+
+        @return Dictionary of table -> key -> fields to be written, None for keys to be deleted. Fields
+                which have to be removed from an entry are set to None, the entry then holds all of its
+                fields and has to be replaced. None if the configuration profile can only be applied
+                using a configuration reload.
+        '''
+        running = self.__db().get_config()
+        expected = dict()
+        for source in [self.__initCfg(), config]:
+            for (table, entries) in source.items():
+                for (key, entry) in entries.items():
+                    expected.setdefault(table, dict()).setdefault(key, dict()).update(entry)
+        # Tables which are not part of the profile are removed, as done by a configuration reload
+        for table in running.keys():
+            if table not in expected and table not in RUNTIME_TABLES:
+                logger.debug('Config DB table %s is not part of the ZTP configuration profile.' % table)
+                expected[table] = dict()
+
+        changes = dict()
+        for (table, entries) in expected.items():
+            platform_fields = PLATFORM_FIELDS.get(table)
+            running_entries = running.get(table, dict())
+            if platform_fields is not None and set(entries.keys()) != set(running_entries.keys()):
+                logger.debug('Config DB table %s keys are different from the ZTP configuration profile.' % table)
+                return None
+            # Delete keys which are not part of the profile
+            for key in running_entries.keys():
+                if key not in entries:
+                    changes.setdefault(table, dict())[key] = None
+            for (key, entry) in entries.items():
+                running_entry = running_entries.get(key, dict())
+                stale = [field for field in running_entry.keys() if field not in entry]
+                if platform_fields is not None and any(field in platform_fields for field in stale):
+                    logger.debug('Config DB %s|%s fields %s are not part of the ZTP configuration profile.' % (table, key, ', '.join(stale)))
+                    return None
+                fields = dict()
+                for (field, value) in entry.items():
+                    if running_entry.get(field) == value:
+                        continue
+                    if platform_fields is not None and field in platform_fields:
+                        logger.debug('Config DB %s|%s field %s is different from the ZTP configuration profile.' % (table, key, field))
+                        return None
+                    fields[field] = value
+                if len(stale) != 0:
+                    # Fields can't be deleted without rewriting the whole entry
+                    fields = dict(entry)
+                    fields.update(dict.fromkeys(stale))
+                if len(fields) != 0:
+                    changes.setdefault(table, dict())[key] = fields
+        return changes
+
+    def __db(self):
+        '''!
+        Return connection to Config DB, connect if not done already.
+        '''
+        if self.__configdb is None:
+            from swsscommon.swsscommon import ConfigDBPipeConnector
+            configdb = ConfigDBPipeConnector()
+            configdb.connect(wait_for_init=False)
+            self.__configdb = configdb
+        return self.__configdb
+
+    def __feature(self, name):
+        '''!
+        Return 'true' if specified ZTP feature is enabled, 'false' otherwise.
+        '''
+        if getCfg('feat-' + name) is True:
+            return 'true'
+        return 'false'
+
+    def __ztpInProgress(self):
+        '''!
+        Check if a ZTP session is in progress.
+        '''
+        if getCfg('admin-mode') is False:
+            return False
+        for f in [getCfg('ztp-json-shadow-volatile'), getCfg('ztp-json-shadow')]:
+            if os.path.isfile(f):
+                try:
+                    with open(f) as fh:
+                        return json.load(fh).get('ztp').get('status') == 'IN-PROGRESS'
+                except (IOError, ValueError, AttributeError):
+                    return False
+        return False
+
+    def __getHwSku(self):
+        '''!
+        Return default hardware SKU of the platform.
+        '''
+        if self.__hwsku is None:
+            try:
+                from sonic_py_common import device_info
+                platform = device_info.get_platform()
+            except ImportError:
+                (rc, cmd_stdout, cmd_stderr) = runCommand(['sonic-cfggen', '-H', '-v', 'DEVICE_METADATA.localhost.platform'])
+                platform = cmd_stdout[0].strip() if rc == 0 and cmd_stdout else None
+            try:
+                with open('/usr/share/sonic/device/%s/default_sku' % platform) as fh:
+                    self.__hwsku = fh.readline().split()[0]
+            except (IOError, IndexError, TypeError):
+                self.__hwsku = None
+        return self.__hwsku
+
+    def __createConfig(self, dest_file=None):
+        '''!
+        Create ZTP configuration profile and DHCP policy used by ifupdown2 using a single
+        invocation of sonic-cfggen.
+
+        @param dest_file (str, optional) File to which ZTP configuration profile is saved
+
+        @return True if files were created successfully, False otherwise
+        '''
+        if dest_file is None or dest_file == '':
+            dest_file = TMP_ZTP_CONFIG_DB_JSON
+
+        # Remove dhclient leases to accommodate usage of link layer address
+        # as DUID type while sending out DHCPv6 requests.
+        if not os.path.isfile(DHCP_POLICY_FILE):
+            for f in glob.glob('/var/lib/dhcp/dhclient6.*.leases'):
+                self.__removeFile(f)
+
+        from ztp.DecodeSysEeprom import sysEeprom
+        data = dict({'ZTP_INBAND': self.__feature('inband'),
+                     'ZTP_IPV4': self.__feature('ipv4'),
+                     'ZTP_IPV6': self.__feature('ipv6'),
+                     'PRODUCT_NAME': self.__eepromField(sysEeprom.get_product_name()),
+                     'SERIAL_NO': self.__eepromField(sysEeprom.get_serial_number())})
+        cmd = ['sonic-cfggen', '-H']
+        if self.__getHwSku() is not None:
+            cmd += ['-k', self.__getHwSku()]
+        cmd += ['-a', json.dumps(data), '-p', \
+                '-t', '%s/%s,%s' % (getCfg('ztp-lib-dir'), ZTP_CONFIG_TEMPLATE, dest_file), \
+                '-t', '%s/%s,%s' % (getCfg('ztp-lib-dir'), DHCP_POLICY_TEMPLATE, DHCP_POLICY_FILE)]
+        (rc, cmd_stdout, cmd_stderr) = runCommand(cmd)
+        if rc != 0:
+            logger.error('Failed to create ZTP configuration profile, sonic-cfggen returned %d.' % rc)
+            if cmd_stderr is not None:
+                for l in cmd_stderr:
+                    logger.error(l)
+            return False
+        return True
+
+    def __loadConfig(self, profile):
+        '''!
+        Create and load requested configuration profile.
+
+        @param profile (str) 'ztp' for ZTP configuration profile, 'factory' for factory default configuration
+
+        @return True if configuration profile was loaded, False otherwise
+        '''
+        start = time.monotonic()
+        if profile == 'ztp':
+            dest_file = TMP_ZTP_CONFIG_DB_JSON
+            self.__removeFile(TMP_ZTP_CONFIG_DB_JSON)
+            self.__createConfig(TMP_ZTP_CONFIG_DB_JSON)
+            if os.path.isfile(dest_file) and getCfg('incremental-profile') is True and self.__applyConfig(dest_file):
+                self.__removeFile(TMP_ZTP_CONFIG_DB_JSON)
+                logger.info('Applied %s configuration profile in %.1f seconds.' % (profile, time.monotonic() - start))
+                return True
+        else:
+            dest_file = getCfg('config-db-json')
+            runCommand(['/usr/bin/config-setup', 'factory', dest_file], capture_stdout=False)
+
+        if os.path.isfile(dest_file):
+            runCommand(['config', 'reload', dest_file, '-y', '-f'], capture_stdout=False)
+            self.__removeFile(TMP_ZTP_CONFIG_DB_JSON)
+            logger.info('Loaded %s configuration profile using configuration reload in %.1f seconds.' % (profile, time.monotonic() - start))
+            return True
+        logger.error('Failed to generate and apply %s configuration profile.' % profile)
+        return False
+
+    def __applyConfig(self, config_file):
+        '''!
+        Apply a configuration profile by writing only the entries which differ from Config DB,
+        without restarting all the services as done by a configuration reload.
+
+        @param config_file (str) Configuration profile JSON file
+
+        @return True if configuration profile was applied, False if a configuration reload is required
+        '''
+        try:
+            with open(config_file) as fh:
+                config = json.load(fh)
+            changes = self.changes(config)
+        except (IOError, ValueError) as e:
+            logger.error('Exception [%s] encountered while comparing %s with Config DB.' % (str(e), config_file))
+            return False
+        if changes is None:
+            logger.info('Platform configuration differs from the ZTP configuration profile, configuration reload is required.')
+            return False
+
+        hostname_changed = 'hostname' in (changes.get('DEVICE_METADATA', dict()).get('localhost') or dict())
+        # Entries with fields to be removed are replaced, other entries are written or deleted in a single
+        # redis transaction
+        replaced = dict()
+        for (table, entries) in changes.items():
+            for (key, fields) in list(entries.items()):
+                if fields is not None and None in fields.values():
+                    replaced[(table, key)] = dict([(f, v) for (f, v) in fields.items() if v is not None])
+                    del entries[key]
+        logger.info('Applying %d changed Config DB entries of the ZTP configuration profile.' % \
+                    (sum(len(entries) for entries in changes.values()) + len(replaced)))
+        self.__db().mod_config(dict([(table, entries) for (table, entries) in changes.items() if len(entries) != 0]))
+        for ((table, key), entry) in replaced.items():
+            self.__db().set_entry(table, key, entry)
+        if hostname_changed:
+            runCommand(['systemctl', 'restart', 'hostname-config'], capture_stdout=False)
+        # Restart interface configuration to pickup DHCP policy of interfaces participating in ZTP
+        runCommand(['systemctl', 'restart', 'interfaces-config'], capture_stdout=False)
+        metrics.inc('ztp_interfaces_config_restarts_total')
+        return True
+
+    def __initCfg(self):
+        '''!
+        Return the configuration merged with every configuration reload.
+        '''
+        try:
+            with open(INIT_CFG_JSON) as fh:
+                init_cfg = json.load(fh)
+            if isinstance(init_cfg, dict) and all(isinstance(v, dict) and all(isinstance(e, dict) for e in v.values()) \
+                                                  for v in init_cfg.values()):
+                return init_cfg
+        except (IOError, ValueError):
+            pass
+        return dict()
+
+    def __eepromField(self, value):
+        '''!
+        Return value read from system eeprom, empty string if it could not be read.
+        '''
+        if value is None or value == 'N.A':
+            return ''
+        return value
+
+    def __writeFile(self, fname, content):
+        '''!
+        Write content to a file, or create an empty file if content is None.
+        '''
+        try:
+            with open(fname, 'a' if content is None else 'w') as fh:
+                if content is not None:
+                    fh.write(content)
+        except IOError as e:
+            logger.error('Exception [%s] encountered while writing %s.' % (str(e), fname))
+
+    def __removeFile(self, fname):
+        '''!
+        Remove a file if it exists.
+        '''
+        try:
+            if os.path.lexists(fname):
+                os.remove(fname)
+        except OSError as e:
+            logger.error('Exception [%s] encountered while removing %s.' % (str(e), fname))
+
+    def __symlink(self, src, dst):
+        '''!
+        Create or replace a symbolic link.
+        '''
+        self.__removeFile(dst)
+        try:
+            os.symlink(src, dst)
+        except OSError as e:
+            logger.error('Exception [%s] encountered while creating %s.' % (str(e), dst))
+
+def usage():
+    '''!
+    Print command usage and help.
+    '''
+    print(''' Usage:  ztp-profile.sh < create [destination_file] | install <discovery|resume> | remove [config-fallback] >
+
+         create  - Create ZTP configuration used to initialze switch ports
+         install - Create and load ZTP configuration used to initialize switch ports
+                   and start DHCP discovery
+         remove  - If the switch is running ZTP configuration, reload startup configuration
+                   or factory default configuration if startup configuration is missing.''')
+
+def main(argv):
+    '''!
+    Entry point used by ztp-profile.sh.
+
+    @param argv (list) Command line arguments
+    '''
+    if len(argv) < 1 or argv[0] == '':
+        usage()
+        return 1
+    cmd = argv[0]
+    arg = argv[1] if len(argv) > 1 else ''
+    objProfile = ZTPProfile()
+    try:
+        if cmd == 'install':
+            objProfile.install(arg)
+        elif cmd == 'remove':
+            objProfile.remove(config_fallback=(arg == 'config-fallback'))
+        elif cmd == 'create':
+            objProfile.create(arg)
+    except Exception as e:
+        logger.error('Exception [%s] encountered while processing ZTP configuration profile %s request.' % (str(e), cmd))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -18,10 +18,22 @@ limitations under the License.
 import os
 import re
 import shutil
+from contextlib import contextmanager
 from ztp.ZTPLib import isString, getTimestamp, getField, getCfg, updateActivity
 from ztp.ZTPObjects import URL, DynamicURL
+import ztp.JsonReader
 from ztp.JsonReader import JsonReader
 from ztp.Logger import logger
+from ztp.StatusServer import statusServer
+from ztp.PluginCache import PluginCache
+
+## Keys of a configuration section kept in memory and in ZTP JSON file when the section data is only
+## available in its input file
+INDEX_KEYS = ['ignore-result', 'reboot-on-success', 'reboot-on-failure', 'halt-on-failure', \
+              'description', 'timestamp', 'status', 'start-timestamp', 'error', 'timing', 'rusage', \
+              'plugin', 'exit-code', 'suspend-exit-code', 'suspend-interval', 'suspend-backoff', \
+              'suspend-max-interval', 'retry-count', 'retry-interval', 'retry-backoff', 'retry-max-interval', \
+              'retries', 'always-run', 'skipped-unchanged', 'safe-before-reboot', 'inline']
 
 class ConfigSection:
     '''!
@@ -85,6 +97,9 @@ class ConfigSection:
          Below are the objects whose value is validated:\n
            - status
            - suspend-exit-code
+           - retry-count
+           - retry-interval
+           - retry-backoff
 
          If the specified value is invalid  of if the object is not specified, its value is read from ztp_cfg.json
 
@@ -113,6 +128,20 @@ class ConfigSection:
             if suspend_exit_code is None or suspend_exit_code < 0:
                 del section['suspend-exit-code']
 
+        # Validate number of times a failed configuration section is retried and wait time before the first retry
+        for key in ['retry-count', 'retry-interval']:
+            if section.get(key) is not None:
+                _val = getField(section, key, int, None)
+                if _val is None or _val < 0:
+                    del section[key]
+                else:
+                    section[key] = _val
+        # Validate factor applied to wait time before each further retry
+        if section.get('retry-backoff') is not None:
+            _val = getField(section, 'retry-backoff', (int, float), None)
+            if _val is None or isinstance(_val, bool) or _val < 1:
+                del section['retry-backoff']
+
         # Add timestamp if missing
         if section.get('timestamp') is None:
             section['timestamp'] = getTimestamp()
@@ -148,36 +177,102 @@ class ZTPJson(ConfigSection):
     '''
 
     def updateStatus(self, obj, status):
-        super().updateStatus(obj, status)
-        # Update the shadow ZTP JSON file with new information
-        self.__writeShadowJSON()
+        with self.transaction():
+            if obj is not self.ztpDict and status == 'IN-PROGRESS':
+                # Progress of a configuration section is volatile information. It is saved to
+                # persistent storage along with the next durable status change or on checkpoint.
+                self.objJson.set(obj, 'status', status)
+                self.objJson.set(obj, 'timestamp', getTimestamp())
+                self.__checkpoint_pending = True
+                self.__writeShadowJSON(durable=False)
+            else:
+                super().updateStatus(obj, status)
+                self.__checkpoint_pending = False
+                # Update the shadow ZTP JSON file with new information
+                self.__writeShadowJSON()
+        if obj is self.ztpDict:
+            statusServer.publish('ztp-status', dict({'status': status, 'error': obj.get('error')}))
+        else:
+            section = next((k for (k, v) in self.ztpDict.items() if v is obj), None)
+            statusServer.publish('section-status', dict({'section': section, 'status': status, 'exit-code': obj.get('exit-code')}))
+
+    @contextmanager
+    def transaction(self):
+        '''!
+          Coalesce all the changes made to ZTP JSON data within the transaction so that the
+          ZTP JSON file and its shadow file are written only once, at the end of the outermost
+          transaction.
+
+          Examples of usage:
+
+          \code
+          with objztpJson.transaction():
+              section['exit-code'] = rc
+              objztpJson.updateStatus(section, 'SUCCESS')
+          \endcode
+        '''
+        self.__txn_depth += 1
+        try:
+            with self.objJson.transaction():
+                yield self
+        finally:
+            self.__txn_depth -= 1
+            if self.__txn_depth == 0 and self.__shadow_dirty:
+                self.__flushShadowJSON()
+
+    def checkpoint(self):
+        '''!
+          Save volatile progress information of configuration sections to ZTP JSON file and its
+          shadow file on persistent storage. Used before a system reboot so that ZTP session
+          can be resumed correctly.
+        '''
+        with self.transaction():
+            if self.__checkpoint_pending:
+                self.__checkpoint_pending = False
+                self.objJson.writeJson()
+                self.__writeShadowJSON()
 
-    def __writeShadowJSON(self):
+    def __writeShadowJSON(self, durable=True):
         '''!
           Save contents of ZTP JSON in a shadow file which includes data that provides
           just provisioning status information and filters out all other sensitive information.
+          The shadow data is derived from in-memory ZTP JSON data.
+
+          @param durable (bool, optional) Save shadow file on persistent storage as well. If False
+                                          only the volatile copy of the shadow file is updated.
         '''
+        self.__shadow_dirty = True
+        self.__shadow_durable = self.__shadow_durable or durable
+        if self.__txn_depth == 0:
+            self.__flushShadowJSON()
+
+    def __flushShadowJSON(self):
+        '''!
+          Write pending changes to the volatile shadow file and, if required, to the shadow
+          file on persistent storage.
+        '''
+        shadow_files = [getCfg('ztp-json-shadow-volatile')]
+        if self.__shadow_durable:
+            shadow_files.append(getCfg('ztp-json-shadow'))
+        self.__shadow_dirty = False
+        self.__shadow_durable = False
+
         allowed_keys = ['ignore-result', 'reboot-on-success', \
                         'reboot-on-failure', 'halt-on-failure', \
                         'description', 'timestamp', 'status', \
-                        'start-timestamp', 'error']
-        section_names = list()
-        shadowObj, shadowJsonDict  = JsonReader(self.json_dst_file, getCfg('ztp-json-shadow'), indent=getCfg('json-indent'))
-        shadowDict = shadowJsonDict['ztp']
-        for  k, v in shadowDict.items():
-            # Identify configuration sections
+                        'start-timestamp', 'error', 'timing', 'rusage', 'retries', \
+                        'skipped-unchanged']
+        shadowDict = dict()
+        for  k, v in self.ztpDict.items():
             if isinstance(v, dict):
-                section_names.append(k)
-
-        for section in section_names:
-            section_elements = list(shadowDict[section].keys())
-            for sub_k in section_elements:
-                # Remove sensitive data
-                if sub_k not in allowed_keys:
-                    del shadowDict[section][sub_k]
+                # Remove sensitive data from configuration sections
+                shadowDict[k] = {sub_k: sub_v for sub_k, sub_v in v.items() if sub_k in allowed_keys}
+            else:
+                shadowDict[k] = v
 
-        shadowObj.writeJson()
-        os.chmod(getCfg('ztp-json-shadow'), 0o644)
+        for f in shadow_files:
+            self.objJson.writeJson(f, {'ztp': shadowDict}, getCfg('json-indent'))
+            os.chmod(f, 0o644)
 
     def __getitem__(self, key):
         '''!
@@ -204,12 +299,54 @@ class ZTPJson(ConfigSection):
          @param value (object) Value of key that needs to be set
 
         '''
-        if key == 'status':
-            self.updateStatus(self.ztpDict, val)
-        else:
-            self.ztpDict[key] = val
-        # Update the shadow ZTP JSON file with new information
-        self.__writeShadowJSON()
+        with self.transaction():
+            if key == 'status':
+                self.updateStatus(self.ztpDict, val)
+            else:
+                self.ztpDict[key] = val
+            # Update the shadow ZTP JSON file with new information
+            self.__writeShadowJSON()
+
+    def __delitem__(self, key):
+        '''!
+         Remove specified key from the top level ztp section and save ZTP JSON file.
+
+         @param key (str) Key to be removed
+        '''
+        with self.transaction():
+            if self.ztpDict.pop(key, None) is not None:
+                self.objJson.writeJson()
+                self.__writeShadowJSON()
+
+    def section(self, section_name):
+        '''!
+         Get all the data of a configuration section. Data of large configuration sections is not kept
+         in memory, it is read from the section input file along with its current status.
+
+         @param section_name (str) Configuration section name
+
+         @return
+              Configuration section data \n
+              If configuration section is not found or error encountered: \n
+                None
+        '''
+        entry = self.ztpDict.get(section_name)
+        if isinstance(entry, dict) is False:
+            return None
+        if entry.get('inline') is not False:
+            return entry
+        section_file = getCfg('ztp-tmp-persistent') + '/' + section_name + '/' + getCfg('section-input-file')
+        try:
+            with open(section_file, 'rb') as fh:
+                data = ztp.JsonReader.serializer.loads(fh.read()).get(section_name)
+        except (IOError, OSError, ValueError, AttributeError) as e:
+            logger.error('Exception [%s] encountered while reading configuration section %s from file %s.'
+                         % (str(e), section_name, section_file))
+            return None
+        if isinstance(data, dict) is False:
+            return None
+        data.update({k: v for (k, v) in entry.items() if k != 'inline'})
+        return data
 
     def pluginArgs(self, section_name):
         '''!
@@ -283,18 +420,29 @@ class ZTPJson(ConfigSection):
                     dyn_url_data = plugin_data.get('dynamic-url')
                     if isinstance(dyn_url_data, dict) and dyn_url_data.get('destination') is not None:
                         objDynUrl = DynamicURL(dyn_url_data)
+                        plugin_file = dyn_url_data.get('destination')
                     else:
                         objDynUrl = DynamicURL(dyn_url_data, plugin_file)
-                    rc, plugin_file = objDynUrl.download()
+                    if self.__pluginCache.enabled():
+                        rc, plugin_file = self.__pluginCache.fetch(objDynUrl, plugin_file, dyn_url_data.get('curl-arguments'))
+                    else:
+                        rc, plugin_file = objDynUrl.download()
                     return plugin_file
                 elif plugin_data.get('url'):
                     url_data = plugin_data.get('url')
+                    curl_args = None
                     if isinstance(url_data, dict) and url_data.get('destination') is not None:
                         objUrl = URL(url_data)
+                        plugin_file = url_data.get('destination')
                     else:
                         objUrl = URL(url_data, plugin_file)
+                    if isinstance(url_data, dict):
+                        curl_args = url_data.get('curl-arguments')
                     updateActivity('Downloading plugin \'%s\' for configuration section %s' % (objUrl.getSource(), section_name))
-                    rc, plugin_file = objUrl.download()
+                    if self.__pluginCache.enabled():
+                        rc, plugin_file = self.__pluginCache.fetch(objUrl, plugin_file, curl_args)
+                    else:
+                        rc, plugin_file = objUrl.download()
                     if rc != 0:
                         logger.error('Failed to download plugin \'%s\' for configuration section %s.' % (objUrl.getSource(), section_name))
                     return plugin_file
@@ -355,6 +503,24 @@ class ZTPJson(ConfigSection):
         except:
             raise ValueError('Unable to write Configuration Section %s JSON data to file %s' % (key, section_file))
 
+    def __compactSection(self, key, val):
+        '''!
+          Keep only status information and flags of a large configuration section in memory and in
+          ZTP JSON file. Rest of the configuration section data is read from its input file when required.
+
+          @param key (str) Configuration section name
+          @param value (dict) Configuration section data
+        '''
+        section_file = getCfg('ztp-tmp-persistent') + '/' + key + '/' + getCfg('section-input-file')
+        try:
+            if val.get('inline') is False or os.path.getsize(section_file) <= getCfg('section-inline-size'):
+                return
+        except OSError:
+            return
+        for sub_k in [sub_k for sub_k in val.keys() if sub_k not in INDEX_KEYS]:
+            del val[sub_k]
+        val['inline'] = False
+
     def __buildDefaults(self):
         '''!
          Helper API to include missing objects in a configuration section and validate their values.
@@ -385,6 +551,17 @@ class ZTPJson(ConfigSection):
          @exception Raise ValueError if any error or exception encountered while processing the json_src_file
 
         '''
+        ## Nesting level of transactions in progress
+        self.__txn_depth = 0
+        ## Flag to indicate that shadow ZTP JSON file has to be written at end of transaction
+        self.__shadow_dirty = False
+        ## Flag to indicate that shadow ZTP JSON file on persistent storage has to be written as well
+        self.__shadow_durable = False
+        ## Flag to indicate that volatile progress information has not been saved to persistent storage
+        self.__checkpoint_pending = False
+        ## Store of downloaded plugins, shared by configuration sections
+        self.__pluginCache = PluginCache()
+
         # Call base class constructor
         ConfigSection.__init__(self, json_src_file, json_dst_file)
 
@@ -436,8 +613,10 @@ class ZTPJson(ConfigSection):
         # Insert default values
         self.__buildDefaults()
 
-        # Cleanup previous ZTP run files
-        if self.ztpDict['status'] == 'BOOT':
+        # Cleanup previous ZTP run files. Input files of configuration sections are kept if ZTP JSON data
+        # refers to them.
+        if self.ztpDict['status'] == 'BOOT' and \
+           next((v for v in self.ztpDict.values() if isinstance(v, dict) and v.get('inline') is False), None) is None:
             self.__cleanup()
 
         # Identify valid configuration sections
@@ -452,6 +631,8 @@ class ZTPJson(ConfigSection):
             self._ConfigSection__buildDefaults(v)
             # Split confguration sections to individual files
             self.__writeConfigSections(k, v)
+            # Release data of large configuration sections
+            self.__compactSection(k, v)
 
         # Write ZTP JSON data to file
         self.objJson.writeJson()
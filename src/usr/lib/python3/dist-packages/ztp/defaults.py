@@ -18,10 +18,13 @@ limitations under the License.
 defaultCfg = dict( \
 {
   "acl-url"              : "/var/run/ztp/dhcp_acl_url", \
+  "activity-history-size" : 32, \
   "admin-mode"           : True, \
+  "concurrent-discovery" : True, \
   "config-db-json"       : "/etc/sonic/config_db.json", \
   "curl-retries"         : 3, \
   "curl-timeout"         : 30, \
+  "deferred-reboot"      : False, \
   "discovery-interval"   : 10, \
   "config-fallback"      : False, \
   "feat-console-logging" : True, \
@@ -30,47 +33,85 @@ defaultCfg = dict( \
   "feat-ipv6" : True, \
   "graph-url"            : "/var/run/ztp/dhcp_graph_url", \
   "halt-on-failure"      : False, \
+  "history-max-age"      : 365, \
+  "history-max-sessions" : 100, \
   "https-secure"         : True, \
   "http-user-agent"      : "SONiC-ZTP/0.1", \
   "ignore-result"        : False, \
   "include-http-headers" : True, \
+  "incremental-profile"  : True, \
   "opt59-v6-url"         : "/var/run/ztp/dhcp6_59-ztp_data_url", \
   "opt66-tftp-server"    : "/var/run/ztp/dhcp_66-ztp_tftp_server", \
   "opt67-url"            : "/var/run/ztp/dhcp_67-ztp_data_url", \
   "opt239-url"           : "/var/run/ztp/dhcp_239-provisioning-script_url", \
   "opt239-v6-url"        : "/var/run/ztp/dhcp6_239-provisioning-script_url", \
+  "plugin-cache-dir"     : "/var/lib/ztp/plugin-cache", \
+  "plugin-cache-size"    : 67108864, \
+  "plugin-host"          : False, \
+  "plugin-host-wait-interval" : 30, \
   "plugins-dir"          : "/usr/lib/ztp/plugins", \
+  "profile-dir"          : "/var/log/ztp-profile", \
+  "profile-engine"       : False, \
+  "profile-max-files"    : 32, \
+  "profile-max-size"     : 33554432, \
+  "profile-plugins"      : False, \
+  "profile-tracemalloc"  : 0, \
   "provisioning-script"  : "/host/ztp/provisioning-script", \
   "info-feat-console-logging" : "Display ZTP logs over serial console", \
   "info-feat-inband" : "ZTP over In-Band interfaces", \
   "info-feat-ipv4" : "ZTP using IPv4 DHCP discovery", \
   "info-feat-ipv6" : "ZTP using IPv6 DHCPv6 discovery", \
+  "log-dedup-interval"   : 300, \
   "log-file"             : "/var/log/ztp.log", \
   "log-level"            : "INFO", \
+  "log-queue-size"       : 4096, \
+  "metrics-file"         : "/var/lib/node_exporter/textfile_collector/ztp.prom", \
+  "metrics-interval"     : 15, \
   "monitor-startup-config" : True, \
   "restart-ztp-interval": 300, \
   "reboot-on-success"    : False, \
   "reboot-on-failure"    : False, \
+  "reboot-wait-interval" : 300, \
   "restart-ztp-on-failure" : False, \
   "restart-ztp-on-invalid-data" : True, \
   "restart-ztp-no-config" : True, \
+  "retry-backoff"        : 2, \
+  "retry-count"          : 0, \
+  "retry-interval"       : 5, \
+  "retry-max-interval"   : 300, \
   "rsyslog-ztp-log-file-conf" : '/etc/rsyslog.d/10-ztp-log-file.conf', \
   "rsyslog-ztp-consile-log-file-conf" : '/etc/rsyslog.d/10-ztp-console-logging.conf', \
+  "section-inline-size"  : 4096, \
   "section-input-file"   : "input.json", \
   "sighandler-wait-interval" : 60, \
+  "skip-unchanged"       : False, \
+  "suspend-backoff"      : 2, \
+  "suspend-interval"     : 1, \
+  "suspend-max-interval" : 60, \
   "test-mode"            : False, \
+  "timeline-max-entries" : 256, \
+  "trace-file"           : "/var/log/ztp_trace.jsonl", \
+  "trace-max-size"       : 4194304, \
   "umask"                : "022", \
   "ztp-activity"         : '/var/run/ztp/activity', \
+  "ztp-activity-history" : '/var/run/ztp/activity_history.json', \
   "ztp-cfg-dir"          : "/host/ztp", \
+  "ztp-fingerprints"     : "/host/ztp/ztp_fingerprints.json", \
+  "ztp-history"          : "/host/ztp/ztp_history.db", \
   "ztp-json"             : "/host/ztp/ztp_data.json", \
   "ztp-json-shadow"      : "/host/ztp/ztp_data_shadow.json", \
+  "ztp-json-shadow-volatile" : "/var/run/ztp/ztp_data_shadow.json", \
   "ztp-json-local"       : "/host/ztp/ztp_data_local.json", \
   "ztp-json-opt59"       : "/var/run/ztp/ztp_data_opt59.json", \
   "ztp-json-opt67"       : "/var/run/ztp/ztp_data_opt67.json", \
   "ztp-json-version" : "1.0", \
   "ztp-lib-dir"          : "/usr/lib/ztp", \
+  "ztp-pid-file"         : "/var/run/ztp/ztp.pid", \
   "ztp-restart-flag"     : "/tmp/pending_ztp_restart", \
   "ztp-run-dir"          : "/var/run/ztp", \
+  "ztp-status-socket"    : "/var/run/ztp/ztp.sock", \
+  "ztp-timeline"         : "/host/ztp/ztp_timeline.json", \
+  "ztp-timeline-volatile" : "/var/run/ztp/ztp_timeline.json", \
   "ztp-tmp-persistent"   : "/var/lib/ztp/sections", \
   "ztp-tmp"              : "/var/lib/ztp/tmp" \
 })
@@ -26,15 +26,29 @@ import argparse
 import re
 import json
 import traceback
+import threading
+import atexit
 from natsort import natsorted
 from urllib.parse import urlparse
 from ztp.ZTPSections import ZTPJson
+from ztp.ZTPProfile import ZTPProfile
+from ztp.Timeline import timeline, bootId
+from ztp.Metrics import metrics
+from ztp.Tracer import tracer
+from ztp.StatusServer import statusServer
+from ztp.ActivityHistory import activityHistory
+from ztp.PluginHost import pluginHost
+from ztp.EventWait import eventWait, waitAnyProcess, EVENT_SIGNAL
+from ztp.Profiler import profiler
+from ztp.SessionHistory import sessionHistory
+from ztp.SectionFingerprint import sectionFingerprints
 import ztp.ZTPCfg
 from ztp.Downloader import Downloader
 from ztp.Logger import logger
 from ztp.ZTPLib import getTimestamp, runCommand, runcmd_pids 
 from ztp.ZTPLib import getField, getCfg, validateZtpCfg, updateActivity, systemReboot
-from swsscommon.swsscommon import ConfigDBConnector, SonicV2Connector
+from ztp.ZTPLib import writePidFile, removePidFile
+from swsscommon.swsscommon import ConfigDBPipeConnector, SonicV2Connector
 
 def check_pid(pid):
     ## Check For the existence of a unix pid
@@ -52,8 +66,8 @@ def signal_handler(signum, frame):
     logger.warning('Received terminate signal. Shutting down.')
     updateActivity('Received terminate signal. Shutting down.')
     # Wait for some time
-    count = getCfg('sighandler-wait-interval')
-    while count > 0:
+    deadline = time.monotonic() + getCfg('sighandler-wait-interval')
+    while True:
         done = True
         for pid in runcmd_pids:
             if check_pid(pid):
@@ -62,12 +76,15 @@ def signal_handler(signum, frame):
                     (wpid, status) = os.waitpid(pid, os.WNOHANG)
                     if wpid == pid:
                         print('Process pid %d returned with status %d.' % (pid, status))
+                except ChildProcessError:
+                    # Plugin run by the plugin host
+                    pass
                 except OSError as v:
                     print('pid %d : %s' % (pid, str(v)))
-        if done:
+        if done or time.monotonic() >= deadline:
             break
-        time.sleep(1)
-        count -= 1
+        # Wait for one of the processes to exit
+        waitAnyProcess([pid for pid in runcmd_pids if check_pid(pid)], deadline - time.monotonic())
 
     # Kill any process which might still be running
     for pid in runcmd_pids:
@@ -113,6 +130,9 @@ class ZTPEngine():
         self.configDB = None
         self.applDB   = None
 
+        ## Time at which discovery of provisioning data started
+        self.__discovery_start = time.monotonic()
+
     def __connect_to_redis(self):
         '''!
         Establishes connection to the redis DB
@@ -122,7 +142,7 @@ class ZTPEngine():
         # Connect to ConfigDB
         try:
             if self.configDB is None:
-                self.configDB = ConfigDBConnector()
+                self.configDB = ConfigDBPipeConnector()
                 self.configDB.connect()
         except:
             self.configDB = None
@@ -138,6 +158,13 @@ class ZTPEngine():
             return False
         return True
 
+    def __ztpProfile(self):
+        '''!
+        Create a ZTP configuration profile object which shares the connection to Config DB.
+        '''
+        self.__connect_to_redis()
+        return ZTPProfile(self.configDB)
+
     def __detect_intf_state(self):
         '''!
         Identifies all the interfaces on which ZTP discovery needs to be performed.
@@ -173,6 +200,7 @@ class ZTPEngine():
                 operstate == 'up':
                 link_up_detected = True
                 logger.info('Link up detected for interface %s' % intf)
+                timeline.mark('link-up', intf, once=True)
             if self.__intf_state.get(intf) is None:
                 self.__intf_state[intf] = dict()
             self.__intf_state[intf]['operstate'] = operstate
@@ -253,14 +281,17 @@ class ZTPEngine():
         updateActivity('Verifying configuration')
 
         # Use a fallback default configuration if configured to
-        _config_fallback = ''
+        _config_fallback = False
         if (self.objztpJson is not None and (self.objztpJson['status'] == 'FAILED' or self.objztpJson['status'] == 'SUCCESS') \
             and self.objztpJson['config-fallback']) or \
            (self.objztpJson is None and getCfg('config-fallback') is True):
-            _config_fallback = ' config-fallback'
+            _config_fallback = True
 
-        # Execute profile removal command with appropriate options
-        rc = runCommand(getCfg('ztp-lib-dir')+'/ztp-profile.sh remove' + _config_fallback, capture_stdout=False)
+        # Remove ZTP configuration profile with appropriate options
+        try:
+            self.__ztpProfile().remove(config_fallback=_config_fallback)
+        except Exception as e:
+            logger.error('Exception [%s] encountered while removing ZTP configuration profile.' % str(e))
 
         # Remove ZTP configuration startup-config
         if os.path.isfile(getCfg('config-db-json')) is True:
@@ -294,11 +325,14 @@ class ZTPEngine():
         if self.__ztp_profile_loaded is False:
             updateActivity('Checking running configuration')
             logger.info('Checking running configuration to load ZTP configuration profile.')
-            cmd = getCfg('ztp-lib-dir')+'/ztp-profile.sh install ' + event
             # When performing ZTP discovery, force load ZTP profile. When
             # ZTP is resuming previous session, use configuration already loaded during
             # config-setup
-            rc = runCommand(cmd, capture_stdout=False)
+            try:
+                with sessionHistory.phase('profile'):
+                    self.__ztpProfile().install(event)
+            except Exception as e:
+                logger.error('Exception [%s] encountered while installing ZTP configuration profile.' % str(e))
             self.__ztp_profile_loaded = True
             return True
         return False
@@ -371,6 +405,13 @@ class ZTPEngine():
         if getField(section, 'reboot-on-success', bool, False) is True and status == 'SUCCESS':
             logger.warning('ZTP is rebooting the device as reboot-on-success flag is set.')
             updateActivity('System reboot requested on success')
+            if delayed_reboot is False:
+                timeline.mark('reboot-requested', section.get('status'))
+                metrics.inc('ztp_reboots_total')
+                metrics.flush(force=True)
+            # Save volatile progress information before reboot
+            self.objztpJson.checkpoint()
+            timeline.checkpoint()
             if self.test_mode and delayed_reboot == False:
                 sys.exit(0)
             else:
@@ -383,6 +424,13 @@ class ZTPEngine():
         if getField(section, 'reboot-on-failure', bool, False) is True and status == 'FAILED':
             logger.warning('ZTP is rebooting the device as reboot-on-failure flag is set.')
             updateActivity('System reboot requested on failure')
+            if delayed_reboot is False:
+                timeline.mark('reboot-requested', section.get('status'))
+                metrics.inc('ztp_reboots_total')
+                metrics.flush(force=True)
+            # Save volatile progress information before reboot
+            self.objztpJson.checkpoint()
+            timeline.checkpoint()
             if self.test_mode and delayed_reboot == False:
                 sys.exit(0)
             else:
@@ -391,6 +439,66 @@ class ZTPEngine():
                 else:
                     systemReboot()
 
+    def __deferredReboot(self):
+        '''!
+         Check if reboots requested by configuration sections are deferred.
+        '''
+        return getField(self.objztpJson.ztpDict, 'deferred-reboot', bool, getCfg('deferred-reboot'))
+
+    def __rebootRequests(self, section, result, request_file):
+        '''!
+         Collect reboot requests made by a configuration section while reboots are deferred.
+
+         @param section (dict) Configuration section data containing reboot-on flags
+         @param result (str) Result of the configuration section
+         @param request_file (str) File containing reboot requests made by the plugin
+
+         @return List of reboot reasons
+        '''
+        reasons = []
+        try:
+            with open(request_file) as fh:
+                reasons = [l.strip() for l in fh if len(l.strip()) != 0]
+            os.remove(request_file)
+        except (IOError, OSError):
+            pass
+        if getField(section, 'reboot-on-success', bool, False) is True and result == 'SUCCESS':
+            reasons.append('reboot-on-success')
+        if getField(section, 'reboot-on-failure', bool, False) is True and result == 'FAILED':
+            reasons.append('reboot-on-failure')
+        return reasons
+
+    def __pendingReboot(self, barrier):
+        '''!
+         Reboot the device to serve reboot requests deferred by configuration sections. Pending requests
+         are kept in ZTP JSON data till ZTP session is resumed after reboot.
+
+         @param barrier (str) What cannot be processed before reboot
+        '''
+        pending = [r for r in self.objztpJson['pending-reboot'] if isinstance(r, dict)]
+        requests = ', '.join('%s (%s)' % (r.get('section'), r.get('reason')) for r in pending)
+        logger.warning('ZTP is rebooting the device before %s as requested by %s.' % (barrier, requests))
+        updateActivity('System reboot requested by %s' % requests)
+        timeline.mark('reboot-requested', 'deferred')
+        metrics.inc('ztp_reboots_total')
+        metrics.flush(force=True)
+        # Save volatile progress information before reboot
+        self.objztpJson.checkpoint()
+        timeline.checkpoint()
+        if self.test_mode or bootId() is None:
+            # Completion of the reboot cannot be detected when ZTP session is resumed
+            del self.objztpJson['pending-reboot']
+        if self.test_mode:
+            sys.exit(0)
+        systemReboot()
+
+        # Wait for ZTP service to be stopped by system shutdown
+        deadline = time.monotonic() + getCfg('reboot-wait-interval')
+        while time.monotonic() < deadline:
+            eventWait.wait(deadline - time.monotonic())
+        logger.error('System reboot did not happen in %d seconds. Continuing ZTP session.' % getCfg('reboot-wait-interval'))
+        del self.objztpJson['pending-reboot']
+
     def __evalZTPResult(self):
         '''!
          Determines the final result of ZTP after processing all configuration sections and
@@ -420,8 +528,9 @@ class ZTPEngine():
                 # Check if configuration section has failed and ignore-result flag is not set
                 if section.get('status') == 'FAILED' and section.get('ignore-result') is False:
                     # Mark ZTP as failed and bail out
-                    self.objztpJson['error'] = '%s FAILED' % sec
-                    self.objztpJson['status'] = 'FAILED'
+                    with self.objztpJson.transaction():
+                        self.objztpJson['error'] = '%s FAILED' % sec
+                        self.objztpJson['status'] = 'FAILED'
                     logger.info('ZTP failed at %s as configuration section %s FAILED.' % (self.objztpJson['timestamp'], sec))
                     return
 
@@ -432,6 +541,82 @@ class ZTPEngine():
         # Check reboot on result flags and take action
         self.__rebootAction(self.objztpJson.ztpDict, delayed_reboot=True)
 
+    def __sectionTiming(self, section, reset=False):
+        '''!
+         Obtain the dictionary used to accumulate time spent in each processing phase of a
+         configuration section. Time is accumulated across suspend and resume of the section.
+
+         @param section (dict) Configuration section data
+         @param reset (bool) Discard previously recorded time
+
+         @return dict with plugin-resolve, plugin-exec and status-persist durations in seconds. status-persist
+                 covers the status updates made before the final one, which is saved along with the timing.
+        '''
+        timing = section.get('timing')
+        if reset or isinstance(timing, dict) is False:
+            timing = dict()
+        for k in ['plugin-resolve', 'plugin-exec', 'status-persist']:
+            if isinstance(timing.get(k), (int, float)) is False:
+                timing[k] = 0.0
+        section['timing'] = timing
+        return timing
+
+    def __sectionFingerprint(self, section_name, plugin):
+        '''!
+         Compute fingerprint of a configuration section used to skip it if it has not changed
+         since it was last processed successfully.
+
+         @param section_name (str) Configuration section name
+         @param plugin (str) Plugin file used to process the configuration section
+
+         @return Fingerprint string, None if skipping the section is disabled or not possible
+        '''
+        section = self.objztpJson.section(section_name)
+        if plugin is None or section is None or sectionFingerprints.enabled() is False or \
+           getField(section, 'always-run', bool, False) is True:
+            return None
+        try:
+            return sectionFingerprints.compute(section, plugin)
+        except Exception as e:
+            logger.warning('Exception [%s] encountered while computing fingerprint of configuration section %s.' % (str(e), section_name))
+            return None
+
+    def __sectionUsage(self, section, usage):
+        '''!
+         Accumulate resource usage of the plugin process in configuration section data.
+
+         @param section (dict) Configuration section data
+         @param usage (dict) Resource usage of the plugin process as returned by runCommand()
+        '''
+        prev = section.get('rusage')
+        if isinstance(prev, dict):
+            for k in ['user-cpu', 'sys-cpu', 'block-in', 'block-out']:
+                if isinstance(prev.get(k), (int, float)):
+                    usage[k] = round(usage[k] + prev.get(k), 3)
+            if isinstance(prev.get('max-rss'), int):
+                usage['max-rss'] = max(usage['max-rss'], prev.get('max-rss'))
+        section['rusage'] = usage
+
+    def __backoffInterval(self, section, kind, count):
+        '''!
+         Compute time to wait before resuming a suspended configuration section or retrying a failed one.
+         The wait time starts at <kind>-interval seconds and is multiplied by <kind>-backoff each time the
+         section is suspended or fails again, up to <kind>-max-interval seconds. Each of them can be set
+         in the configuration section.
+
+         @param section (dict) Configuration section data
+         @param kind (str) 'suspend' or 'retry'
+         @param count (int) Number of times the configuration section has been suspended in a row or has failed
+
+         @return Wait time in seconds
+        '''
+        interval = getField(section, kind + '-interval', (int, float), getCfg(kind + '-interval'))
+        backoff = getField(section, kind + '-backoff', (int, float), getCfg(kind + '-backoff'))
+        max_interval = getField(section, kind + '-max-interval', (int, float), getCfg(kind + '-max-interval'))
+        interval = max(0, interval)
+        backoff = max(1, backoff)
+        return min(interval * (backoff ** min(count - 1, 64)), max(interval, max_interval))
+
     def __processConfigSections(self):
         '''!
          Process and execute individual configuration sections defined in ZTP JSON. Plugin for each
@@ -439,6 +624,21 @@ class ZTPEngine():
          command line argument to the plugin. Each and every section is processed before this function
          returns.
 
+         A suspended configuration section is parked till its wake-up time, see __backoffInterval(), while
+         other configuration sections are processed. A failed configuration section is retried the same way
+         up to retry-count times. It is saved as FAILED while waiting for a retry, and halt-on-failure and
+         reboot-on-failure only apply once its retries are exhausted. Retries are not resumed if ZTP service
+         is restarted. If all the remaining configuration sections are waiting, ZTP service sleeps till the
+         earliest wake-up time.
+
+         If skip-unchanged is set, a configuration section which has not changed since it was last processed
+         successfully in a successful ZTP session, as found by its fingerprint, is marked as SUCCESS without
+         executing its plugin unless always-run is set or the device state has changed since.
+
+         If deferred-reboot is set, reboots requested by configuration sections, using reboot-on-success,
+         reboot-on-failure or deferReboot() in their plugin, are saved as pending-reboot in ZTP JSON data.
+         Configuration sections marked as safe-before-reboot are processed while a reboot is pending. The
+         device is rebooted once, before processing any other configuration section or at the end.
         '''
 
         # Obtain a copy of the list of configuration sections
@@ -448,7 +648,24 @@ class ZTPEngine():
         abort = False
         sort = True
 
-        logger.debug('Processing configuration sections: %s' % ', '.join(section_names))
+        # Timer queue of suspended configuration sections: section name -> wake-up time
+        wakeup = dict()
+        # Number of times each configuration section has been suspended in a row
+        suspend_count = dict()
+        # Failed configuration sections waiting in the timer queue to be retried
+        retrying = set()
+        # Fingerprints of configuration sections being processed
+        fingerprints = dict()
+
+        # Reboot requests made by plugins are saved in a file provided to them
+        deferred = self.__deferredReboot()
+        reboot_request_file = getCfg('ztp-tmp') + '/reboot-request'
+        if deferred:
+            if os.path.isfile(reboot_request_file):
+                os.remove(reboot_request_file)
+            os.environ['ZTP_DEFERRED_REBOOT'] = reboot_request_file
+
+        logger.debug('Processing configuration sections: %s', ', '.join(section_names))
         # Loop through each sections till all of them are processed
         while section_names and abort is False:
             # Take a fresh sorted list to begin with and if any changes happen to it while processing
@@ -457,21 +674,47 @@ class ZTPEngine():
                 sort = False
             # Loop through configuration section in a sorted order
             for sec in sorted_list:
+                # Skip suspended configuration sections till their wake-up time
+                if sec in wakeup:
+                    if time.monotonic() < wakeup.get(sec):
+                        continue
+                    del wakeup[sec]
                 # Retrieve configuration section data
                 section = self.objztpJson.ztpDict.get(sec)
+                # Per phase timing and resource usage of the plugin process
+                timing = None
+                usage = None
+                span = None
+                retry = False
+                skipped = False
+                _attempt_start = time.monotonic()
                 try:
                     # Retrieve individual section's progress
                     sec_status = section.get('status')
-                    if sec_status == 'BOOT' or sec_status == 'SUSPEND':
+                    if sec_status == 'BOOT' or sec_status == 'SUSPEND' or (sec_status == 'FAILED' and sec in retrying):
+                        if sec in retrying:
+                            # Error of the failed attempt is kept in retries
+                            retrying.discard(sec)
+                            section.pop('error', None)
+                        # Configuration section which is not safe-before-reboot is a reboot barrier
+                        if self.objztpJson['pending-reboot'] and getField(section, 'safe-before-reboot', bool, False) is False:
+                            self.__pendingReboot('configuration section %s' % sec)
+                        timing = self.__sectionTiming(section, reset=(sec_status == 'BOOT'))
+                        if sec_status == 'BOOT':
+                            section.pop('retries', None)
+                            section.pop('skipped-unchanged', None)
+                        _start = time.monotonic()
                         # Mark section status as in progress
-                        self.objztpJson.updateStatus(section, 'IN-PROGRESS')
-                        if section.get('start-timestamp') is None:
-                            section['start-timestamp'] = section['timestamp']
-                            self.objztpJson.objJson.writeJson()
+                        with self.objztpJson.transaction():
+                            self.objztpJson.updateStatus(section, 'IN-PROGRESS')
+                            if section.get('start-timestamp') is None:
+                                section['start-timestamp'] = section['timestamp']
+                        timing['status-persist'] += time.monotonic() - _start
                         logger.info('Processing configuration section %s at %s.' % (sec, section['timestamp']))
+                        timeline.mark('section-start', sec)
                     elif sec_status != 'IN-PROGRESS':
                         # Skip completed sections
-                        logger.debug('Removing section %s from list. Status %s.' % (sec, sec_status))
+                        logger.debug('Removing section %s from list. Status %s.', sec, sec_status)
                         section_names.remove(sec)
                         # set flag to sort the configuration sections list again
                         sort = True
@@ -480,8 +723,15 @@ class ZTPEngine():
                             logger.info('Configuration section %s skipped as its status is set to DISABLED.' % sec)
                         continue
                     updateActivity('Processing configuration section %s' % sec)
+                    span = tracer.span('section', {'section': sec}).begin()
+                    if timing is None:
+                        timing = self.__sectionTiming(section)
                     # Get the appropriate plugin to be used for this configuration section
+                    _start = time.monotonic()
                     plugin = self.objztpJson.plugin(sec)
+                    if sec_status == 'BOOT' and sectionFingerprints.enabled() and sectionFingerprints.known(sec):
+                        fingerprints[sec] = self.__sectionFingerprint(sec, plugin)
+                    timing['plugin-resolve'] += time.monotonic() - _start
                     # Get the location of this configuration section's input data parsed from the input ZTP JSON file
                     plugin_input = getCfg('ztp-tmp-persistent') + '/' + sec + '/' + getCfg('section-input-file')
                     # Initialize result flag to FAILED
@@ -491,6 +741,13 @@ class ZTPEngine():
                     if plugin is None:
                         logger.error('Unable to resolve plugin to be used for configuration section %s. Marking it as FAILED.' % sec)
                         section['error'] = 'Unable to find or download requested plugin'
+                    elif sec_status == 'BOOT' and sectionFingerprints.unchanged(sec, fingerprints.get(sec)):
+                        logger.info('Configuration section %s skipped as it has not changed since it was last processed successfully.' % sec)
+                        section['skipped-unchanged'] = True
+                        metrics.inc('ztp_sections_skipped_total', {'section': sec})
+                        skipped = True
+                        finalResult = 'SUCCESS'
+                        rc = 0
                     elif os.path.isfile(plugin) and os.path.isfile(plugin_input):
                         plugin_args = self.objztpJson.pluginArgs(sec)
                         plugin_data = section.get('plugin')
@@ -511,11 +768,21 @@ class ZTPEngine():
                             plugin_cmd = plugin_cmd + ' ' + plugin_args
 
                         # A plugin has been resolved and its input configuration section data as well
-                        logger.debug('Executing plugin %s.' % (plugin_cmd))
+                        logger.debug('Executing plugin %s.', plugin_cmd)
                         # Execute identified plugin
-                        rc = runCommand(plugin_cmd, capture_stdout=False, use_shell=_shell, umask=_umask)
-
-                        logger.debug('Plugin %s exit code = %d.' % (plugin_cmd, rc))
+                        usage = dict()
+                        _start = time.monotonic()
+                        rc = None
+                        if _shell is False and pluginHost.accepts(plugin):
+                            rc = pluginHost.run(plugin_cmd, umask=_umask, usage=usage)
+                        if rc is None:
+                            rc = runCommand(profiler.pluginCommand(plugin, plugin_cmd), capture_stdout=False, use_shell=_shell, umask=_umask, usage=usage)
+                        _exec_time = time.monotonic() - _start
+                        timing['plugin-exec'] += _exec_time
+                        metrics.inc('ztp_plugin_exit_codes_total', {'section': sec, 'code': rc})
+                        metrics.set('ztp_section_duration_seconds', _exec_time, {'section': sec})
+
+                        logger.debug('Plugin %s exit code = %d.', plugin_cmd, rc)
                         # Compare plugin exit code
                         if rc == 0:
                             finalResult = 'SUCCESS'
@@ -524,34 +791,125 @@ class ZTPEngine():
                         else:
                             finalResult = 'FAILED'
                 except Exception as e:
-                    logger.debug('Exception [%s] encountered for configuration section %s.' % (str(e), sec))
+                    logger.debug('Exception [%s] encountered for configuration section %s.', str(e), sec)
                     logger.info('Exception encountered while processing configuration section %s. Marking it as FAILED.' %  sec)
                     section['error'] = 'Exception [%s] encountered while executing the plugin' % (str(e))
                     finalResult = 'FAILED'
 
                 # Update this configuration section's result in ztp json file
                 logger.info('Processed Configuration section %s with result %s, exit code (%d) at %s.' % (sec, finalResult, rc, section['timestamp']))
-                if finalResult == 'FAILED' and section.get('error') is None:
-                    section['error'] = 'Plugin failed'
-                section['exit-code'] = rc
-                self.objztpJson.updateStatus(section, finalResult)
+                # Retry failed configuration section in place. Failed attempts are recorded in the section status.
+                retries = section.get('retries') if isinstance(section.get('retries'), list) else []
+                if finalResult == 'FAILED' and len(retries) < getField(section, 'retry-count', int, getCfg('retry-count')):
+                    retries.append(dict({'timestamp': getTimestamp(), 'exit-code': rc, 'error': section.get('error') or 'Plugin failed',
+                                         'duration': round(time.monotonic() - _attempt_start, 3)}))
+                    section['retries'] = retries
+                    metrics.inc('ztp_section_retries_total', {'section': sec})
+                    retry = True
+
+                reboot_requests = []
+                if deferred and skipped is False and retry is False:
+                    reboot_requests = self.__rebootRequests(section, finalResult, reboot_request_file)
+                    if len(reboot_requests) != 0:
+                        logger.info('Reboot requested by configuration section %s is deferred (%s).' % (sec, ', '.join(reboot_requests)))
+
+                with self.objztpJson.transaction():
+                    if finalResult == 'FAILED' and section.get('error') is None:
+                        section['error'] = 'Plugin failed'
+                    section['exit-code'] = rc
+                    if usage:
+                        self.__sectionUsage(section, usage)
+                    if timing is not None:
+                        # Saved along with the final status update
+                        for k in timing.keys():
+                            timing[k] = round(timing[k], 3)
+                    if len(reboot_requests) != 0:
+                        pending = list(self.objztpJson['pending-reboot'] or [])
+                        for r in reboot_requests:
+                            pending.append(dict({'section': sec, 'reason': r, 'boot-id': bootId(), 'timestamp': getTimestamp()}))
+                        self.objztpJson['pending-reboot'] = pending
+                    self.objztpJson.updateStatus(section, finalResult)
+                timeline.mark('section-end', '%s %s' % (sec, finalResult))
+                # Save fingerprint of configuration section processed successfully for later sessions
+                if finalResult == 'SUCCESS' and skipped is False:
+                    fingerprint = fingerprints.pop(sec, None)
+                    if fingerprint is None:
+                        fingerprint = self.__sectionFingerprint(sec, self.objztpJson.plugin(sec))
+                    sectionFingerprints.record(sec, fingerprint)
+                elif finalResult == 'FAILED':
+                    fingerprints.pop(sec, None)
+                    sectionFingerprints.forget(sec)
+                sessionHistory.section(sec, finalResult, rc, time.monotonic() - _attempt_start, usage)
+                if span is not None:
+                    span.set('result', finalResult)
+                    span.end()
+                metrics.flush()
 
                 # Check if abort ZTP on failure flag is set
-                if getField(section, 'halt-on-failure', bool, False) is True and finalResult == 'FAILED':
+                if getField(section, 'halt-on-failure', bool, False) is True and finalResult == 'FAILED' and retry is False:
                     logger.info('Halting ZTP as Configuration section %s FAILED and halt-on-failure flag is set.' % sec)
                     abort = True
                     break
 
+                # Park suspended or failed configuration section
+                if retry:
+                    interval = self.__backoffInterval(section, 'retry', len(section.get('retries')))
+                    wakeup[sec] = time.monotonic() + interval
+                    retrying.add(sec)
+                    logger.info('Configuration section %s will be retried in %s seconds (retry %d of %d).' %
+                                (sec, str(round(interval, 3)), len(section.get('retries')), getField(section, 'retry-count', int, getCfg('retry-count'))))
+                elif finalResult == 'SUSPEND':
+                    suspend_count[sec] = suspend_count.get(sec, 0) + 1
+                    interval = self.__backoffInterval(section, 'suspend', suspend_count.get(sec))
+                    wakeup[sec] = time.monotonic() + interval
+                    logger.info('Configuration section %s will be resumed in %s seconds.' % (sec, str(round(interval, 3))))
+                else:
+                    suspend_count.pop(sec, None)
+
                 # Check reboot on result flags
-                self.__rebootAction(section)
+                if skipped is False and deferred is False and retry is False:
+                    self.__rebootAction(section)
+
+            # Sleep till the earliest wake-up time if all the remaining configuration sections are suspended
+            if abort is False and section_names and all(s in wakeup for s in section_names):
+                delay = min(wakeup.values()) - time.monotonic()
+                if delay > 0:
+                    logger.debug('All configuration sections are suspended, sleeping for %.3f seconds.', delay)
+                    time.sleep(delay)
+
+        os.environ.pop('ZTP_DEFERRED_REBOOT', None)
+        # Serve pending reboot requests before ZTP result is evaluated. If ZTP is halted, the device
+        # is rebooted once ZTP session is complete.
+        if self.objztpJson['pending-reboot']:
+            if abort is False:
+                self.__pendingReboot('end of ZTP session')
+            else:
+                self.reboot_on_completion = True
 
+    def __statusSnapshot(self):
+        '''!
+         Return ZTP status and status of configuration sections, served on the status socket.
+        '''
+        objztpJson = self.objztpJson
+        if objztpJson is None:
+            return dict({'status': 'BOOT', 'sections': dict()})
+        ztpDict = objztpJson.ztpDict
+        result = dict([(k, ztpDict.get(k)) for k in ['status', 'error', 'ztp-json-source', 'ztp-json-version', 'start-timestamp', 'timestamp']])
+        sections = dict()
+        for (k, v) in list(ztpDict.items()):
+            if isinstance(v, dict):
+                sections[k] = dict([(f, v.get(f)) for f in ['status', 'exit-code', 'error', 'start-timestamp', 'timestamp']])
+        result['sections'] = sections
+        return result
+
+    @tracer.traced('process-ztp-json')
     def __processZTPJson(self):
         '''!
          Process ZTP JSON file downloaded using URL provided by DHCP Option 67, DHCPv6 Option 59 or
          local ZTP JSON file.
 
         '''
-        logger.debug('Starting to process ZTP JSON file %s.' % self.json_src)
+        logger.debug('Starting to process ZTP JSON file %s.', self.json_src)
         updateActivity('Processing ZTP JSON file %s' % self.json_src)
         try:
             # Read provided ZTP JSON file and load it
@@ -561,8 +919,9 @@ class ZTPEngine():
             logger.error('ZTP JSON file %s processing failed.' % (self.json_src))
             try:
                 os.remove(getCfg('ztp-json'))
-                if os.path.isfile(getCfg('ztp-json-shadow')):
-                    os.remove(getCfg('ztp-json-shadow'))
+                for f in ['ztp-json-shadow', 'ztp-json-shadow-volatile']:
+                    if os.path.isfile(getCfg(f)):
+                        os.remove(getCfg(f))
             except OSError as v:
                 if v.errno != errno.ENOENT:
                     logger.warning('Exception [%s] encountered while deleting ZTP JSON file %s.' % (str(v), getCfg('ztp-json')))
@@ -577,12 +936,22 @@ class ZTPEngine():
         if self.objztpJson['ztp-json-source'] is None:
             self.objztpJson['ztp-json-source'] = self.ztp_mode
 
+        # Resuming a ZTP session, possibly after a reboot requested by a configuration section
+        if self.objztpJson['status'] == 'IN-PROGRESS':
+            timeline.mark('resume')
+            # Pending reboot requests have been served if the device has been rebooted since
+            pending = self.objztpJson['pending-reboot']
+            if isinstance(pending, list) and next((r for r in pending if isinstance(r, dict) and r.get('boot-id') != bootId()), None) is not None:
+                logger.info('Resuming ZTP after the reboot requested by %s.' %
+                            ', '.join('%s (%s)' % (r.get('section'), r.get('reason')) for r in pending if isinstance(r, dict)))
+                del self.objztpJson['pending-reboot']
+
         # Check if ZTP process has already completed. If not mark start of ZTP.
         if self.objztpJson['status'] == 'BOOT':
-            self.objztpJson['status'] = 'IN-PROGRESS'
-            if self.objztpJson['start-timestamp'] is None:
-                self.objztpJson['start-timestamp'] = self.__ztp_engine_start_time
-                self.objztpJson.objJson.writeJson()
+            with self.objztpJson.transaction():
+                self.objztpJson['status'] = 'IN-PROGRESS'
+                if self.objztpJson['start-timestamp'] is None:
+                    self.objztpJson['start-timestamp'] = self.__ztp_engine_start_time
         elif self.objztpJson['status'] != 'IN-PROGRESS':
             # Re-start ZTP if requested
             if getCfg('monitor-startup-config') is True and self.__ztp_restart:
@@ -590,9 +959,12 @@ class ZTPEngine():
                 # Discover new ZTP data after deleting historic ZTP data
                 logger.info("ZTP restart requested. Deleting previous ZTP session JSON data.")
                 os.remove(getCfg('ztp-json'))
-                if os.path.isfile(getCfg('ztp-json-shadow')):
-                    os.remove(getCfg('ztp-json-shadow'))
+                for f in ['ztp-json-shadow', 'ztp-json-shadow-volatile']:
+                    if os.path.isfile(getCfg(f)):
+                        os.remove(getCfg(f))
                 self.objztpJson = None
+                timeline.reset()
+                metrics.inc('ztp_restarts_total')
                 return ("retry", "ZTP restart requested")
             else:
                 # ZTP was successfully completed in previous session. No need to proceed, return and exit service.
@@ -600,6 +972,8 @@ class ZTPEngine():
                 return ("stop", "ZTP completed")
 
         logger.info('Starting ZTP using JSON file %s at %s.' % (self.json_src, self.objztpJson['timestamp']))
+        sessionHistory.update(status='IN-PROGRESS', source=self.objztpJson['ztp-json-source'])
+        sessionHistory.addPhase('discovery', time.monotonic() - self.__discovery_start)
 
         # Initialize connectivity if not done already
         self.__loadZTPProfile("resume")
@@ -609,6 +983,12 @@ class ZTPEngine():
 
         # Determine ZTP result
         self.__evalZTPResult()
+        timeline.mark('ztp-completed', self.objztpJson['status'])
+        timeline.checkpoint()
+        sessionHistory.finish(self.objztpJson['status'])
+        if self.objztpJson['status'] == 'SUCCESS':
+            sectionFingerprints.commit([sec for sec in self.objztpJson.section_names \
+                                        if self.objztpJson.ztpDict.get(sec).get('status') == 'SUCCESS'])
 
         # Check restart ZTP condition
         # ZTP result is failed and restart-ztp-on-failure is set  or
@@ -624,8 +1004,9 @@ class ZTPEngine():
         # Mark ZTP for restart
         if _restart_ztp_missing_config or _restart_ztp_on_failure:
             os.remove(getCfg('ztp-json'))
-            if os.path.isfile(getCfg('ztp-json-shadow')):
-               os.remove(getCfg('ztp-json-shadow'))
+            for f in ['ztp-json-shadow', 'ztp-json-shadow-volatile']:
+                if os.path.isfile(getCfg(f)):
+                    os.remove(getCfg(f))
             self.objztpJson = None
             # Remove startup-config file to obtain a new one through ZTP
             if getCfg('monitor-startup-config') is True and os.path.isfile(getCfg('config-db-json')):
@@ -654,7 +1035,7 @@ class ZTPEngine():
          @return          Always returns True
 
         '''
-        logger.debug('Set ZTP mode as %s and provisioning data is %s.' %  (mode, src_file))
+        logger.debug('Set ZTP mode as %s and provisioning data is %s.', mode, src_file)
         dhcp_list = ['dhcp-opt67', 'dhcp6-opt59', 'dhcp-opt239', 'dhcp6-opt239', 'dhcp-opt225-graph-url']
         self.json_src = src_file
         self.ztp_mode = mode
@@ -689,47 +1070,191 @@ class ZTPEngine():
 
         '''
 
-        logger.debug('Downloading provided URL %s and saving as %s.' % (url_file, dst_file))
+        logger.debug('Downloading provided URL %s and saving as %s.', url_file, dst_file)
+        url_str = self.__readURL(url_file, url_prefix)
+        if url_str is None:
+            return False
+        updateActivity('Downloading provisioning data from %s to %s' % (url_str, dst_file))
+        if self.__getURL(url_str, dst_file) is False:
+            return False
+        # Get the interface on which ZTP data was received
+        self.__read_ztp_interface()
+        return True
+
+    def __readURL(self, url_file, url_prefix=None):
+        '''!
+         Read the URL to be downloaded from a file.
+
+         @param url_file (str) File containing URL to be downloaded
+         @param url_prefix (str) Optional string to be prepended to url
+
+         @return   URL, None if it could not be read or is malformed
+
+        '''
+        url_str = None
         try:
-            # Read the url file and identify the URL to be downloaded
             f = open(url_file, 'r')
             url_str = f.readline().strip()
             f.close()
+        except (IOError, OSError) as e:
+            logger.error('Exception [%s] encountered while reading provided URL file %s.' % (str(e), url_file))
+            return None
+
+        if ' ' in url_str or '\t' in url_str:
+            logger.error('Failed to download provided URL %s, URL contains whitespace.' % (url_str))
+            return None
+
+        res = urlparse(url_str)
+        if res is None or res.scheme == '':
+            # Use passed url_prefix to construct final URL
+            if url_prefix is not None:
+                url_str = url_prefix + url_str
+                if urlparse(url_str) is None:
+                    logger.error('Failed to download provided URL %s, malformed url.' % (url_str))
+                    return None
+            else:
+                logger.error('Failed to download provided URL %s, malformed url.' % (url_str))
+                return None
+        return url_str
 
-            if ' ' in url_str or '\t' in url_str:
-                logger.error('Failed to download provided URL %s, URL contains whitespace.' % (url_str))
-                return False
+    def __getURL(self, url_str, dst_file, objDownloader=None):
+        '''!
+         Download a URL and store contents as a dst_file. It can be called from any thread.
 
-            res = urlparse(url_str)
-            if res is None or res.scheme == '':
-                # Use passed url_prefix to construct final URL
-                if url_prefix is not None:
-                    url_str = url_prefix + url_str
-                    if urlparse(url_str) is None:
-                        logger.error('Failed to download provided URL %s, malformed url.' % (url_str))
-                        return False
-                else:
-                    logger.error('Failed to download provided URL %s, malformed url.' % (url_str))
-                    return False
+         @param url_str (str) URL to be downloaded
+         @param dst_file (str) Destination file to be used
+         @param objDownloader (Downloader) Optional downloader object to be used
 
+         @return   True - If URL was successfully downloaded
+                   False - Failed to download URL or download was cancelled
+
+        '''
+        try:
             # Create a downloader object using source and destination information
-            updateActivity('Downloading provisioning data from %s to %s' % (url_str, dst_file))
             logger.info('Downloading provisioning data from %s to %s' % (url_str, dst_file))
-            objDownloader = Downloader(url_str, dst_file)
+            if objDownloader is None:
+                objDownloader = Downloader()
             # Initiate download
-            rc, fname = objDownloader.getUrl()
+            _start = time.monotonic()
+            rc, fname = objDownloader.getUrl(url_str, dst_file)
             # Check download result
             if rc == 0 and fname is not None and os.path.isfile(dst_file):
-                # Get the interface on which ZTP data was received
-                self.__read_ztp_interface()
+                self.__downloadMetrics('success', time.monotonic() - _start, os.path.getsize(dst_file))
                 return True
+            elif objDownloader.isCancelled():
+                # Another source has been downloaded first
+                self.__downloadMetrics('cancelled', time.monotonic() - _start)
+                logger.debug('Download of provided URL %s cancelled.', url_str)
+                return False
             else:
+                self.__downloadMetrics('failure', time.monotonic() - _start)
                 logger.error('Failed to download provided URL %s returncode=%d.' % (url_str, rc))
                 return False
         except (IOError, OSError) as e:
             logger.error('Exception [%s] encountered during download of provided URL %s.' % (str(e), url_str))
             return False
 
+    def __downloadMetrics(self, result, duration, size=0):
+        '''!
+         Record result, size and duration of a download of provisioning data.
+
+         @param result (str) 'success', 'failure' or 'cancelled'
+         @param duration (float) Download duration in seconds
+         @param size (int) Number of bytes downloaded
+        '''
+        metrics.inc('ztp_downloads_total', {'result': result})
+        metrics.inc('ztp_download_bytes_total', {'result': result}, size)
+        metrics.observe('ztp_download_duration_seconds', duration, {'result': result})
+
+    def __downloadSources(self, sources):
+        '''!
+         Download provisioning data from the discovered sources. All the sources are downloaded
+         concurrently and the result is chosen using their order of precedence. Data provided by
+         a source is used as soon as all the sources with higher precedence have failed. Downloads
+         from the remaining sources are cancelled.
+
+         @param sources (list) List of (mode, url_file, dst_file, url_prefix) tuples in order of precedence
+
+         @return   ZTP mode of the source whose data has been downloaded, None if none of them could be downloaded
+
+        '''
+        if len(sources) == 0:
+            return None
+        if len(sources) == 1 or getCfg('concurrent-discovery') is False:
+            for (mode, url_file, dst_file, url_prefix) in sources:
+                if self.__downloadURL(url_file, dst_file, url_prefix=url_prefix):
+                    return mode
+            return None
+
+        logger.debug('Downloading provisioning data from sources %s concurrently.', ', '.join([s[0] for s in sources]))
+        # Download to a separate file per source, as some sources share the same destination file
+        tmp_files = [dst_file + '.' + mode for (mode, url_file, dst_file, url_prefix) in sources]
+        urls = [self.__readURL(url_file, url_prefix) for (mode, url_file, dst_file, url_prefix) in sources]
+        downloaders = [Downloader() for s in sources]
+        # Sources whose URL could not be read have failed
+        results = [None if url_str is not None else False for url_str in urls]
+        cond = threading.Condition()
+        parent = tracer.current()
+        if any(url_str is not None for url_str in urls):
+            updateActivity('Downloading provisioning data from %s' % ', '.join([u for u in urls if u is not None]))
+
+        # Worker threads only download, engine state is updated once the result is chosen
+        def _download(i):
+            rv = False
+            try:
+                with tracer.span('download-source', {'source': sources[i][0]}, parent=parent):
+                    rv = self.__getURL(urls[i], tmp_files[i], objDownloader=downloaders[i])
+            finally:
+                with cond:
+                    results[i] = rv
+                    cond.notify()
+
+        threads = []
+        for i in range(len(sources)):
+            if urls[i] is None:
+                continue
+            t = threading.Thread(target=_download, args=(i,), name='ztp-discover-%s' % sources[i][0], daemon=True)
+            t.start()
+            threads.append(t)
+
+        # Wait for the source with highest precedence which has not failed
+        winner = None
+        with cond:
+            while True:
+                pending = False
+                for i, rv in enumerate(results):
+                    if rv is None:
+                        pending = True
+                        break
+                    if rv is True:
+                        winner = i
+                        break
+                if pending is False:
+                    break
+                cond.wait()
+
+        # Cancel remaining downloads
+        for i in range(len(sources)):
+            if i != winner and results[i] is None:
+                logger.debug('Cancelling download of provisioning data from %s.', sources[i][0])
+                downloaders[i].cancel()
+        for t in threads:
+            t.join()
+
+        for i in range(len(sources)):
+            if i == winner:
+                os.replace(tmp_files[i], sources[i][2])
+            elif os.path.isfile(tmp_files[i]):
+                os.remove(tmp_files[i])
+
+        if winner is None:
+            return None
+        logger.info('Using provisioning data downloaded from %s.' % sources[winner][0])
+        # Get the interface on which ZTP data was received
+        self.__read_ztp_interface()
+        return sources[winner][0]
+
+    @tracer.traced('discover')
     def __discover(self):
         '''!
          ZTP data discover logic. Following is the order of precedence followed:
@@ -777,6 +1302,8 @@ class ZTPEngine():
 
         if os.path.isfile(getCfg('ztp-json-local')):
             return self.__updateZTPMode('local-fs', getCfg('ztp-json-local'))
+        # Network sources in order of precedence
+        sources = []
         if os.path.isfile(getCfg('opt67-url')):
             _tftp_server = None
             _url_prefix = None
@@ -787,21 +1314,29 @@ class ZTPEngine():
                 fh.close()
                 if _tftp_server is not None and _tftp_server != '':
                     _url_prefix = 'tftp://' + _tftp_server + '/'
-            if self.__downloadURL(getCfg('opt67-url'), getCfg('ztp-json-opt67'), url_prefix=_url_prefix):
-                return self.__updateZTPMode('dhcp-opt67', getCfg('ztp-json-opt67'))
+            sources.append(('dhcp-opt67', getCfg('opt67-url'), getCfg('ztp-json-opt67'), _url_prefix))
         if os.path.isfile(getCfg('opt59-v6-url')):
-            if self.__downloadURL(getCfg('opt59-v6-url'), getCfg('ztp-json-opt59')):
-                return self.__updateZTPMode('dhcp6-opt59', getCfg('ztp-json-opt59'))
+            sources.append(('dhcp6-opt59', getCfg('opt59-v6-url'), getCfg('ztp-json-opt59'), None))
         if os.path.isfile(getCfg('opt239-url')):
-            if self.__downloadURL(getCfg('opt239-url'), getCfg('provisioning-script')):
-                self.__createProvScriptJson()
-                return self.__updateZTPMode('dhcp-opt239', getCfg('ztp-json'))
+            sources.append(('dhcp-opt239', getCfg('opt239-url'), getCfg('provisioning-script'), None))
         if os.path.isfile(getCfg('opt239-v6-url')):
-            if self.__downloadURL(getCfg('opt239-v6-url'), getCfg('provisioning-script')):
-                self.__createProvScriptJson()
-                return self.__updateZTPMode('dhcp6-opt239', getCfg('ztp-json'))
+            sources.append(('dhcp6-opt239', getCfg('opt239-v6-url'), getCfg('provisioning-script'), None))
+
+        if len(sources) != 0:
+            timeline.mark('dhcp-option', ', '.join([s[0] for s in sources]), once=True)
+        mode = self.__downloadSources(sources)
+        if mode is not None:
+            timeline.mark('ztp-json-downloaded', mode)
+        if mode == 'dhcp-opt67':
+            return self.__updateZTPMode('dhcp-opt67', getCfg('ztp-json-opt67'))
+        if mode == 'dhcp6-opt59':
+            return self.__updateZTPMode('dhcp6-opt59', getCfg('ztp-json-opt59'))
+        if mode == 'dhcp-opt239' or mode == 'dhcp6-opt239':
+            self.__createProvScriptJson()
+            return self.__updateZTPMode(mode, getCfg('ztp-json'))
         if os.path.isfile(getCfg('graph-url')):
             if self.__createGraphserviceJson():
+                timeline.mark('ztp-json-downloaded', 'dhcp-opt225-graph-url')
                 return self.__updateZTPMode('dhcp-opt225-graph-url', getCfg('ztp-json'))
         return False
 
@@ -810,9 +1345,21 @@ class ZTPEngine():
         self.__cleanup_dhcp_leases()
         _msg = '%s. Waiting for %d seconds before restarting ZTP.' % (msg, getCfg('restart-ztp-interval'))
         logger.warning(_msg)
+        timeline.mark('discovery-restart', msg)
+        metrics.inc('ztp_restarts_total')
+        sessionHistory.restart()
+        metrics.flush(force=True)
         updateActivity(_msg)
-        time.sleep(getCfg('restart-ztp-interval'))
+        # Restart earlier if new provisioning data may be available
+        eventWait.clear()
+        deadline = time.monotonic() + getCfg('restart-ztp-interval')
+        while time.monotonic() < deadline:
+            events = [e for e in eventWait.wait(deadline - time.monotonic()) if e != EVENT_SIGNAL]
+            if len(events) != 0:
+                logger.info('Restarting ZTP before end of wait time on events: %s.' % ', '.join(events))
+                break
         self.ztp_mode = 'DISCOVERY'
+        self.__discovery_start = time.monotonic()
         # Force install of ZTP configuration profile
         self.__ztp_profile_loaded = False
         # Restart link-scan
@@ -823,6 +1370,8 @@ class ZTPEngine():
          ZTP service loop which peforms provisioning data discovery and initiates processing.
         '''
 
+        # Keep history of recent activities and time spent in each of them
+        activityHistory.start()
         updateActivity('Initializing')
 
         # Set testing mode
@@ -839,6 +1388,29 @@ class ZTPEngine():
             self.__ztp_restart = True
             os.remove(getCfg('ztp-restart-flag'))
 
+        # Record milestones of the ZTP session, a new session is started if no ZTP JSON is present
+        new_session = os.path.isfile(getCfg('ztp-json')) is False
+        timeline.start(new_session=new_session)
+        sessionHistory.start(new_session=new_session)
+        metrics.start()
+        tracer.start()
+
+        # Serve ZTP status and events on a local socket
+        statusServer.provide(self.__statusSnapshot)
+        statusServer.start()
+        # Warm up the plugin host while provisioning data is discovered
+        if getCfg('plugin-host'):
+            pluginHost.start()
+
+        # Events which end discovery and restart delays: new DHCP options, new startup configuration,
+        # interfaces becoming operationally up, ztp_cfg.json changes and signals
+        for f in ['opt66-tftp-server', 'opt67-url', 'opt59-v6-url', 'opt239-url', 'opt239-v6-url', 'graph-url', 'acl-url',
+                  'ztp-json-local', 'config-db-json']:
+            eventWait.watchFile(getCfg(f))
+        eventWait.watchFile('/etc/sonic/minigraph.xml')
+        eventWait.watchLinks()
+        eventWait.watchSignals()
+
         if self.test_mode:
             logger.warning('ZTP service started in test mode with restricted functionality.')
         else:
@@ -849,75 +1421,92 @@ class ZTPEngine():
         self.ztp_mode = 'DISCOVERY'
         # Main provisioning data discovery loop
         while self.ztp_mode == 'DISCOVERY':
-            updateActivity('Discovering provisioning data', overwrite=False)
-            try:
-                result = self.__discover()
-            except Exception as e:
-                logger.error("Exception [%s] encountered while running the discovery logic." %(str(e)))
-                _exc_type, _exc_value, _exc_traceback = sys.exc_info()
-                __tb = traceback.extract_tb(_exc_traceback)
-                for l in __tb:
-                    logger.debug('  File ' + l[0] + ', line ' + str(l[1]) + ', in ' + str(l[2]))
-                    logger.debug('    ' + str(l[3]))
-                self.__forceRestartDiscovery("Invalid provisioning data received")
-                continue
-                                 
-            if result:
-                if self.ztp_mode == 'MANUAL_CONFIG':
-                    if os.path.isfile('/etc/sonic/minigraph.xml'):
-                        logger.info("Configuration file '/etc/sonic/minigraph.xml' detected. Shutting down ZTP service.")
-                    elif os.path.isfile(getCfg('config-db-json')):
-                        logger.info("Configuration file '%s' detected. Shutting down ZTP service." % (getCfg('config-db-json')))
-                    else:
-                        logger.info("Manual configuration detected. Shutting down ZTP service.")
-                    break
-                elif self.ztp_mode != 'DISCOVERY':
-                    (rv, msg) = self.__processZTPJson()
-                    if rv == "retry":
-                        self.ztp_mode = 'DISCOVERY'
-                    elif rv == "restart":
-                        self.__forceRestartDiscovery(msg)
-                    else:
+            with tracer.span('discovery-iteration'):
+                updateActivity('Discovering provisioning data', overwrite=False)
+                metrics.inc('ztp_discovery_iterations_total')
+                metrics.flush()
+                try:
+                    result = self.__discover()
+                except Exception as e:
+                    logger.error("Exception [%s] encountered while running the discovery logic." %(str(e)))
+                    _exc_type, _exc_value, _exc_traceback = sys.exc_info()
+                    __tb = traceback.extract_tb(_exc_traceback)
+                    for l in __tb:
+                        logger.debug('  File ' + l[0] + ', line ' + str(l[1]) + ', in ' + str(l[2]))
+                        logger.debug('    ' + str(l[3]))
+                    self.__forceRestartDiscovery("Invalid provisioning data received")
+                    continue
+
+                if result:
+                    if self.ztp_mode == 'MANUAL_CONFIG':
+                        if os.path.isfile('/etc/sonic/minigraph.xml'):
+                            logger.info("Configuration file '/etc/sonic/minigraph.xml' detected. Shutting down ZTP service.")
+                        elif os.path.isfile(getCfg('config-db-json')):
+                            logger.info("Configuration file '%s' detected. Shutting down ZTP service." % (getCfg('config-db-json')))
+                        else:
+                            logger.info("Manual configuration detected. Shutting down ZTP service.")
                         break
+                    elif self.ztp_mode != 'DISCOVERY':
+                        (rv, msg) = self.__processZTPJson()
+                        if rv == "retry":
+                            self.ztp_mode = 'DISCOVERY'
+                            self.__discovery_start = time.monotonic()
+                        elif rv == "restart":
+                            self.__forceRestartDiscovery(msg)
+                        else:
+                            break
 
-            # Initialize in-band interfaces to establish connectivity if not done already
-            self.__loadZTPProfile("discovery")
-            logger.debug('Provisioning data not found.')
-
-            # Scan for inband interfaces to link up and restart interface connectivity
-            if self.__link_scan():
-                updateActivity('Restarting network discovery after link scan')
-                logger.info('Restarting network discovery after link scan.')
-                runCommand('systemctl restart interfaces-config', capture_stdout=False)
-                logger.info('Restarted network discovery after link scan.')
-                _start_time = time.time()
-                continue
+                # Initialize in-band interfaces to establish connectivity if not done already
+                self.__loadZTPProfile("discovery")
+                logger.debug('Provisioning data not found.')
 
-            # Start keeping time of last time restart networking was done
-            if _start_time is None:
-                _start_time = time.time()
-
-            # Check if we have to restart networking
-            if (time.time() - _start_time > getCfg('restart-ztp-interval')):
-                updateActivity('Restarting network discovery')
-                if self.test_mode is False:
-                    # Remove existing leases to source new provisioning data
-                    self.__cleanup_dhcp_leases()
-                    logger.info('Restarting network discovery.')
+                # Scan for inband interfaces to link up and restart interface connectivity
+                if self.__link_scan():
+                    updateActivity('Restarting network discovery after link scan')
+                    logger.info('Restarting network discovery after link scan.')
                     runCommand('systemctl restart interfaces-config', capture_stdout=False)
-                    logger.info('Restarted network discovery.')
-                _start_time = time.time()
-                continue
-
-            # Try after sometime
-            time.sleep(getCfg('discovery-interval'))
+                    metrics.inc('ztp_link_scan_restarts_total')
+                    metrics.inc('ztp_interfaces_config_restarts_total')
+                    logger.info('Restarted network discovery after link scan.')
+                    _start_time = time.time()
+                    continue
+
+                # Start keeping time of last time restart networking was done
+                if _start_time is None:
+                    _start_time = time.time()
+
+                # Check if we have to restart networking
+                if (time.time() - _start_time > getCfg('restart-ztp-interval')):
+                    updateActivity('Restarting network discovery')
+                    if self.test_mode is False:
+                        # Remove existing leases to source new provisioning data
+                        self.__cleanup_dhcp_leases()
+                        logger.info('Restarting network discovery.')
+                        runCommand('systemctl restart interfaces-config', capture_stdout=False)
+                        metrics.inc('ztp_interfaces_config_restarts_total')
+                        logger.info('Restarted network discovery.')
+                    _start_time = time.time()
+                    continue
+
+                # Try after sometime, or as soon as something changes
+                events = eventWait.wait(getCfg('discovery-interval'))
+                if len(events) != 0:
+                    logger.debug('Discovery woken up by events: %s.', ', '.join(events))
 
 
         # Cleanup installed ZTP configuration profile
         self.__removeZTPProfile()
         if self.reboot_on_completion and self.test_mode == False:
             updateActivity('System reboot requested')
+            timeline.mark('reboot-requested', 'ztp-completed')
+            metrics.inc('ztp_reboots_total')
+            sessionHistory.reboot()
+            metrics.flush(force=True)
+            if self.objztpJson is not None:
+                self.objztpJson.checkpoint()
+            timeline.checkpoint()
             systemReboot()
+        metrics.flush(force=True)
         updateActivity('Exiting ZTP server')
 
 def main():
@@ -982,6 +1571,14 @@ def main():
         if getCfg('test-mode') is True:
             _test_mode = True
 
+        # Apply changes of the configuration file without restarting the service, other
+        # configuration items are read from the new configuration when they are used
+        def applyCfg(snapshot):
+            if not _debug:
+                logger.setLevel(snapshot.get('log-level') or 'INFO')
+            eventWait.notify('ztp-cfg')
+        ztp.ZTPCfg.ztpCfg.watch(applyCfg)
+
     except Exception as e:
         print('Exception [%s] occured while reading ZTP configuration file.' % str(e))
         print('Exiting ZTP service.')
@@ -991,6 +1588,18 @@ def main():
     if _test_mode and getCfg('feat-console-logging', True):
         logger.setConsoleLogging(True)
 
+    # Record service process id, used by ztp utility to determine service state
+    writePidFile()
+    atexit.register(removePidFile)
+    atexit.register(statusServer.stop)
+    atexit.register(activityHistory.stop)
+    atexit.register(sessionHistory.stop)
+    atexit.register(pluginHost.stop)
+    atexit.register(timeline.checkpoint)
+
+    # Profile ZTP service on demand: SIGUSR1 dumps thread stacks, SIGUSR2 starts and stops cProfile collection
+    profiler.install()
+
     # Start ZTP service
     objEngine = ZTPEngine()
 
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Compare cost of loading and dumping JSON data using available JSON serializers.
+
+Representative data is used: a shadow ZTP JSON file of a ZTP session with a few configuration
+sections and with 400 configuration sections, a configuration section carrying a config_db
+with 64 ports, and a config_db with 256 ports and a large ACL table. Pretty output (indent=4)
+is only generated using the Python json module.
+'''
+
+import benchlib
+
+from ztp.JsonReader import getSerializer
+
+def shadowZTPJson(num_sections):
+    ztp = dict({'status': 'IN-PROGRESS', 'timestamp': '2019-01-01 00:00:00 UTC', 'ztp-json-version': '1.0'})
+    for i in range(num_sections):
+        ztp['%04d-configdb-json' % (i+1)] = {'status': 'SUCCESS', 'timestamp': '2019-01-01 00:00:00 UTC',
+                                             'start-timestamp': '2019-01-01 00:00:00 UTC', 'ignore-result': False,
+                                             'halt-on-failure': False, 'reboot-on-success': False, 'reboot-on-failure': False,
+                                             'timing': {'total': 1.25, 'runs': 1, 'last': 1.25}}
+    return {'ztp': ztp}
+
+def configDb(num_ports, num_rules):
+    config = dict()
+    config['PORT'] = {'Ethernet%d' % (p*4): {'admin_status': 'up', 'alias': 'fortyGigE0/%d' % (p*4), 'index': str(p),
+                                             'lanes': ','.join(str(p*4+l) for l in range(4)), 'mtu': '9100', 'speed': '40000'}
+                      for p in range(num_ports)}
+    config['ACL_RULE'] = {'DATAACL|RULE_%d' % r: {'PACKET_ACTION': 'FORWARD', 'PRIORITY': str(9999 - r),
+                                                  'SRC_IP': '10.%d.%d.0/24' % (r // 256, r % 256)}
+                          for r in range(num_rules)}
+    config['DEVICE_METADATA'] = {'localhost': {'hostname': 'sonic', 'hwsku': 'Force10-S6000', 'platform': 'x86_64-dell_s6000_s1220-r0'}}
+    return config
+
+def main():
+    datasets = [('shadow 10 sections', shadowZTPJson(10)),
+                ('shadow 400 sections', shadowZTPJson(400)),
+                ('section config_db', {'0001-configdb-json': {'config-db': configDb(64, 0)}}),
+                ('config_db large', configDb(256, 4096))]
+    serializers = [getSerializer('json')]
+    try:
+        serializers.append(getSerializer('orjson'))
+    except ValueError:
+        pass
+    rows = []
+    for (name, data) in datasets:
+        text = getSerializer('json').dumps(data)
+        repeat = max(5, min(1000, 2000000 // len(text)))
+        for objSerializer in serializers:
+            for indent in ([None, 4] if objSerializer.name == 'json' else [None]):
+                (dump_best, dump_median) = benchlib.measure(lambda: [objSerializer.dumps(data, indent) for i in range(repeat)], repeat=5)
+                load = '-'
+                if indent is None:
+                    (load_best, load_median) = benchlib.measure(lambda: [objSerializer.loads(text) for i in range(repeat)], repeat=5)
+                    load = '%.1f us' % (load_best * 1e6 / repeat)
+                rows.append((name, '%.1f KB' % (len(text) / 1024), objSerializer.name + (' indent=4' if indent else ''),
+                             '%.1f us' % (dump_best * 1e6 / repeat), load))
+    benchlib.report('JSON serializers (per operation)', rows, ('data', 'size', 'serializer', 'dump', 'load'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Measure per configuration section overhead of running a built-in plugin.
+
+The test-plugin built-in plugin, which does no work for an empty configuration section, is
+executed as a new Python interpreter the way plugins have been executed so far, and from the
+plugin host. The time taken from plugin start to completion as seen by ZTP service is reported.
+'''
+
+import os
+import sys
+import json
+import benchlib
+
+import ztp.ZTPLib
+from ztp.ZTPLib import getCfg, setCfg, runCommand
+from ztp.PluginHost import pluginHost
+
+PLUGINS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'usr', 'lib', 'ztp', 'plugins'))
+
+def main():
+    # Plugins executed directly use the same ZTP library
+    lib_dir = os.path.dirname(os.path.dirname(os.path.abspath(ztp.ZTPLib.__file__)))
+    os.environ['PYTHONPATH'] = os.pathsep.join([lib_dir] + ([os.environ.get('PYTHONPATH')] if os.environ.get('PYTHONPATH') else []))
+    setCfg('plugins-dir', PLUGINS_DIR)
+    plugin = os.path.join(PLUGINS_DIR, 'test-plugin')
+    input_file = os.path.join(getCfg('ztp-tmp'), 'bench_plugin_input.json')
+    with open(input_file, 'w') as f:
+        json.dump({'0001-test-plugin': {}}, f)
+    cmd = '%s %s' % (plugin, input_file)
+
+    def direct():
+        assert(runCommand(cmd, capture_stdout=False) == 0)
+    def host():
+        assert(pluginHost.run(cmd) == 0)
+
+    pluginHost.start()
+    rows = []
+    try:
+        for (name, func) in [('new interpreter', direct), ('plugin host', host)]:
+            func()
+            best, median = benchlib.measure(func, repeat=20)
+            rows.append((name, '%.1f ms' % (best * 1000), '%.1f ms' % (median * 1000)))
+    finally:
+        pluginHost.stop()
+        os.remove(input_file)
+    benchlib.report('Plugin execution overhead (per configuration section)', rows, ('mode', 'best', 'median'))
+
+if __name__ == '__main__':
+    main()
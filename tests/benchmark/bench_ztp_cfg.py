@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Measure cost of configuration lookups.
+
+The lookup performed by getCfg() before configuration snapshots were introduced, which
+reads the configuration file contents and the default configuration and converts the value
+to the data type of the default value on every call, is compared with getCfg() and with direct
+lookups on a configuration snapshot.
+'''
+
+import benchlib
+
+import ztp.ZTPCfg
+from ztp.ZTPLib import getCfg, getValue
+from ztp.defaults import defaultCfg
+
+## Number of lookups per measurement
+LOOKUPS = 100000
+
+## Configuration items looked up, a mix of items set in the configuration file and default values
+KEYS = ['discovery-interval', 'log-level', 'admin-mode', 'ztp-json', 'curl-retries', 'monitor-startup-config']
+
+def legacyGetCfg(key, default_value=None):
+    '''!
+     Configuration lookup as done without a configuration snapshot.
+    '''
+    cfgObj = ztp.ZTPCfg.ztpCfg
+    if cfgObj[key] is None:
+        val = defaultCfg.get(key)
+        if val is None:
+            return default_value
+        return val
+    else:
+        if defaultCfg.get(key) is not None:
+            return getValue(cfgObj[key], type(defaultCfg[key]))
+        else:
+            return cfgObj[key]
+
+def main():
+    cfg = ztp.ZTPCfg.ztpCfg
+    cfg.set('discovery-interval', '10')
+    cfg.set('log-level', 'INFO')
+    keys = (KEYS * (LOOKUPS // len(KEYS) + 1))[:LOOKUPS]
+    snapshot = cfg.snapshot()
+
+    def legacy():
+        for k in keys:
+            legacyGetCfg(k)
+    def current():
+        for k in keys:
+            getCfg(k)
+    def direct():
+        for k in keys:
+            snapshot.get(k)
+    def attribute():
+        for i in range(LOOKUPS):
+            snapshot.discovery_interval
+
+    rows = []
+    for (name, func) in [('legacy getCfg()', legacy), ('getCfg()', current),
+                         ('snapshot.get()', direct), ('snapshot attribute', attribute)]:
+        best, median = benchlib.measure(func, repeat=5)
+        rows.append((name, '%.1f ns' % (best * 1e9 / LOOKUPS), '%.1f ns' % (median * 1e9 / LOOKUPS)))
+    benchlib.report('Configuration lookup (per lookup)', rows, ('method', 'best', 'median'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Measure cost of persisting configuration section status transitions.
+
+For ZTP JSON files of increasing size, each configuration section is moved through
+IN-PROGRESS and SUCCESS states the way ZTP service does it. The time taken per section
+and the number of files written per section are reported, both for individual
+updates and for updates coalesced using ZTPJson.transaction(). Reported file writes include the
+configuration section file written once for each section when ZTP JSON is loaded.
+'''
+
+import os
+import json
+import benchlib
+
+from ztp.ZTPLib import getCfg
+from ztp.ZTPSections import ZTPJson
+
+## Number of file replacements performed
+writes = 0
+_replace = os.replace
+
+def _counting_replace(src, dst):
+    global writes
+    writes += 1
+    _replace(src, dst)
+
+os.replace = _counting_replace
+
+def createZTPJson(num_sections, payload_size):
+    '''!
+     Create a synthetic ZTP JSON file with specified number of configuration sections.
+    '''
+    ztp = dict()
+    for i in range(num_sections):
+        ztp['%04d-snmp' % (i+1)] = {'plugin': {'name': 'snmp'},
+                                    'communities-ro': ['public'],
+                                    'payload': 'x' * payload_size}
+    with open(getCfg('ztp-json'), 'w') as f:
+        json.dump({'ztp': ztp}, f)
+
+def runSections(coalesce):
+    objztpJson = ZTPJson()
+    for sec in objztpJson.section_names:
+        section = objztpJson.ztpDict.get(sec)
+        if coalesce:
+            with objztpJson.transaction():
+                objztpJson.updateStatus(section, 'IN-PROGRESS')
+                section['start-timestamp'] = section['timestamp']
+            with objztpJson.transaction():
+                section['exit-code'] = 0
+                objztpJson.updateStatus(section, 'SUCCESS')
+        else:
+            objztpJson.updateStatus(section, 'IN-PROGRESS')
+            section['start-timestamp'] = section['timestamp']
+            objztpJson.objJson.writeJson()
+            section['exit-code'] = 0
+            objztpJson.updateStatus(section, 'SUCCESS')
+
+def main():
+    global writes
+    rows = []
+    for num_sections in [10, 100, 400]:
+        for coalesce in [False, True]:
+            createZTPJson(num_sections, 1024)
+            writes = 0
+            def run():
+                createZTPJson(num_sections, 1024)
+                runSections(coalesce)
+            best, median = benchlib.measure(run, repeat=3)
+            rows.append((num_sections, 'coalesced' if coalesce else 'individual',
+                         '%.3f ms' % (best * 1000 / num_sections),
+                         '%.3f ms' % (median * 1000 / num_sections),
+                         '%.1f' % (writes / 3 / num_sections)))
+    benchlib.report('ZTP JSON status persistence (per configuration section)', rows,
+                    ('sections', 'mode', 'best', 'median', 'writes'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Measure memory used by ZTP JSON data and cost of status transitions for large ZTP JSON files.
+
+A synthetic ZTP JSON file with configuration sections carrying inline configuration payloads is
+loaded, and each configuration section is moved through IN-PROGRESS and SUCCESS states. Results are
+reported with all configuration section data kept in memory (section-inline-size set to a value
+larger than any section) and with large configuration sections kept only in their input files.
+Reported memory is the memory still allocated by the loaded ZTP JSON data, and the size of the
+ZTP JSON file written on each durable status transition.
+'''
+
+import os
+import gc
+import json
+import time
+import tracemalloc
+import benchlib
+
+from ztp.ZTPLib import getCfg, setCfg
+from ztp.ZTPSections import ZTPJson
+
+def createZTPJson(num_sections, payload_size):
+    '''!
+     Create a synthetic ZTP JSON file with configuration sections carrying inline configuration.
+    '''
+    ztp = dict()
+    for i in range(num_sections):
+        ztp['%04d-configdb-json' % (i+1)] = {'plugin': {'name': 'configdb-json'},
+                                             'config-db': {'PORT': {'Ethernet%d' % p: {'description': 'x' * (payload_size // 64)}
+                                                                    for p in range(64)}}}
+    with open(getCfg('ztp-json'), 'w') as f:
+        json.dump({'ztp': ztp}, f)
+    return os.path.getsize(getCfg('ztp-json'))
+
+def runSections(num_sections, payload_size):
+    createZTPJson(num_sections, payload_size)
+    gc.collect()
+    tracemalloc.start()
+    objztpJson = ZTPJson()
+    gc.collect()
+    (resident, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for sec in objztpJson.section_names:
+        section = objztpJson[sec]
+        objztpJson.updateStatus(section, 'IN-PROGRESS')
+        with objztpJson.transaction():
+            section['exit-code'] = 0
+            objztpJson.updateStatus(section, 'SUCCESS')
+    elapsed = time.perf_counter() - start
+    return (resident, peak, elapsed / num_sections, os.path.getsize(getCfg('ztp-json')))
+
+def main():
+    saved_value = getCfg('section-inline-size')
+    rows = []
+    for (num_sections, payload_size) in [(100, 65536), (400, 65536)]:
+        for inline_size in [2**31, saved_value]:
+            setCfg('section-inline-size', inline_size)
+            size = createZTPJson(num_sections, payload_size)
+            (resident, peak, transition, json_size) = runSections(num_sections, payload_size)
+            rows.append(('%d (%.1f MB)' % (num_sections, size / 2**20), 'all' if inline_size == 2**31 else 'index',
+                         '%.1f MB' % (resident / 2**20), '%.1f MB' % (peak / 2**20),
+                         '%.3f ms' % (transition * 1000), '%.1f KB' % (json_size / 1024)))
+    setCfg('section-inline-size', saved_value)
+    benchlib.report('Large ZTP JSON: memory and cost per configuration section', rows,
+                    ('sections', 'in memory', 'resident', 'peak', 'transition', 'ztp-json size'))
+
+if __name__ == '__main__':
+    main()
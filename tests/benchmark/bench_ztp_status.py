@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Measure latency of 'ztp status --json' while ZTP service is running.
+
+A process posing as ZTP service is started and recorded in the pid file, and a shadow
+ZTP JSON file with an increasing number of configuration sections is created. The time
+taken by the command once the ztp utility has been loaded is reported, Python interpreter
+startup is not included. The script exits with a non-zero status if the command takes
+more than 50 ms.
+'''
+
+import os
+import sys
+import io
+import json
+import subprocess
+import contextlib
+import importlib.util
+import importlib.machinery
+import benchlib
+
+from ztp.ZTPLib import getCfg, getTimestamp
+
+## Latency budget of the command, in seconds
+BUDGET = 0.050
+
+ZTP_CMD = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'usr', 'bin', 'ztp'))
+
+def loadZtpUtility():
+    '''!
+     Load ztp utility as a module.
+    '''
+    loader = importlib.machinery.SourceFileLoader('ztp_utility', ZTP_CMD)
+    spec = importlib.util.spec_from_loader('ztp_utility', loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+def createShadow(num_sections):
+    '''!
+     Create a shadow ZTP JSON file with specified number of configuration sections.
+    '''
+    ztp = dict({'status': 'IN-PROGRESS', 'ztp-json-source': 'dhcp-opt67', 'ztp-json-version': '1.0',
+                'start-timestamp': getTimestamp(), 'timestamp': getTimestamp()})
+    for i in range(num_sections):
+        ztp['%04d-snmp' % (i+1)] = {'plugin': {'name': 'snmp'}, 'status': 'SUCCESS', 'exit-code': 0,
+                                    'start-timestamp': getTimestamp(), 'timestamp': getTimestamp(),
+                                    'communities-ro': ['public']}
+    shadow = getCfg('ztp-json-shadow')
+    with open(shadow, 'w') as f:
+        json.dump({'ztp': ztp}, f, indent=4)
+
+def main():
+    for f in [getCfg('ztp-pid-file'), getCfg('ztp-activity')]:
+        os.makedirs(os.path.dirname(f), exist_ok=True)
+    with open(getCfg('ztp-activity'), 'w') as f:
+        f.write('%s | Processing configuration section 0001-snmp' % getTimestamp())
+    service = subprocess.Popen([sys.executable, '-c', 'import time; print("ready", flush=True); time.sleep(600)', 'ztp-engine'],
+                               stdout=subprocess.PIPE)
+    service.stdout.readline()
+    with open(getCfg('ztp-pid-file'), 'w') as f:
+        f.write('%d\n' % service.pid)
+
+    utility = loadZtpUtility()
+    def run():
+        utility.service_state = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            utility.ztp_status_json()
+
+    rows = []
+    worst = 0
+    try:
+        for num_sections in [10, 100, 400]:
+            createShadow(num_sections)
+            best, median = benchlib.measure(run, repeat=20)
+            worst = max(worst, median)
+            rows.append((num_sections, '%.3f ms' % (best * 1000), '%.3f ms' % (median * 1000)))
+    finally:
+        service.kill()
+        service.wait()
+        service.stdout.close()
+        os.remove(getCfg('ztp-pid-file'))
+    benchlib.report('ztp status --json', rows, ('sections', 'best', 'median'))
+    if worst > BUDGET:
+        print('FAIL: median %.3f ms exceeds budget of %.0f ms' % (worst * 1000, BUDGET * 1000))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
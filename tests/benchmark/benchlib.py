@@ -0,0 +1,67 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+'''!
+\brief Common helpers used by ZTP benchmark scripts.
+
+Importing this module sets up the same temporary environment used by unit tests
+(see tests/conftest.py) so that benchmarks can be run on a bare host:
+
+\code
+python3 tests/benchmark/bench_ztp_json.py
+\endcode
+'''
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import conftest
+
+def measure(func, repeat=5):
+    '''!
+     Run specified function a number of times and return timing statistics.
+
+     @param func (function) Function to be measured
+     @param repeat (int) Number of times function is run
+
+     @return
+         Tuple of (minimum, median) time taken in seconds
+    '''
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+def report(title, rows, header):
+    '''!
+     Print benchmark results as a table.
+
+     @param title (str) Title of the table
+     @param rows (list) List of result tuples
+     @param header (tuple) Column names
+    '''
+    print(title)
+    fmt = '  '.join(['%-16s'] * len(header))
+    print(fmt % tuple(header))
+    for r in rows:
+        print(fmt % tuple(r))
+    print()
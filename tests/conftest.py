@@ -42,10 +42,22 @@ _defaults.cfg_file = os.path.join(_fake_host_ztp, "ztp_cfg.json")
 _defaults.defaultCfg["ztp-cfg-dir"]                    = _fake_host_ztp
 _defaults.defaultCfg["ztp-json"]                       = os.path.join(_fake_host_ztp, "ztp_data.json")
 _defaults.defaultCfg["ztp-json-shadow"]                = os.path.join(_fake_host_ztp, "ztp_data_shadow.json")
+_defaults.defaultCfg["ztp-json-shadow-volatile"]       = os.path.join(_tmp_root, "run", "ztp", "ztp_data_shadow.json")
+_defaults.defaultCfg["ztp-pid-file"]                   = os.path.join(_tmp_root, "run", "ztp", "ztp.pid")
+_defaults.defaultCfg["ztp-status-socket"]              = os.path.join(_tmp_root, "run", "ztp", "ztp.sock")
+_defaults.defaultCfg["ztp-activity-history"]           = os.path.join(_tmp_root, "run", "ztp", "activity_history.json")
+_defaults.defaultCfg["ztp-timeline"]                   = os.path.join(_fake_host_ztp, "ztp_timeline.json")
+_defaults.defaultCfg["ztp-timeline-volatile"]          = os.path.join(_tmp_root, "run", "ztp", "ztp_timeline.json")
+_defaults.defaultCfg["ztp-history"]                    = os.path.join(_fake_host_ztp, "ztp_history.db")
+_defaults.defaultCfg["ztp-fingerprints"]               = os.path.join(_fake_host_ztp, "ztp_fingerprints.json")
 _defaults.defaultCfg["ztp-json-local"]                 = os.path.join(_fake_host_ztp, "ztp_data_local.json")
+_defaults.defaultCfg["plugin-cache-dir"]               = os.path.join(_tmp_root, "plugin-cache")
+_defaults.defaultCfg["profile-dir"]                    = os.path.join(_tmp_root, "ztp-profile")
 _defaults.defaultCfg["provisioning-script"]            = os.path.join(_fake_host_ztp, "provisioning-script")
 _defaults.defaultCfg["rsyslog-ztp-log-file-conf"]      = os.path.join(_fake_rsyslog_d, "10-ztp-log-file.conf")
 _defaults.defaultCfg["rsyslog-ztp-consile-log-file-conf"] = os.path.join(_fake_rsyslog_d, "10-ztp-console-logging.conf")
+_defaults.defaultCfg["metrics-file"]                   = os.path.join(_tmp_root, "metrics", "ztp.prom")
+_defaults.defaultCfg["trace-file"]                     = os.path.join(_tmp_root, "ztp_trace.jsonl")
 _defaults.defaultCfg["log-file"]                       = os.path.join(_tmp_root, "ztp.log")
 _defaults.defaultCfg["ztp-tmp"]                        = os.path.join(_tmp_root, "tmp")
 
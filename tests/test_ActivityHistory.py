@@ -0,0 +1,126 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import time
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg, updateActivity
+from ztp.ActivityHistory import ActivityHistory, readActivityHistory
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class ActivityHistory
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_ActivityHistory.py
+    \endcode
+    '''
+
+    def __history_file(self):
+        fname = getCfg('ztp-tmp') + '/activity_history_test.json'
+        if os.path.isfile(fname):
+            os.remove(fname)
+        return fname
+
+    def test_not_started(self):
+        fname = self.__history_file()
+        objHistory = ActivityHistory(fname)
+        objHistory.record('Initializing')
+        assert(objHistory.last() is None)
+        assert(os.path.isfile(fname) is False)
+        assert(readActivityHistory(fname) == [])
+        objHistory.stop()
+
+    def test_record(self):
+        fname = self.__history_file()
+        objHistory = ActivityHistory(fname)
+        objHistory.start()
+        assert(readActivityHistory(fname) == [])
+        objHistory.record('Initializing')
+        objHistory.record('Waiting for system online')
+        # Current activity continues
+        objHistory.record('Waiting for system online ')
+        time.sleep(0.2)
+        objHistory.record('Discovering provisioning data')
+        assert(objHistory.last() == 'Discovering provisioning data')
+
+        activities = readActivityHistory(fname)
+        assert([a.get('message') for a in activities] == ['Initializing', 'Waiting for system online', 'Discovering provisioning data'])
+        assert(activities[1].get('duration') >= 0.2)
+        assert(activities[1].get('in-progress') is False)
+        assert(activities[2].get('in-progress') is True)
+        assert(activities[2].get('timestamp') is not None)
+        # Duration of the current activity grows
+        time.sleep(0.1)
+        assert(readActivityHistory(fname)[2].get('duration') >= 0.1)
+
+        objHistory.stop()
+        activities = readActivityHistory(fname)
+        assert(activities[2].get('in-progress') is False)
+        objHistory.record('Not recorded')
+        assert(len(readActivityHistory(fname)) == 3)
+        os.remove(fname)
+
+    def test_ring(self):
+        fname = self.__history_file()
+        saved_value = getCfg('activity-history-size')
+        setCfg('activity-history-size', 4)
+        objHistory = ActivityHistory(fname)
+        objHistory.start()
+        setCfg('activity-history-size', saved_value)
+        for i in range(10):
+            objHistory.record('Activity %d' % i)
+        assert([a.get('message') for a in readActivityHistory(fname)] == ['Activity %d' % i for i in range(6, 10)])
+
+        # A new service instance starts a new history
+        objHistory = ActivityHistory(fname)
+        objHistory.start()
+        assert(readActivityHistory(fname) == [])
+
+        with open(fname, 'w') as fh:
+            fh.write('[["2019-01-01 00:00:00 UTC", 1.0, 2.0, "valid"], "invalid", { invalid')
+        assert(readActivityHistory(fname) == [])
+        with open(fname, 'w') as fh:
+            fh.write('[["2019-01-01 00:00:00 UTC", 1.0, 2.0, "valid"], "invalid"]')
+        assert(readActivityHistory(fname) == [{'timestamp': '2019-01-01 00:00:00 UTC', 'message': 'valid', 'duration': 2.0, 'in-progress': False}])
+        os.remove(fname)
+
+    def test_update_activity(self):
+        from ztp.ActivityHistory import activityHistory
+        activity_file = getCfg('ztp-activity')
+        for f in [activity_file, getCfg('ztp-activity-history')]:
+            if os.path.isdir(os.path.dirname(f)) is False:
+                os.makedirs(os.path.dirname(f))
+        activityHistory.start()
+        try:
+            updateActivity('Discovering provisioning data', overwrite=False)
+            with open(activity_file) as fh:
+                assert(fh.readline().endswith('| Discovering provisioning data'))
+            # Current activity is not read back from the activity file
+            os.remove(activity_file)
+            updateActivity('Discovering provisioning data', overwrite=False)
+            assert(os.path.isfile(activity_file) is False)
+            updateActivity('Restarting network discovery', overwrite=False)
+            assert(os.path.isfile(activity_file))
+            activities = readActivityHistory(getCfg('ztp-activity-history'))
+            assert([a.get('message') for a in activities] == ['Discovering provisioning data', 'Restarting network discovery'])
+        finally:
+            activityHistory.stop()
@@ -20,6 +20,7 @@ import os
 import time
 import shutil
 import stat
+import threading
 
 from .testlib import HttpServer, data
 
@@ -241,3 +242,29 @@ class TestClass(object):
         shutil.move('/usr/bin/curl_org', '/usr/bin/curl')
         assert(rc == 20)
         assert(fname == None)
+
+    def test_cancel(self):
+        '''!
+        Test: cancel a download in progress from another thread
+        '''
+        dn = Downloader()
+        result = []
+        def _download():
+            result.append(dn.getUrl('file:///dev/zero', self.__filename('test.txt'), curl_args='--limit-rate 1k'))
+        t = threading.Thread(target=_download)
+        t.start()
+        time.sleep(1)
+        assert(t.is_alive())
+        assert(dn.isCancelled() is False)
+        _start = time.time()
+        dn.cancel()
+        assert(dn.isCancelled())
+        t.join(10)
+        assert(t.is_alive() is False)
+        assert(time.time() - _start < 5)
+        assert(result[0] == (20, None))
+        assert(os.path.isfile(self.__filename('test.txt')) is False)
+
+        # Cancelled download is not started again
+        (rc, fname) = dn.getUrl('file://' + ZTP_CFG_JSON, self.__filename('test.txt'))
+        assert(rc == 20)
@@ -0,0 +1,135 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import time
+import signal
+import threading
+import subprocess
+import pytest
+
+from ztp.ZTPLib import getCfg
+from ztp.EventWait import EventWait, waitAnyProcess, EVENT_SIGNAL
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class EventWait
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_EventWait.py
+    \endcode
+    '''
+
+    def __watched_file(self):
+        fname = getCfg('ztp-tmp') + '/event_wait_test'
+        if os.path.isdir(os.path.dirname(fname)) is False:
+            os.makedirs(os.path.dirname(fname))
+        if os.path.isfile(fname):
+            os.remove(fname)
+        return fname
+
+    def test_timeout(self):
+        objWait = EventWait()
+        start = time.monotonic()
+        assert(objWait.wait(0.2) == [])
+        assert(time.monotonic() - start >= 0.2)
+        objWait.close()
+
+    def test_file(self):
+        fname = self.__watched_file()
+        objWait = EventWait()
+        assert(objWait.watchFile(fname))
+        assert(objWait.wait(0) == [])
+        with open(fname, 'w') as fh:
+            fh.write('test')
+        assert(objWait.wait(5) == [fname])
+        # Other files of the directory are ignored
+        with open(fname + '.other', 'w') as fh:
+            fh.write('test')
+        assert(objWait.wait(0.1) == [])
+        os.remove(fname + '.other')
+
+        # Files rewritten with the same contents are ignored
+        with open(fname, 'w') as fh:
+            fh.write('test')
+        assert(objWait.wait(0.1) == [])
+
+        # Events received while nobody waits are reported by the next wait
+        with open(fname + '.tmp', 'w') as fh:
+            fh.write('moved')
+        os.rename(fname + '.tmp', fname)
+        time.sleep(0.1)
+        assert(objWait.wait(0) == [fname])
+
+        # Contents at the time of clear() are the reference
+        with open(fname, 'w') as fh:
+            fh.write('cleared')
+        objWait.clear()
+        assert(objWait.wait(0.1) == [])
+        with open(fname, 'w') as fh:
+            fh.write('cleared')
+        assert(objWait.wait(0.1) == [])
+        with open(fname, 'w') as fh:
+            fh.write('changed')
+        assert(objWait.wait(5) == [fname])
+        objWait.close()
+        os.remove(fname)
+
+    def test_notify(self):
+        objWait = EventWait()
+        t = threading.Timer(0.2, objWait.notify, args=['test-event'])
+        start = time.monotonic()
+        t.start()
+        assert(objWait.wait(5) == ['test-event'])
+        assert(time.monotonic() - start < 5)
+        t.join()
+        objWait.notify('test-event')
+        objWait.notify('test-event')
+        assert(objWait.wait(0) == ['test-event'])
+        assert(objWait.wait(0) == [])
+        objWait.close()
+
+    def test_signal(self):
+        received = []
+        saved_handler = signal.signal(signal.SIGUSR1, lambda signum, frame: received.append(signum))
+        objWait = EventWait()
+        try:
+            assert(objWait.watchSignals())
+            t = threading.Timer(0.2, os.kill, args=[os.getpid(), signal.SIGUSR1])
+            start = time.monotonic()
+            t.start()
+            assert(EVENT_SIGNAL in objWait.wait(5))
+            assert(time.monotonic() - start < 5)
+            t.join()
+            assert(received == [signal.SIGUSR1])
+        finally:
+            objWait.close()
+            signal.signal(signal.SIGUSR1, saved_handler)
+        assert(signal.set_wakeup_fd(-1) == -1)
+
+    def test_wait_process(self):
+        proc = subprocess.Popen(['sleep', '0.5'])
+        start = time.monotonic()
+        waitAnyProcess([proc.pid], 10)
+        assert(time.monotonic() - start < 5)
+        proc.wait()
+        start = time.monotonic()
+        waitAnyProcess([], 10)
+        assert(time.monotonic() - start < 1)
@@ -16,6 +16,7 @@ limitations under the License.
 '''
 
 import sys
+import os
 import pytest
 
 from ztp.JsonReader import JsonReader
@@ -107,7 +108,7 @@ class TestClass(object):
         jsonrd.set(d, 'value', 'rouge')
         jsonrd.writeJson(str(dst), d)
         f = self.__read_file(str(dst))
-        assert(f == '{"color": "red", "value": "rouge"}')
+        assert(f == '{"color":"red","value":"rouge"}')
 
     def test_set_dict_invalid(self):
         '''!
@@ -170,4 +171,91 @@ class TestClass(object):
         assert(jsonrd.get(d, 'http-user-agent') == 'SONiC-ZTP/0.2')
         assert(jsonrd.set(d, 'http-user-agent', 'SONiC', save=True) == None)
         f = self.__read_file(str(fh))
-        assert(f == '{"http-user-agent": "SONiC", "reboot-on-success": false}')
+        assert(f == '{"http-user-agent":"SONiC","reboot-on-success":false}')
+
+    def test_transaction(self, tmpdir):
+        '''!
+        Test that changes made within a transaction are written once at the end of it
+        '''
+        d = tmpdir.mkdir("valid")
+        fh = d.join("test3.json")
+        fh.write("""
+        {
+            "status"    : "BOOT"
+        }
+        """)
+        os.chmod(str(fh), 0o640)
+        jsonrd, d = JsonReader(str(fh))
+        with jsonrd.transaction():
+            jsonrd.set(d, 'status', 'IN-PROGRESS', save=True)
+            with jsonrd.transaction():
+                jsonrd.set(d, 'exit-code', 0, save=True)
+            assert('BOOT' in self.__read_file(str(fh)))
+            jsonrd.set(d, 'status', 'SUCCESS', save=True)
+            assert('BOOT' in self.__read_file(str(fh)))
+        f = self.__read_file(str(fh))
+        assert(f == '{"exit-code":0,"status":"SUCCESS"}')
+        # File permissions are retained and no temporary file is left behind
+        assert(os.stat(str(fh)).st_mode & 0o777 == 0o640)
+        assert(os.listdir(os.path.dirname(str(fh))) == ['test3.json'])
+
+        # Changes are saved even if an exception is raised within the transaction
+        with pytest.raises(ValueError):
+            with jsonrd.transaction():
+                jsonrd.set(d, 'status', 'FAILED', save=True)
+                raise ValueError('test')
+        assert(self.__read_file(str(fh)) == '{"exit-code":0,"status":"FAILED"}')
+
+        # Writes to other files are not deferred
+        dst = os.path.dirname(str(fh)) + '/test4.json'
+        with jsonrd.transaction():
+            jsonrd.writeJson(dst, {'key': 'value'})
+            assert(self.__read_file(dst) == '{"key":"value"}')
+
+    def test_serializer(self, tmpdir):
+        '''!
+        Test that JSON serializers produce the same output and that the fastest one is used by default
+        '''
+        import ztp.JsonReader
+        from ztp.JsonReader import getSerializer, setSerializer
+        try:
+            import orjson
+            names = ['json', 'orjson']
+            assert(ztp.JsonReader.serializer.name == 'orjson')
+        except ImportError:
+            names = ['json']
+            assert(ztp.JsonReader.serializer.name == 'json')
+            with pytest.raises(ValueError):
+                getSerializer('orjson')
+        with pytest.raises(ValueError):
+            getSerializer('unknown')
+
+        data = {'ztp': {'status': 'BOOT', 'description': 'Données', 'exit-code': 0, 'big': 2**70, 'ratio': 0.5}}
+        for name in names:
+            objSerializer = getSerializer(name)
+            assert(objSerializer.dumps(data) == getSerializer('json').dumps(data))
+            for indent in [2, 4]:
+                assert(objSerializer.dumps(data, indent) == getSerializer('json').dumps(data, indent))
+                assert(objSerializer.loads(objSerializer.dumps(data, indent)) == data)
+            assert(objSerializer.dumps({1: 'a'}) == b'{"1":"a"}')
+            # Non-ASCII characters are written as UTF-8
+            assert(objSerializer.dumps({'description': 'Données 设备'}) == '{"description":"Données 设备"}'.encode('utf-8'))
+            assert(objSerializer.dumps({'description': 'Données'}, 2) == '{\n  "description": "Données"\n}'.encode('utf-8'))
+            with pytest.raises(ValueError):
+                objSerializer.loads(b'{ invalid')
+
+        fname = str(tmpdir.join('test.json'))
+        saved_serializer = ztp.JsonReader.serializer
+        try:
+            for name in names:
+                setSerializer(name)
+                with open(fname, 'w') as fh:
+                    fh.write('{"status": "BOOT"}')
+                jsonrd, d = JsonReader(fname, indent=4)
+                jsonrd.set(d, 'status', 'SUCCESS', save=True)
+                assert(self.__read_file(fname) == '{\n    "status": "SUCCESS"\n}')
+                jsonrd, d = JsonReader(fname)
+                jsonrd.writeJson()
+                assert(self.__read_file(fname) == '{"status":"SUCCESS"}')
+        finally:
+            ztp.JsonReader.serializer = saved_serializer
@@ -0,0 +1,84 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import time
+import threading
+import pytest
+
+from ztp.ZTPLib import runCommand
+from ztp.LinkMonitor import LinkMonitor
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class LinkMonitor
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_LinkMonitor.py
+    \endcode
+    '''
+
+    def test_existing_links(self):
+        '''!
+        Verify that the list of network interfaces matches the kernel one
+        '''
+        with LinkMonitor() as monitor:
+            assert(sorted(monitor.links()) == sorted(os.listdir('/sys/class/net')))
+            assert(monitor.isPresent('lo'))
+            assert(monitor.isUp('lo'))
+            assert(monitor.isPresent('foo-link0') is False)
+            assert(monitor.isUp('foo-link0') is False)
+            assert(monitor.waitFor(['lo'], 10) == [])
+            assert(monitor.waitFor(['lo'], 10, up=True) == [])
+
+    def test_wait_timeout(self):
+        '''!
+        Verify that waiting for a network interface which is not created times out
+        '''
+        with LinkMonitor() as monitor:
+            _start = time.monotonic()
+            assert(monitor.waitFor(['lo', 'foo-link0'], 0.5) == ['foo-link0'])
+            assert(time.monotonic() - _start >= 0.5)
+            assert(time.monotonic() - _start < 5)
+
+    def test_wait_link_created(self):
+        '''!
+        Verify that creation and removal of a network interface are notified
+        '''
+        runCommand('ip link del ztp-test0')
+        (rc, out, err) = runCommand('ip link add ztp-test0 type veth peer name ztp-test1')
+        if rc != 0:
+            pytest.skip('Unable to create network interfaces')
+        runCommand('ip link del ztp-test0')
+
+        with LinkMonitor() as monitor:
+            assert(monitor.isPresent('ztp-test0') is False)
+            t = threading.Timer(0.5, runCommand, ['ip link add ztp-test0 type veth peer name ztp-test1'])
+            t.start()
+            _start = time.monotonic()
+            assert(monitor.waitFor(['ztp-test0', 'ztp-test1'], 10) == [])
+            assert(time.monotonic() - _start < 5)
+            t.join()
+            runCommand('ip link del ztp-test0')
+            _start = time.monotonic()
+            while (monitor.isPresent('ztp-test0') or monitor.isPresent('ztp-test1')) and time.monotonic() - _start < 5:
+                monitor.process(1)
+            assert(monitor.isPresent('ztp-test0') is False)
+            assert(monitor.isPresent('ztp-test1') is False)
@@ -147,17 +147,20 @@ class TestClass(object):
         log.setLevel("warning")
         msg = "Test 1 " + getTimestamp()
         log.warning(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) == True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) == True)
 
         msg = "Test 2 " + getTimestamp()
         log.debug(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         log.setLevel("error")
         msg = "Test 3 " + getTimestamp()
         log.debug(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
@@ -165,44 +168,52 @@ class TestClass(object):
         log.setLevel("critical")
         msg = "Test 4 " + getTimestamp()
         log.info(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         log.setLevel("warning")
         msg = "Test 5 " + getTimestamp()
         log.warning(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) == True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) == True)
 
 
         msg = "Test 6 " + getTimestamp()
         log.error(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) == True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) == True)
 
         log.setLevel("critical")
         msg = "Test 7 " + getTimestamp()
         log.debug(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         msg = "Test 8 " + getTimestamp()
         log.info(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         msg = "Test 9 " + getTimestamp()
         log.warning(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         msg = "Test 10 " + getTimestamp()
         log.error(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) != True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) != True)
 
         msg = "Test 11 " + getTimestamp()
         log.critical(msg)
+        log.flush()
         assert(self.__search_file('/var/log/syslog', msg ) == True)
         assert(self.__search_file('/tmp/test_Logger.txt', msg ) == True)
 
@@ -215,3 +226,89 @@ class TestClass(object):
         log = Logger()
         assert(log != None)
         setCfg('log-level', saved_value)
+
+    def test_lazy_format(self):
+        '''!
+        Test that message arguments are formatted only if the message is logged
+        '''
+        class Arg:
+            count = 0
+            def __str__(self):
+                Arg.count += 1
+                return 'arg'
+        log = Logger()
+        log.setLevel('info')
+        log.debug('Value %s', Arg())
+        assert(Arg.count == 0)
+        log.info('Value %s', Arg())
+        assert(Arg.count == 1)
+        # Message without arguments is not used as format string
+        log.info('100% done')
+        assert(log.flush() == True)
+
+    def test_async(self, monkeypatch):
+        '''!
+        Test that logging does not block on a slow syslog
+        '''
+        import time
+        written = []
+        def slow_syslog(level, msg):
+            time.sleep(0.05)
+            written.append(msg)
+        monkeypatch.setattr(syslog, 'syslog', slow_syslog)
+        log = Logger()
+        log.setLevel('info')
+        start = time.monotonic()
+        for i in range(10):
+            log.info('Message %d', i)
+        assert(time.monotonic() - start < 0.25)
+        assert(log.flush() == True)
+        assert(written == ['Message %d' % i for i in range(10)])
+
+        saved_value = getCfg('log-queue-size')
+        setCfg('log-queue-size', 2)
+        log = Logger()
+        setCfg('log-queue-size', saved_value)
+        log.setLevel('info')
+        del written[:]
+        for i in range(10):
+            log.info('Burst %d', i)
+        assert(log.flush() == True)
+        assert(len([m for m in written if m.startswith('Burst')]) < 10)
+        assert(len([m for m in written if 'log messages dropped' in m]) == 1)
+
+    def test_dedup(self, capsys):
+        '''!
+        Test suppression of repeated messages
+        '''
+        import time
+        saved_value = getCfg('log-dedup-interval')
+        setCfg('log-dedup-interval', 1)
+        try:
+            log = Logger()
+            log.setLevel('info')
+            log.setConsoleLogging(True)
+            for i in range(5):
+                log.info('Provisioning data not found.')
+                log.info('Restarting discovery.')
+            log.warning('Provisioning data not found.')
+            assert(log.flush() == True)
+            out = capsys.readouterr().out
+            assert(out.count('sonic-ztp INFO Provisioning data not found.') == 1)
+            assert(out.count('sonic-ztp INFO Restarting discovery.') == 1)
+            assert(out.count('sonic-ztp WARNING Provisioning data not found.') == 1)
+
+            # Number of suppressed messages is reported once the interval expires
+            out = ''
+            deadline = time.monotonic() + 5
+            while out.count('repeated') < 2 and time.monotonic() < deadline:
+                time.sleep(0.1)
+                out += capsys.readouterr().out
+            assert('Message repeated 4 times in the last 1 seconds: Provisioning data not found.' in out)
+            assert('Message repeated 4 times in the last 1 seconds: Restarting discovery.' in out)
+
+            log.info('Provisioning data not found.')
+            assert(log.flush() == True)
+            assert(capsys.readouterr().out.count('Provisioning data not found.') == 1)
+        finally:
+            setCfg('log-dedup-interval', saved_value)
@@ -0,0 +1,157 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import math
+import shutil
+import pytest
+
+from ztp.ZTPLib import getCfg
+from ztp.Metrics import Metrics
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class Metrics
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_Metrics.py
+    \endcode
+    '''
+
+    def __metrics_file(self):
+        fname = getCfg('metrics-file')
+        shutil.rmtree(os.path.dirname(fname), ignore_errors=True)
+        os.makedirs(os.path.dirname(fname))
+        return fname
+
+    def __read(self, fname):
+        with open(fname) as fh:
+            return fh.read().splitlines()
+
+    def test_not_started(self):
+        fname = self.__metrics_file()
+        objMetrics = Metrics(fname)
+        objMetrics.inc('ztp_reboots_total')
+        assert(objMetrics.get('ztp_reboots_total') is None)
+        assert(objMetrics.flush(force=True) is False)
+        assert(os.path.isfile(fname) is False)
+
+    def test_missing_directory(self):
+        fname = self.__metrics_file()
+        shutil.rmtree(os.path.dirname(fname))
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        objMetrics.inc('ztp_reboots_total')
+        assert(objMetrics.flush(force=True) is False)
+        assert(os.path.isdir(os.path.dirname(fname)) is False)
+
+    def test_format(self):
+        fname = self.__metrics_file()
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        objMetrics.inc('ztp_discovery_iterations_total')
+        objMetrics.inc('ztp_discovery_iterations_total')
+        objMetrics.inc('ztp_download_bytes_total', {'result': 'success'}, 1024)
+        objMetrics.inc('ztp_plugin_exit_codes_total', {'section': '0001-"test"', 'code': 1})
+        objMetrics.set('ztp_section_duration_seconds', 2.5, {'section': '0001-test'})
+        objMetrics.observe('ztp_download_duration_seconds', 0.7, {'result': 'success'})
+        objMetrics.observe('ztp_download_duration_seconds', 7, {'result': 'success'})
+        assert(objMetrics.flush())
+        lines = self.__read(fname)
+        assert('# TYPE ztp_discovery_iterations_total counter' in lines)
+        assert('ztp_discovery_iterations_total 2' in lines)
+        assert('ztp_download_bytes_total{result="success"} 1024' in lines)
+        assert('ztp_plugin_exit_codes_total{code="1",section="0001-\\"test\\""} 1' in lines)
+        assert('ztp_section_duration_seconds{section="0001-test"} 2.5' in lines)
+        assert('# TYPE ztp_download_duration_seconds histogram' in lines)
+        assert('ztp_download_duration_seconds_bucket{result="success",le="0.5"} 0' in lines)
+        assert('ztp_download_duration_seconds_bucket{result="success",le="1"} 1' in lines)
+        assert('ztp_download_duration_seconds_bucket{result="success",le="10"} 2' in lines)
+        assert('ztp_download_duration_seconds_bucket{result="success",le="+Inf"} 2' in lines)
+        assert('ztp_download_duration_seconds_sum{result="success"} 7.7' in lines)
+        assert('ztp_download_duration_seconds_count{result="success"} 2' in lines)
+        assert('# TYPE ztp_reboots_total counter' not in lines)
+        assert(os.listdir(os.path.dirname(fname)) == [os.path.basename(fname)])
+
+    def test_rate_limit(self):
+        fname = self.__metrics_file()
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        objMetrics.inc('ztp_reboots_total')
+        assert(objMetrics.flush())
+        objMetrics.inc('ztp_reboots_total')
+        assert(objMetrics.flush() is False)
+        assert('ztp_reboots_total 1' in self.__read(fname))
+        assert(objMetrics.flush(force=True))
+        assert('ztp_reboots_total 2' in self.__read(fname))
+        # Nothing has changed
+        assert(objMetrics.flush(force=True) is False)
+
+    def test_reload(self):
+        fname = self.__metrics_file()
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        objMetrics.inc('ztp_reboots_total')
+        objMetrics.inc('ztp_plugin_exit_codes_total', {'section': '0001-test', 'code': 0})
+        objMetrics.observe('ztp_download_duration_seconds', 0.2, {'result': 'failure'})
+        assert(objMetrics.flush())
+
+        # Service restarted
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        objMetrics.inc('ztp_reboots_total')
+        objMetrics.inc('ztp_plugin_exit_codes_total', {'section': '0001-test', 'code': 0})
+        objMetrics.observe('ztp_download_duration_seconds', 0.2, {'result': 'failure'})
+        assert(objMetrics.get('ztp_reboots_total') == 2)
+        assert(objMetrics.get('ztp_plugin_exit_codes_total', {'section': '0001-test', 'code': 0}) == 2)
+        assert(objMetrics.get('ztp_download_duration_seconds_count', {'result': 'failure'}) == 2)
+        assert(objMetrics.flush())
+        lines = self.__read(fname)
+        assert('ztp_download_duration_seconds_bucket{result="failure",le="0.5"} 2' in lines)
+        assert(len([l for l in lines if l.startswith('ztp_download_duration_seconds_bucket')]) == 11)
+
+    def test_reload_non_finite(self):
+        fname = self.__metrics_file()
+        with open(fname, 'w') as fh:
+            fh.write('ztp_section_duration_seconds{section="a"} +Inf\n')
+            fh.write('ztp_section_duration_seconds{section="b"} NaN\n')
+            fh.write('ztp_section_duration_seconds{section="c"} 3\n')
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        assert(objMetrics.get('ztp_section_duration_seconds', {'section': 'a'}) == float('inf'))
+        assert(math.isnan(objMetrics.get('ztp_section_duration_seconds', {'section': 'b'})))
+        assert(objMetrics.get('ztp_section_duration_seconds', {'section': 'c'}) == 3)
+
+    def test_reload_escapes(self):
+        fname = self.__metrics_file()
+        # Backslash followed by n, quote, newline and trailing backslash in label values
+        sections = ['dir\\new', 'a"b', 'line1\nline2', 'end\\', '\\\\n']
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        for section in sections:
+            objMetrics.inc('ztp_plugin_exit_codes_total', {'section': section, 'code': 0})
+        assert(objMetrics.flush())
+        assert('ztp_plugin_exit_codes_total{code="0",section="dir\\\\new"} 1' in self.__read(fname))
+
+        # Service restarted
+        objMetrics = Metrics(fname)
+        objMetrics.start()
+        for section in sections:
+            assert(objMetrics.get('ztp_plugin_exit_codes_total', {'section': section, 'code': 0}) == 1)
@@ -0,0 +1,156 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import json
+import threading
+import http.server
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg
+from ztp.ZTPObjects import URL
+from ztp.PluginCache import PluginCache
+
+class _PluginHandler(http.server.BaseHTTPRequestHandler):
+    content = b'#!/bin/sh\nexit 0\n'
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        _PluginHandler.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == _PluginHandler.etag:
+            self.send_response(304)
+            self.send_header('ETag', _PluginHandler.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', _PluginHandler.etag)
+        self.send_header('Content-Length', str(len(_PluginHandler.content)))
+        self.end_headers()
+        self.wfile.write(_PluginHandler.content)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class PluginCache
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_PluginCache.py
+    \endcode
+    '''
+
+    def __read_file(self, fname):
+        with open(fname) as f:
+            return f.read()
+
+    def __write_file(self, fname, data):
+        with open(fname, 'w') as f:
+            f.write(data)
+
+    def test_fetch(self, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        src = str(tmpdir.join('plugin.sh'))
+        self.__write_file(src, 'echo 1\n')
+        objCache = PluginCache(cache_dir)
+        assert(objCache.enabled())
+
+        # Plugin is downloaded once and shared by configuration sections
+        target1 = str(tmpdir.join('0001-test', 'plugin'))
+        target2 = str(tmpdir.join('0002-test', 'plugin'))
+        assert(objCache.fetch(URL('file://' + src), target1) == (0, target1))
+        self.__write_file(src, 'echo 2\n')
+        assert(objCache.fetch(URL('file://' + src), target2) == (0, target2))
+        assert(self.__read_file(target2) == 'echo 1\n')
+        assert(os.stat(target1).st_ino == os.stat(target2).st_ino)
+        with open(os.path.join(cache_dir, 'index.json')) as f:
+            index = json.load(f)
+        digest = index.get('file://' + src).get('sha256')
+        assert(os.stat(os.path.join(cache_dir, 'objects', digest)).st_ino == os.stat(target1).st_ino)
+
+        # Plugin is downloaded again in a new session
+        objCache = PluginCache(cache_dir)
+        assert(objCache.fetch(URL('file://' + src), target2) == (0, target2))
+        assert(self.__read_file(target2) == 'echo 2\n')
+        assert(self.__read_file(target1) == 'echo 1\n')
+        assert(os.listdir(os.path.join(cache_dir, 'objects')) != [digest])
+
+        # Identical content is stored once
+        src2 = str(tmpdir.join('plugin2.sh'))
+        self.__write_file(src2, 'echo 2\n')
+        target3 = str(tmpdir.join('0003-test', 'plugin'))
+        assert(objCache.fetch(URL('file://' + src2), target3) == (0, target3))
+        assert(os.stat(target2).st_ino == os.stat(target3).st_ino)
+        assert(len(os.listdir(os.path.join(cache_dir, 'objects'))) == 1)
+
+        # Download failure
+        assert(objCache.fetch(URL('file://' + str(tmpdir.join('missing.sh'))), target1) == (20, None))
+        assert(self.__read_file(target1) == 'echo 1\n')
+        assert(sorted(os.listdir(cache_dir)) == ['index.json', 'objects'])
+
+    def test_size_limit(self, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        saved_value = getCfg('plugin-cache-size')
+        setCfg('plugin-cache-size', 150)
+        try:
+            objCache = PluginCache(cache_dir)
+            for i in range(3):
+                self.__write_file(str(tmpdir.join('plugin%d.sh' % i)), str(i) * 60)
+                target = str(tmpdir.join('%04d-test' % i, 'plugin'))
+                assert(objCache.fetch(URL('file://' + str(tmpdir.join('plugin%d.sh' % i))), target) == (0, target))
+            with open(os.path.join(cache_dir, 'index.json')) as f:
+                index = json.load(f)
+            assert(sorted(index.keys()) == ['file://' + str(tmpdir.join('plugin%d.sh' % i)) for i in [1, 2]])
+            assert(len(os.listdir(os.path.join(cache_dir, 'objects'))) == 2)
+            # Plugin files are not affected
+            assert(self.__read_file(str(tmpdir.join('0000-test', 'plugin'))) == '0' * 60)
+
+            setCfg('plugin-cache-size', 0)
+            assert(objCache.enabled() is False)
+        finally:
+            setCfg('plugin-cache-size', saved_value)
+
+    def test_revalidate(self, tmpdir):
+        server = http.server.HTTPServer(('127.0.0.1', 0), _PluginHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:%d/plugin.sh' % server.server_address[1]
+        cache_dir = str(tmpdir.join('cache'))
+        target = str(tmpdir.join('0001-test', 'plugin'))
+        _PluginHandler.requests = []
+        try:
+            assert(PluginCache(cache_dir).fetch(URL(url), target) == (0, target))
+            assert(self.__read_file(target) == _PluginHandler.content.decode())
+
+            # Not modified
+            os.remove(target)
+            assert(PluginCache(cache_dir).fetch(URL(url), target) == (0, target))
+            assert(self.__read_file(target) == _PluginHandler.content.decode())
+            assert(_PluginHandler.requests == [None, '"v1"'])
+
+            # Modified
+            _PluginHandler.content = b'#!/bin/sh\nexit 1\n'
+            _PluginHandler.etag = '"v2"'
+            assert(PluginCache(cache_dir).fetch(URL(url), target) == (0, target))
+            assert(self.__read_file(target) == '#!/bin/sh\nexit 1\n')
+            assert(_PluginHandler.requests == [None, '"v1"', '"v1"'])
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,267 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import stat
+import json
+import atexit
+import signal
+import threading
+import pytest
+
+import ztp.ZTPLib
+from ztp.ZTPLib import getCfg, setCfg, runCommand
+from ztp.PluginHost import PluginHost, _runPlugin
+from ztp.Tracer import tracer, readSpans
+
+PLUGIN = '''#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import atexit
+from ztp.ZTPLib import getCfg, runCommand
+from ztp.Logger import logger
+
+OPEN_FILES = []
+
+def main():
+    with open(sys.argv[1]) as fh:
+        data = json.load(fh)
+    result = dict({'argv': sys.argv, 'pid': os.getpid(), 'ppid': os.getppid(), 'umask': os.umask(0o022),
+                   'env': os.environ.get('ZTP_TEST_VAR'), 'cwd': os.getcwd(), 'main': __name__})
+    atexit.register(lambda: open(data.get('atexit-file'), 'w').close() if data.get('atexit-file') else None)
+    if data.get('open-file'):
+        OPEN_FILES.append(open(data.get('open-file'), 'w'))
+        OPEN_FILES[-1].write('buffered')
+    logger.info('test plugin')
+    with open(data.get('result-file'), 'w') as fh:
+        json.dump(result, fh)
+    if data.get('command'):
+        runCommand(data.get('command'))
+    if data.get('sleep'):
+        time.sleep(data.get('sleep'))
+    if data.get('kill'):
+        os.kill(os.getpid(), data.get('kill'))
+    if data.get('raise'):
+        raise ValueError(data.get('raise'))
+    sys.exit(data.get('exit'))
+
+if __name__ == "__main__":
+    main()
+'''
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class PluginHost
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_PluginHost.py
+    \endcode
+    '''
+
+    @pytest.fixture
+    def plugins(self, tmpdir):
+        saved_value = getCfg('plugins-dir')
+        saved_host = getCfg('plugin-host')
+        plugins_dir = tmpdir.mkdir('plugins')
+        setCfg('plugins-dir', str(plugins_dir))
+        setCfg('plugin-host', True)
+        plugin = plugins_dir.join('test-plugin')
+        plugin.write(PLUGIN)
+        os.chmod(str(plugin), 0o755)
+        yield (str(plugin), tmpdir)
+        setCfg('plugins-dir', saved_value)
+        setCfg('plugin-host', saved_host)
+
+    def __input(self, tmpdir, **kwargs):
+        data = dict({'result-file': str(tmpdir.join('result.json'))})
+        data.update(kwargs)
+        fname = str(tmpdir.join('input.json'))
+        with open(fname, 'w') as fh:
+            json.dump(data, fh)
+        return fname
+
+    def __result(self, tmpdir):
+        with open(str(tmpdir.join('result.json'))) as fh:
+            return json.load(fh)
+
+    def test_accepts(self, plugins, tmpdir):
+        (plugin, d) = plugins
+        objHost = PluginHost()
+        assert(objHost.accepts(plugin))
+        other = tmpdir.join('other-plugin')
+        other.write(PLUGIN)
+        assert(objHost.accepts(str(other)) is False)
+        script = tmpdir.join('plugins', 'shell-plugin')
+        script.write('#!/bin/sh\nexit 0\n')
+        assert(objHost.accepts(str(script)) is False)
+        assert(objHost.accepts(str(tmpdir.join('plugins', 'missing'))) is False)
+        setCfg('plugin-host', False)
+        assert(objHost.accepts(plugin) is False)
+
+    def test_run(self, plugins, monkeypatch):
+        (plugin, d) = plugins
+        objHost = PluginHost()
+        assert(objHost.running() is False)
+        assert(objHost.start())
+        try:
+            monkeypatch.setenv('ZTP_TEST_VAR', 'value')
+            lib_dir = os.path.dirname(os.path.dirname(os.path.abspath(ztp.ZTPLib.__file__)))
+            monkeypatch.setenv('PYTHONPATH', os.pathsep.join([lib_dir] + ([os.environ.get('PYTHONPATH')] if os.environ.get('PYTHONPATH') else [])))
+            input_file = self.__input(d, **{'atexit-file': str(d.join('atexit'))})
+            usage = dict()
+            assert(objHost.run(plugin + ' ' + input_file, umask=0o027, usage=usage) == 0)
+            result = self.__result(d)
+            assert(result.get('argv') == [plugin, input_file])
+            assert(result.get('umask') == 0o027)
+            assert(result.get('env') == 'value')
+            assert(result.get('cwd') == os.getcwd())
+            assert(result.get('main') == '__main__')
+            assert(result.get('pid') != os.getpid())
+            assert(os.path.isfile(str(d.join('atexit'))))
+            assert('user-cpu' in usage and 'max-rss' in usage)
+
+            # Files left open by the plugin are flushed
+            input_file = self.__input(d, **{'open-file': str(d.join('open-file'))})
+            assert(objHost.run([plugin, input_file]) == 0)
+            with open(str(d.join('open-file'))) as fh:
+                assert(fh.read() == 'buffered')
+            first_pid = result.get('pid')
+
+            # Same exit codes as when the plugin is executed directly
+            for kwargs in [{'exit': 3}, {'exit': -1}, {'exit': 'message'}, {'raise': 'error'}, {'kill': signal.SIGTERM}]:
+                input_file = self.__input(d, **kwargs)
+                rc = objHost.run([plugin, input_file])
+                assert(rc == runCommand([plugin, input_file], capture_stdout=False))
+            assert(objHost.run([plugin, input_file]) == -signal.SIGTERM)
+
+            # Each plugin runs in a new process
+            self.__input(d)
+            assert(objHost.run([plugin, input_file]) == 0)
+            assert(self.__result(d).get('pid') != first_pid)
+            assert(self.__result(d).get('ppid') == objHost._PluginHost__proc.pid)
+        finally:
+            objHost.stop()
+        assert(objHost.running() is False)
+
+    def test_tracing(self, plugins, monkeypatch):
+        (plugin, d) = plugins
+        saved_value = getCfg('trace-file')
+        trace_file = str(d.join('trace.jsonl'))
+        setCfg('trace-file', trace_file)
+        monkeypatch.delenv('TRACEPARENT', raising=False)
+        try:
+            # Plugin host uses the tracer before a plugin is given a trace context
+            assert(tracer.enabled() is False)
+            env = dict(os.environ)
+            env['TRACEPARENT'] = '00-%s-%s-01' % ('1' * 32, '2' * 16)
+            input_file = self.__input(d, command='true')
+            pid = os.fork()
+            if pid == 0:
+                _runPlugin(dict({'argv': [plugin, input_file], 'cwd': os.getcwd(), 'env': env}))
+            (wpid, status) = os.waitpid(pid, 0)
+            assert(os.waitstatus_to_exitcode(status) == 0)
+        finally:
+            setCfg('trace-file', saved_value)
+        spans = readSpans(trace_file)
+        assert([s.get('attributes').get('command') for s in spans] == ['true'])
+        assert(spans[0].get('trace_id') == '1' * 32)
+        assert(spans[0].get('parent_span_id') == '2' * 16)
+
+    def test_running_plugin(self, plugins):
+        (plugin, d) = plugins
+        objHost = PluginHost()
+        input_file = self.__input(d, sleep=5)
+        result = []
+        t = threading.Thread(target=lambda: result.append(objHost.run([plugin, input_file])))
+        t.start()
+        try:
+            # Plugin process is known to ZTP service while it is running
+            for i in range(100):
+                if os.path.isfile(str(d.join('result.json'))) and len(ztp.ZTPLib.runcmd_pids) != 0:
+                    break
+                t.join(0.1)
+            pid = self.__result(d).get('pid')
+            assert(pid in ztp.ZTPLib.runcmd_pids)
+            # Plugin host runs one plugin at a time, other plugins have to be executed directly
+            assert(objHost.run([plugin, self.__input(d.mkdir('other'))]) is None)
+            os.kill(pid, signal.SIGKILL)
+            t.join(10)
+            assert(result == [-signal.SIGKILL])
+            assert(pid not in ztp.ZTPLib.runcmd_pids)
+        finally:
+            objHost.stop()
+
+    def test_host_failure(self, plugins):
+        (plugin, d) = plugins
+        objHost = PluginHost()
+        assert(objHost.run([]) is None)
+        objHost.start()
+        objHost._PluginHost__proc.kill()
+        objHost._PluginHost__proc.wait()
+        # Plugin host is restarted
+        assert(objHost.run([plugin, self.__input(d)]) == 0)
+
+        # Plugin host exits while a plugin is running, the plugin is killed after plugin-host-wait-interval
+        input_file = self.__input(d, sleep=30)
+        result = []
+        t = threading.Thread(target=lambda: result.append(objHost.run([plugin, input_file])))
+        saved_value = getCfg('plugin-host-wait-interval')
+        setCfg('plugin-host-wait-interval', 1)
+        try:
+            t.start()
+            for i in range(100):
+                if os.path.isfile(str(d.join('result.json'))) and len(ztp.ZTPLib.runcmd_pids) != 0:
+                    break
+                t.join(0.1)
+            pid = self.__result(d).get('pid')
+            objHost._PluginHost__proc.kill()
+            t.join(10)
+            assert(t.is_alive() is False)
+            assert(result == [None])
+            # Plugin process has exited, it may not have been reaped yet
+            try:
+                with open('/proc/%d/stat' % pid) as fh:
+                    assert(fh.read().rsplit(')', 1)[1].split()[0] in ['Z', 'X'])
+            except IOError:
+                pass
+            assert(pid not in ztp.ZTPLib.runcmd_pids)
+        finally:
+            setCfg('plugin-host-wait-interval', saved_value)
+            objHost.stop()
+
+    def test_exit_handlers(self, plugins):
+        (plugin, d) = plugins
+        # Exit handlers registered by the plugin host before forking are not run by plugin processes
+        marker = str(d.join('host-atexit'))
+        handler = lambda: open(marker, 'w').close()
+        atexit.register(handler)
+        try:
+            input_file = self.__input(d, **{'atexit-file': str(d.join('atexit'))})
+            pid = os.fork()
+            if pid == 0:
+                _runPlugin(dict({'argv': [plugin, input_file], 'cwd': os.getcwd(), 'env': dict(os.environ)}))
+            (wpid, status) = os.waitpid(pid, 0)
+            assert(os.waitstatus_to_exitcode(status) == 0)
+            assert(os.path.isfile(str(d.join('atexit'))))
+            assert(os.path.isfile(marker) is False)
+        finally:
+            atexit.unregister(handler)
@@ -0,0 +1,172 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import time
+import shutil
+import signal
+import pstats
+import subprocess
+import tracemalloc
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg, runCommand
+from ztp.Profiler import Profiler
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class Profiler
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_Profiler.py
+    \endcode
+    '''
+
+    def __profile_dir(self):
+        profile_dir = getCfg('ztp-tmp') + '/profile_test'
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        return profile_dir
+
+    def __work(self):
+        return sum(i * i for i in range(10000))
+
+    def test_dump_stacks(self):
+        profile_dir = self.__profile_dir()
+        objProfiler = Profiler(profile_dir)
+        tracemalloc.start(1)
+        try:
+            fname = objProfiler.dumpStacks('Discovering provisioning data')
+        finally:
+            tracemalloc.stop()
+        assert(os.path.dirname(fname) == profile_dir)
+        assert(os.path.basename(fname).startswith('stacks-'))
+        with open(fname) as fh:
+            data = fh.read()
+        assert('Activity: Discovering provisioning data' in data)
+        assert('Thread MainThread' in data)
+        assert('test_dump_stacks' in data)
+        assert('Traced memory' in data)
+        shutil.rmtree(profile_dir)
+
+    def test_toggle(self):
+        profile_dir = self.__profile_dir()
+        objProfiler = Profiler(profile_dir)
+        assert(objProfiler.stop() is None)
+        objProfiler.toggle()
+        assert(objProfiler.collecting())
+        self.__work()
+        objProfiler.toggle()
+        assert(objProfiler.collecting() is False)
+        files = os.listdir(profile_dir)
+        assert(len(files) == 1 and files[0].startswith('engine-'))
+        stats = pstats.Stats(os.path.join(profile_dir, files[0]))
+        assert(any(func[2] == '__work' for func in stats.stats))
+        shutil.rmtree(profile_dir)
+
+    def test_signals(self):
+        profile_dir = self.__profile_dir()
+        objProfiler = Profiler(profile_dir)
+        handlers = (signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2))
+        try:
+            objProfiler.install()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert(objProfiler.collecting())
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert(objProfiler.collecting() is False)
+        finally:
+            objProfiler.stop()
+            signal.signal(signal.SIGUSR1, handlers[0])
+            signal.signal(signal.SIGUSR2, handlers[1])
+        files = sorted(os.listdir(profile_dir))
+        assert(len(files) == 2)
+        assert(files[0].startswith('engine-') and files[1].startswith('stacks-'))
+        shutil.rmtree(profile_dir)
+
+    def test_plugins(self):
+        profile_dir = self.__profile_dir()
+        objProfiler = Profiler(profile_dir)
+        plugin = getCfg('ztp-tmp') + '/profile_plugin'
+        with open(plugin, 'w') as fh:
+            fh.write('#!/usr/bin/python3\nimport sys\nsys.exit(int(sys.argv[1]))\n')
+        os.chmod(plugin, 0o755)
+        shell_plugin = getCfg('ztp-tmp') + '/profile_plugin.sh'
+        with open(shell_plugin, 'w') as fh:
+            fh.write('#!/bin/sh\nexit 0\n')
+
+        # Plugins are not profiled by default
+        assert(objProfiler.pluginFile(plugin) is None)
+        assert(objProfiler.pluginCommand(plugin, plugin + ' 3') == plugin + ' 3')
+        with objProfiler.profiling(None):
+            self.__work()
+        assert(os.path.isdir(profile_dir) is False)
+
+        setCfg('profile-plugins', True)
+        try:
+            with objProfiler.profiling(objProfiler.pluginFile(plugin)):
+                self.__work()
+            assert(objProfiler.pluginCommand(shell_plugin, shell_plugin) == shell_plugin)
+            cmd = objProfiler.pluginCommand(plugin, plugin + ' 3')
+            assert(cmd != plugin + ' 3')
+            # Plugin is run by the ZTP library under test
+            saved_env = dict(os.environ)
+            lib_dir = os.path.dirname(os.path.abspath(list(sys.modules['ztp'].__path__)[0]))
+            os.environ['PYTHONPATH'] = os.pathsep.join([lib_dir] + ([os.environ.get('PYTHONPATH')] if os.environ.get('PYTHONPATH') else []))
+            try:
+                (rc, out, err) = runCommand(cmd)
+            finally:
+                os.environ.clear()
+                os.environ.update(saved_env)
+            assert(rc == 3)
+        finally:
+            setCfg('profile-plugins', False)
+        files = sorted(os.listdir(profile_dir))
+        assert(len(files) == 2)
+        for f in files:
+            assert(f.startswith('plugin-profile_plugin-'))
+            pstats.Stats(os.path.join(profile_dir, f))
+        os.remove(plugin)
+        os.remove(shell_plugin)
+        shutil.rmtree(profile_dir)
+
+    def test_bounded(self):
+        profile_dir = self.__profile_dir()
+        objProfiler = Profiler(profile_dir)
+        saved_value = getCfg('profile-max-files')
+        setCfg('profile-max-files', 3)
+        try:
+            for i in range(5):
+                objProfiler.dumpStacks('Activity %d' % i)
+                time.sleep(0.01)
+        finally:
+            setCfg('profile-max-files', saved_value)
+        files = sorted(os.listdir(profile_dir))
+        assert(len(files) == 3)
+        with open(os.path.join(profile_dir, files[0])) as fh:
+            assert('Activity: Activity 2' in fh.read())
+
+        saved_value = getCfg('profile-max-size')
+        setCfg('profile-max-size', os.path.getsize(os.path.join(profile_dir, files[0])) + 1024)
+        try:
+            objProfiler.dumpStacks('Activity 5')
+        finally:
+            setCfg('profile-max-size', saved_value)
+        assert(len(os.listdir(profile_dir)) == 1)
+        shutil.rmtree(profile_dir)
@@ -0,0 +1,194 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import json
+import threading
+import http.server
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg
+from ztp.SectionFingerprint import SectionFingerprints
+
+class _ArtifactHandler(http.server.BaseHTTPRequestHandler):
+    headers_sent = {'ETag': '"v1"'}
+
+    def do_HEAD(self):
+        self.send_response(200)
+        for (k, v) in _ArtifactHandler.headers_sent.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class SectionFingerprints
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_SectionFingerprint.py
+    \endcode
+    '''
+
+    def __write_file(self, fname, data):
+        with open(fname, 'w') as f:
+            f.write(data)
+
+    def test_section_data(self, tmpdir):
+        plugin = str(tmpdir.join('plugin'))
+        self.__write_file(plugin, '#!/bin/sh\nexit 0\n')
+        objFingerprints = SectionFingerprints(str(tmpdir.join('fingerprints.json')))
+
+        section = dict({'plugin': {'name': 'plugin'}, 'halt-on-failure': True})
+        fingerprint = objFingerprints.compute(section, plugin)
+        assert(fingerprint is not None)
+        assert(objFingerprints.compute(section, None) is None)
+        assert(objFingerprints.compute(section, str(tmpdir.join('missing'))) is None)
+
+        # Status information updated by ZTP service is not part of the fingerprint
+        section.update({'status': 'SUCCESS', 'timestamp': '2019-09-18 19:33:43 UTC', 'exit-code': 0,
+                        'always-run': False, 'retries': [], 'timing': {'plugin-exec': 1.0}})
+        assert(objFingerprints.compute(section, plugin) == fingerprint)
+
+        # Section data and plugin are part of the fingerprint
+        section['halt-on-failure'] = False
+        assert(objFingerprints.compute(section, plugin) != fingerprint)
+        section['halt-on-failure'] = True
+        self.__write_file(plugin, '#!/bin/sh\nexit 1\n')
+        assert(objFingerprints.compute(section, plugin) != fingerprint)
+
+    def test_artifacts(self, tmpdir):
+        plugin = str(tmpdir.join('plugin'))
+        self.__write_file(plugin, '#!/bin/sh\nexit 0\n')
+        src = str(tmpdir.join('config_db.json'))
+        self.__write_file(src, '{}')
+        objFingerprints = SectionFingerprints(str(tmpdir.join('fingerprints.json')))
+
+        # Content of local files is part of the fingerprint
+        section = dict({'url': {'source': 'file://' + src, 'destination': '/etc/sonic/config_db.json'}})
+        fingerprint = objFingerprints.compute(section, plugin)
+        assert(fingerprint is not None)
+        self.__write_file(src, '{"DEVICE_METADATA": {}}')
+        assert(objFingerprints.compute(section, plugin) != fingerprint)
+        section = dict({'minigraph-url': {'url': 'file://' + src}})
+        assert(objFingerprints.compute(section, plugin) is not None)
+
+        # Fingerprint is not available if a file is missing or cannot be identified
+        section = dict({'url': {'source': 'file://' + str(tmpdir.join('missing'))}})
+        assert(objFingerprints.compute(section, plugin) is None)
+        section = dict({'images': [{'url': 'file://' + src}, {'url': {'destination': '/tmp/image'}}]})
+        assert(objFingerprints.compute(section, plugin) is None)
+
+    def test_remote_artifacts(self, tmpdir):
+        plugin = str(tmpdir.join('plugin'))
+        self.__write_file(plugin, '#!/bin/sh\nexit 0\n')
+        objFingerprints = SectionFingerprints(str(tmpdir.join('fingerprints.json')))
+        server = http.server.HTTPServer(('127.0.0.1', 0), _ArtifactHandler)
+        t = threading.Thread(target=server.serve_forever)
+        t.start()
+        try:
+            section = dict({'url': {'source': 'http://127.0.0.1:%d/image.bin' % server.server_port}})
+            fingerprint = objFingerprints.compute(section, plugin)
+            assert(fingerprint is not None)
+            assert(objFingerprints.compute(section, plugin) == fingerprint)
+            _ArtifactHandler.headers_sent = {'ETag': '"v2"'}
+            assert(objFingerprints.compute(section, plugin) != fingerprint)
+            _ArtifactHandler.headers_sent = {'Last-Modified': 'Wed, 18 Sep 2019 19:33:43 GMT', 'Content-Length': '100'}
+            assert(objFingerprints.compute(section, plugin) is not None)
+            _ArtifactHandler.headers_sent = {}
+            assert(objFingerprints.compute(section, plugin) is None)
+        finally:
+            _ArtifactHandler.headers_sent = {'ETag': '"v1"'}
+            server.shutdown()
+            server.server_close()
+            t.join()
+
+    def test_store(self, tmpdir):
+        store_file = str(tmpdir.join('host', 'fingerprints.json'))
+        objFingerprints = SectionFingerprints(store_file)
+        assert(objFingerprints.unchanged('0001-test', 'abc') is False)
+        objFingerprints.forget('0001-test')
+        assert(os.path.isfile(store_file) is False)
+
+        # Fingerprints are used once the ZTP session is completed successfully
+        objFingerprints.record('0001-test', 'abc')
+        objFingerprints.record('0002-test', 'def')
+        assert(objFingerprints.known('0001-test') is False)
+        assert(objFingerprints.unchanged('0001-test', 'abc') is False)
+        objFingerprints.commit(['0001-test', '0002-test', '0003-test'])
+        assert(objFingerprints.known('0001-test'))
+        assert(objFingerprints.unchanged('0001-test', 'abc'))
+        assert(objFingerprints.unchanged('0001-test', 'def') is False)
+        assert(objFingerprints.unchanged('0001-test', None) is False)
+        assert(objFingerprints.known('0003-test') is False)
+
+        # Fingerprints are available to later sessions
+        objFingerprints = SectionFingerprints(store_file)
+        assert(objFingerprints.unchanged('0002-test', 'def'))
+        objFingerprints.forget('0002-test')
+        assert(objFingerprints.unchanged('0002-test', 'def') is False)
+        objFingerprints.record('0001-test', None)
+        with open(store_file) as f:
+            assert(json.load(f) == {})
+
+        # Invalid store is ignored
+        self.__write_file(store_file, 'invalid')
+        assert(objFingerprints.unchanged('0001-test', 'abc') is False)
+        objFingerprints.record('0001-test', 'abc')
+        objFingerprints.commit(['0001-test'])
+        assert(objFingerprints.unchanged('0001-test', 'abc'))
+
+    def test_device_state(self, tmpdir):
+        config_db = str(tmpdir.join('config_db.json'))
+        saved = getCfg('config-db-json')
+        setCfg('config-db-json', config_db)
+        try:
+            objFingerprints = SectionFingerprints(str(tmpdir.join('fingerprints.json')))
+            self.__write_file(config_db, '{"DEVICE_METADATA": {}}')
+            objFingerprints.record('0001-test', 'abc')
+            objFingerprints.commit(['0001-test'])
+            assert(objFingerprints.unchanged('0001-test', 'abc'))
+
+            # Startup configuration is modified or removed as done by 'ztp run'
+            self.__write_file(config_db, '{}')
+            assert(objFingerprints.known('0001-test') is False)
+            assert(objFingerprints.unchanged('0001-test', 'abc') is False)
+            os.remove(config_db)
+            assert(objFingerprints.deviceState() == 'none')
+            assert(objFingerprints.unchanged('0001-test', 'abc') is False)
+
+            # Device state produced by the next successful session is saved
+            objFingerprints.record('0001-test', 'abc')
+            objFingerprints.commit(['0001-test'])
+            assert(objFingerprints.unchanged('0001-test', 'abc'))
+        finally:
+            setCfg('config-db-json', saved)
+
+    def test_disabled(self, tmpdir):
+        objFingerprints = SectionFingerprints(str(tmpdir.join('fingerprints.json')))
+        assert(objFingerprints.storeFile() == str(tmpdir.join('fingerprints.json')))
+        assert(SectionFingerprints().storeFile() == getCfg('ztp-fingerprints'))
+        assert(objFingerprints.enabled() is False)
+        setCfg('skip-unchanged', True)
+        try:
+            assert(objFingerprints.enabled())
+        finally:
+            setCfg('skip-unchanged', False)
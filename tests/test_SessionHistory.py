@@ -0,0 +1,230 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import time
+import sqlite3
+import threading
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg
+from ztp.SessionHistory import SessionHistory, readSessions, readSession
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class SessionHistory
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_SessionHistory.py
+    \endcode
+    '''
+
+    def __db_file(self):
+        fname = getCfg('ztp-tmp') + '/session_history_test.db'
+        for f in [fname, fname + '-wal', fname + '-shm']:
+            if os.path.isfile(f):
+                os.remove(f)
+        return fname
+
+    def test_not_started(self):
+        fname = self.__db_file()
+        objHistory = SessionHistory(fname)
+        objHistory.addPhase('discovery', 1.0)
+        objHistory.download('file:///tmp/test', 0, 0.5, 100)
+        objHistory.finish('SUCCESS')
+        assert(objHistory.enabled() is False)
+        assert(os.path.isfile(fname) is False)
+        assert(readSessions(fname) == [])
+        assert(readSession(1, fname) is None)
+
+    def test_session(self):
+        fname = self.__db_file()
+        objHistory = SessionHistory(fname)
+        objHistory.start(new_session=True)
+        assert(objHistory.enabled())
+        # Session is created when its first data is recorded
+        assert(objHistory.sessionId() is None)
+        assert(readSessions(fname) == [])
+
+        objHistory.addPhase('discovery', 1.5)
+        session_id = objHistory.sessionId()
+        assert(session_id is not None)
+        objHistory.download('http://server/ztp.json', 0, 0.5, 1000)
+        objHistory.download('http://server/missing', 22, 0.25)
+        objHistory.update(status='IN-PROGRESS', source='dhcp-opt67 (eth0)')
+        objHistory.section('0001-test', 'SUSPEND', 3, 2.0, {'user-cpu': 0.5, 'sys-cpu': 0.25, 'max-rss': 1000})
+        objHistory.section('0001-test', 'SUCCESS', 0, 1.0, {'user-cpu': 0.5, 'sys-cpu': 0.25, 'max-rss': 2000})
+        objHistory.section('0002-test', 'FAILED', 1, 0.5)
+        with objHistory.phase('discovery'):
+            time.sleep(0.1)
+        objHistory.restart()
+        objHistory.finish('FAILED')
+        assert(objHistory.sessionId() is None)
+        # Restarts and reboots are recorded only in a session
+        objHistory.restart()
+
+        sessions = readSessions(fname)
+        assert(len(sessions) == 1)
+        v = sessions[0]
+        assert(v.get('id') == session_id)
+        assert(v.get('status') == 'FAILED')
+        assert(v.get('source') == 'dhcp-opt67 (eth0)')
+        assert(v.get('restarts') == 1)
+        assert(v.get('reboots') == 0)
+        assert(v.get('start-time') is not None and v.get('end-time') is not None)
+        assert(v.get('duration') >= 0.1)
+        assert(v.get('download-count') == 2)
+        assert(v.get('download-failures') == 1)
+        assert(v.get('download-bytes') == 1000)
+        assert(v.get('download-time') == 0.75)
+        assert(v.get('download-rate') == round(1000 / 0.75, 1))
+
+        v = readSession(session_id, fname)
+        assert(v.get('phases').get('discovery') >= 1.6)
+        assert(v.get('phases').get('sections') == 3.5)
+        assert(v.get('sections')[0] == {'name': '0001-test', 'status': 'SUCCESS', 'exit-code': 0, 'attempts': 2,
+                                        'duration': 3.0, 'user-cpu': 1.0, 'sys-cpu': 0.5, 'max-rss': 2000})
+        assert(v.get('sections')[1].get('status') == 'FAILED')
+        assert([d.get('url') for d in v.get('downloads')] == ['http://server/ztp.json', 'http://server/missing'])
+        assert(v.get('downloads')[1].get('exit-code') == 22)
+        assert(readSession(session_id + 1, fname) is None)
+
+        # A new session is recorded after the previous one has completed
+        objHistory.addPhase('discovery', 1.0)
+        assert(objHistory.sessionId() == session_id + 1)
+        objHistory.reboot()
+        objHistory.stop()
+        assert([v.get('status') for v in readSessions(fname)] == ['FAILED', 'IN-PROGRESS'])
+        assert(readSessions(fname)[1].get('reboots') == 1)
+        os.remove(fname)
+
+    def test_resume(self):
+        fname = self.__db_file()
+        objHistory = SessionHistory(fname)
+        objHistory.start(new_session=True)
+        objHistory.addPhase('discovery', 1.0)
+        session_id = objHistory.sessionId()
+        objHistory.stop()
+
+        # Service restarted in the same boot
+        objHistory = SessionHistory(fname)
+        objHistory.start()
+        assert(objHistory.sessionId() == session_id)
+        objHistory.stop()
+
+        # Service restarted after a reboot
+        conn = sqlite3.connect(fname)
+        with conn:
+            conn.execute('UPDATE sessions SET boot_id = ?, updated_epoch = ?', ('previous-boot', time.time() - 30))
+        conn.close()
+        objHistory = SessionHistory(fname)
+        objHistory.start()
+        assert(objHistory.sessionId() == session_id)
+        objHistory.stop()
+        v = readSession(session_id, fname)
+        assert(v.get('reboots') == 1)
+        assert(v.get('phases').get('reboot') >= 30)
+
+        # Session in progress is aborted when a new session starts
+        objHistory = SessionHistory(fname)
+        objHistory.start(new_session=True)
+        assert(objHistory.sessionId() is None)
+        objHistory.stop()
+        assert(readSession(session_id, fname).get('status') == 'ABORTED')
+        os.remove(fname)
+
+    def test_retention(self):
+        fname = self.__db_file()
+        saved_value = getCfg('history-max-sessions')
+        setCfg('history-max-sessions', 3)
+        objHistory = SessionHistory(fname)
+        objHistory.start()
+        try:
+            for i in range(5):
+                objHistory.section('0001-test', 'SUCCESS', 0, 1.0)
+                objHistory.download('http://server/ztp.json', 0, 0.5, 1000)
+                objHistory.finish('SUCCESS')
+        finally:
+            setCfg('history-max-sessions', saved_value)
+        assert([v.get('id') for v in readSessions(fname)] == [3, 4, 5])
+
+        # Sessions older than history-max-age days are deleted
+        conn = sqlite3.connect(fname)
+        with conn:
+            conn.execute('UPDATE sessions SET start_epoch = ? WHERE id = 3', (time.time() - 2 * 86400,))
+        conn.close()
+        saved_value = getCfg('history-max-age')
+        setCfg('history-max-age', 1)
+        try:
+            objHistory.addPhase('discovery', 1.0)
+        finally:
+            setCfg('history-max-age', saved_value)
+        objHistory.stop()
+        assert([v.get('id') for v in readSessions(fname)] == [4, 5, 6])
+        conn = sqlite3.connect(fname)
+        assert(conn.execute('SELECT count(*) FROM sections WHERE session_id = 3').fetchone()[0] == 0)
+        assert(conn.execute('SELECT count(*) FROM downloads WHERE session_id = 3').fetchone()[0] == 0)
+        conn.close()
+        os.remove(fname)
+
+    def test_transactions(self):
+        fname = self.__db_file()
+        objHistory = SessionHistory(fname)
+        objHistory.start(new_session=True)
+        objHistory.addPhase('discovery', 1.0)
+        statements = []
+        objHistory._SessionHistory__conn.set_trace_callback(statements.append)
+        objHistory.section('0001-test', 'SUCCESS', 0, 1.0)
+        objHistory._SessionHistory__conn.set_trace_callback(None)
+        # Section and 'sections' phase are recorded in a single transaction
+        assert(len([stmt for stmt in statements if stmt.startswith('COMMIT')]) == 1)
+        assert(len([stmt for stmt in statements if stmt.startswith('BEGIN')]) == 1)
+        assert(readSession(objHistory.sessionId(), fname).get('phases').get('sections') == 1.0)
+        assert(objHistory._SessionHistory__conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal')
+        objHistory.stop()
+        os.remove(fname)
+
+    def test_errors(self):
+        fname = self.__db_file()
+        with open(fname, 'w') as fh:
+            fh.write('not a database')
+        objHistory = SessionHistory(fname)
+        objHistory.start()
+        assert(objHistory.enabled() is False)
+        objHistory.addPhase('discovery', 1.0)
+        assert(readSessions(fname) == [])
+        assert(readSession(1, fname) is None)
+        os.remove(fname)
+
+    def test_threads(self):
+        fname = self.__db_file()
+        objHistory = SessionHistory(fname)
+        objHistory.start()
+        threads = [threading.Thread(target=objHistory.download, args=('http://server/%d' % i, 0, 0.1, 10)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        objHistory.finish('SUCCESS')
+        objHistory.stop()
+        sessions = readSessions(fname)
+        assert(len(sessions) == 1)
+        assert(sessions[0].get('download-count') == 8)
+        os.remove(fname)
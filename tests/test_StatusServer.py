@@ -0,0 +1,146 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import stat
+import json
+import socket
+import pytest
+
+from ztp.ZTPLib import getCfg
+from ztp.StatusServer import StatusServer, query, post, subscribe
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class StatusServer
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_StatusServer.py
+    \endcode
+    '''
+
+    def __socket_file(self):
+        fname = getCfg('ztp-tmp') + '/status_test.sock'
+        if os.path.exists(fname):
+            os.remove(fname)
+        return fname
+
+    def __status(self):
+        return dict({'status': 'IN-PROGRESS', 'sections': dict({'0001-test-plugin': dict({'status': 'BOOT'})})})
+
+    def test_not_started(self):
+        fname = self.__socket_file()
+        objServer = StatusServer(fname)
+        objServer.publish('activity', {'message': 'test'})
+        objServer.downloadStarted('file:///tmp/test.json')
+        objServer.activity('Not forwarded')
+        assert(objServer.running() is False)
+        assert(query({'request': 'state'}, fname) is None)
+        assert(subscribe(fname) is None)
+        objServer.stop()
+
+    def test_query(self):
+        fname = self.__socket_file()
+        objServer = StatusServer(fname)
+        objServer.provide(self.__status)
+        assert(objServer.start())
+        try:
+            assert(stat.S_IMODE(os.stat(fname).st_mode) == 0o600)
+            state = query({'request': 'state'}, fname)
+            assert(state.get('pid') == os.getpid())
+            assert(state.get('status') == 'IN-PROGRESS')
+            assert(state.get('activity') is None)
+            assert(state.get('downloads') == [])
+            assert(query({'request': 'sections'}, fname) == self.__status().get('sections'))
+
+            objServer.downloadStarted('file:///tmp/test.json', '/tmp/dst.json')
+            downloads = query({'request': 'downloads'}, fname)
+            assert(len(downloads) == 1 and downloads[0].get('url') == 'file:///tmp/test.json')
+            assert(downloads[0].get('elapsed') >= 0)
+            objServer.downloadFinished('file:///tmp/test.json', 0)
+            assert(query({'request': 'downloads'}, fname) == [])
+
+            # Activity reported by another process
+            assert(query({'request': 'activity', 'message': 'Plugin activity'}, fname) == {'result': 'ok'})
+            assert(query({'request': 'state'}, fname).get('activity').get('message') == 'Plugin activity')
+
+            assert('error' in query({'request': 'foo'}, fname))
+            assert('error' in query(['state'], fname))
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(fname)
+                with sock.makefile('rwb') as fh:
+                    fh.write(b'{ invalid\n{"request": "downloads"}\n')
+                    fh.flush()
+                    assert('error' in json.loads(fh.readline().decode()))
+                    assert(json.loads(fh.readline().decode()) == [])
+        finally:
+            objServer.stop()
+        assert(os.path.exists(fname) is False)
+
+    def test_subscribe(self):
+        fname = self.__socket_file()
+        objServer = StatusServer(fname)
+        objServer.provide(self.__status)
+        objServer.start()
+        events = subscribe(fname)
+        try:
+            e = next(events)
+            assert(e.get('event') == 'state')
+            assert(e.get('data').get('sections') == self.__status().get('sections'))
+            objServer.activity('Processing configuration section 0001-test-plugin')
+            objServer.publish('section-status', {'section': '0001-test-plugin', 'status': 'SUCCESS'})
+            objServer.downloadStarted('file:///tmp/test.json')
+            objServer.downloadFinished('file:///tmp/test.json', 1)
+            e = next(events)
+            assert(e.get('event') == 'activity')
+            assert(e.get('data') == {'message': 'Processing configuration section 0001-test-plugin'})
+            assert(e.get('timestamp') is not None)
+            assert(next(events).get('data') == {'section': '0001-test-plugin', 'status': 'SUCCESS'})
+            assert(next(events).get('event') == 'download-start')
+            e = next(events)
+            assert(e.get('event') == 'download-end' and e.get('data').get('exit-code') == 1)
+        finally:
+            objServer.stop()
+        # Stream ends when the server is stopped
+        assert(list(events) == [])
+
+    def test_forward_activity(self):
+        from ztp.StatusServer import statusServer
+        from ztp.ZTPLib import updateActivity
+        fname = getCfg('ztp-status-socket')
+        if os.path.isdir(os.path.dirname(fname)) is False:
+            os.makedirs(os.path.dirname(fname))
+        objServer = StatusServer(fname)
+        objServer.start()
+        events = subscribe(fname)
+        try:
+            assert(next(events).get('event') == 'state')
+            # Activity updated by a plugin is forwarded to ZTP service
+            assert(statusServer.running() is False)
+            updateActivity('Plugin activity')
+            e = next(events)
+            assert(e.get('event') == 'activity' and e.get('data').get('message') == 'Plugin activity')
+            # Requests are posted without waiting for the response
+            assert(post({'request': 'activity', 'message': 'Posted activity'}, fname))
+            e = next(events)
+            assert(e.get('event') == 'activity' and e.get('data').get('message') == 'Posted activity')
+        finally:
+            objServer.stop()
+        assert(post({'request': 'activity', 'message': 'Not running'}, fname) is False)
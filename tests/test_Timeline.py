@@ -0,0 +1,145 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import json
+import pytest
+
+from ztp.ZTPLib import getCfg, setCfg
+from ztp.Timeline import Timeline, bootTime, bootId
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class Timeline
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_Timeline.py
+    \endcode
+    '''
+
+    def __read(self, fname):
+        with open(fname) as fh:
+            return json.load(fh).get('timeline')
+
+    def test_boot_time(self):
+        t = bootTime()
+        assert(t > 0)
+        assert(bootTime() >= t)
+        assert(bootId() is not None)
+
+    def __files(self):
+        fname = getCfg('ztp-tmp') + '/timeline_test.json'
+        volatile = getCfg('ztp-tmp') + '/timeline_test_volatile.json'
+        for f in [fname, volatile]:
+            if os.path.isfile(f):
+                os.remove(f)
+        return (fname, volatile)
+
+    def test_not_started(self):
+        (fname, volatile) = self.__files()
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.mark('link-up')
+        objTimeline.checkpoint()
+        assert(objTimeline.events() == [])
+        assert(os.path.isfile(fname) is False)
+        assert(os.path.isfile(volatile) is False)
+
+    def test_mark(self):
+        (fname, volatile) = self.__files()
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.start(new_session=True)
+        # Nothing is saved till an event is recorded
+        assert(os.path.isfile(volatile) is False)
+        objTimeline.mark('link-up', 'Ethernet0', once=True)
+        objTimeline.mark('link-up', 'Ethernet4', once=True)
+        objTimeline.mark('section-start', '0001-test-plugin')
+        events = self.__read(volatile)
+        assert([e.get('event') for e in events] == ['service-start', 'link-up', 'section-start'])
+        assert(events[1].get('detail') == 'Ethernet0')
+        assert(events[0].get('boot-time') <= events[1].get('boot-time') <= events[2].get('boot-time'))
+        assert(events[0].get('boot-id') == bootId())
+        assert(events[0].get('timestamp') is not None)
+
+        # Persistent storage is written only on checkpoint
+        assert(os.path.isfile(fname) is False)
+        objTimeline.checkpoint()
+        assert(self.__read(fname) == events)
+
+        # Service restarted during the same ZTP session, without a reboot
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.start()
+        objTimeline.mark('resume')
+        events = self.__read(volatile)
+        assert([e.get('event') for e in events] == ['service-start', 'link-up', 'section-start', 'service-start', 'resume'])
+        assert(objTimeline.events() == events)
+        assert(len(self.__read(fname)) == 3)
+
+        # Service restarted after a reboot, events recorded after the last checkpoint are lost
+        os.remove(volatile)
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.start()
+        assert(len(objTimeline.events()) == 3)
+        objTimeline.mark('resume')
+        objTimeline.checkpoint()
+        assert([e.get('event') for e in self.__read(fname)] == ['service-start', 'link-up', 'section-start', 'service-start', 'resume'])
+
+        # New ZTP session
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.start(new_session=True)
+        assert(self.__read(volatile) == [])
+        objTimeline.mark('dhcp-option', 'dhcp-opt67')
+        assert([e.get('event') for e in self.__read(volatile)] == ['service-start', 'dhcp-option'])
+        objTimeline.checkpoint()
+        assert([e.get('event') for e in self.__read(fname)] == ['service-start', 'dhcp-option'])
+        os.remove(fname)
+        os.remove(volatile)
+
+    def test_max_entries(self):
+        (fname, volatile) = self.__files()
+        saved_value = getCfg('timeline-max-entries')
+        setCfg('timeline-max-entries', 4)
+        try:
+            objTimeline = Timeline(fname, volatile)
+            objTimeline.start(new_session=True)
+            for i in range(6):
+                objTimeline.mark('discovery-restart', str(i))
+            events = objTimeline.events()
+            assert(len(events) == 4)
+            assert([e.get('detail') for e in events] == ['2', '3', '4', '5'])
+            objTimeline.checkpoint()
+            with open(fname) as fh:
+                assert(json.load(fh).get('dropped') == 3)
+        finally:
+            setCfg('timeline-max-entries', saved_value)
+        os.remove(fname)
+        os.remove(volatile)
+
+    def test_invalid_file(self):
+        (fname, volatile) = self.__files()
+        with open(fname, 'w') as fh:
+            fh.write('{ invalid')
+        objTimeline = Timeline(fname, volatile)
+        objTimeline.start()
+        objTimeline.mark('link-up')
+        assert([e.get('event') for e in self.__read(volatile)] == ['service-start', 'link-up'])
+        objTimeline.checkpoint()
+        assert([e.get('event') for e in self.__read(fname)] == ['service-start', 'link-up'])
+        os.remove(fname)
+        os.remove(volatile)
@@ -0,0 +1,194 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import json
+import subprocess
+import threading
+import pytest
+
+from ztp.ZTPLib import getCfg, runCommand
+from ztp.Tracer import Tracer, readSpans, chromeTrace, main
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class Tracer
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_Tracer.py
+    \endcode
+    '''
+
+    def __trace_file(self):
+        fname = getCfg('ztp-tmp') + '/trace_test.jsonl'
+        for f in [fname, fname + '.1']:
+            if os.path.isfile(f):
+                os.remove(f)
+        return fname
+
+    def test_disabled(self, monkeypatch):
+        fname = self.__trace_file()
+        monkeypatch.delenv('TRACEPARENT', raising=False)
+        objTracer = Tracer(fname)
+        assert(objTracer.enabled() is False)
+        with objTracer.span('test') as span:
+            span.set('key', 'value')
+            assert(span.environ() is None)
+            assert(objTracer.current() is None)
+        assert(os.path.isfile(fname) is False)
+
+    def test_nesting(self):
+        fname = self.__trace_file()
+        objTracer = Tracer(fname)
+        objTracer.start()
+        assert(objTracer.enabled())
+
+        @objTracer.traced('decorated')
+        def _func():
+            with objTracer.span('inner', {'a': 1}):
+                pass
+            return 5
+
+        with objTracer.span('outer') as outer:
+            assert(objTracer.current() is outer)
+            assert(_func() == 5)
+            def _thread():
+                with objTracer.span('thread', parent=outer):
+                    pass
+            t = threading.Thread(target=_thread)
+            t.start()
+            t.join()
+        with pytest.raises(ValueError):
+            with objTracer.span('failed'):
+                raise ValueError('bad value')
+        assert(objTracer.current() is None)
+
+        spans = dict([(s.get('name'), s) for s in readSpans(fname)])
+        assert(sorted(spans.keys()) == ['decorated', 'failed', 'inner', 'outer', 'thread'])
+        assert(len(set([s.get('trace_id') for s in spans.values()])) == 1)
+        assert(spans['outer'].get('parent_span_id') is None)
+        assert(spans['decorated'].get('parent_span_id') == spans['outer'].get('span_id'))
+        assert(spans['inner'].get('parent_span_id') == spans['decorated'].get('span_id'))
+        assert(spans['thread'].get('parent_span_id') == spans['outer'].get('span_id'))
+        assert(spans['thread'].get('resource').get('thread.id') != spans['outer'].get('resource').get('thread.id'))
+        assert(spans['inner'].get('attributes') == {'a': 1})
+        assert(spans['outer'].get('status').get('code') == 'OK')
+        assert(spans['failed'].get('status').get('code') == 'ERROR')
+        assert('bad value' in spans['failed'].get('status').get('message'))
+        assert(spans['outer'].get('start_time_unix_nano') <= spans['inner'].get('start_time_unix_nano'))
+        assert(spans['outer'].get('end_time_unix_nano') >= spans['inner'].get('end_time_unix_nano'))
+
+    def test_propagation(self, monkeypatch):
+        import ztp.Tracer
+        monkeypatch.setenv('PYTHONPATH', os.path.dirname(os.path.dirname(os.path.abspath(ztp.Tracer.__file__))))
+        fname = self.__trace_file()
+        objTracer = Tracer(fname)
+        objTracer.start()
+        child = "from ztp.Tracer import Tracer; t = Tracer('%s'); s = t.span('child'); s.begin(); s.end()" % fname
+        with objTracer.span('parent') as span:
+            env = span.environ()
+            assert(env.get('TRACEPARENT') == '00-%s-%s-01' % (span.traceId(), span.spanId()))
+            assert(subprocess.call([sys.executable, '-c', child], env=env) == 0)
+        spans = readSpans(fname)
+        assert([s.get('name') for s in spans] == ['child', 'parent'])
+        assert(spans[0].get('trace_id') == spans[1].get('trace_id'))
+        assert(spans[0].get('parent_span_id') == spans[1].get('span_id'))
+        assert(spans[0].get('resource').get('process.pid') != spans[1].get('resource').get('process.pid'))
+
+    def test_late_context(self, monkeypatch):
+        fname = self.__trace_file()
+        monkeypatch.delenv('TRACEPARENT', raising=False)
+        objTracer = Tracer(fname)
+        assert(objTracer.enabled() is False)
+
+        # Trace context provided after first use
+        monkeypatch.setenv('TRACEPARENT', '00-%s-%s-01' % ('1' * 32, '2' * 16))
+        assert(objTracer.enabled())
+        assert(objTracer.traceId() == '1' * 32)
+        assert(objTracer.parentSpanId() == '2' * 16)
+
+        # Trace context read again in a forked child
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.environ['TRACEPARENT'] = '00-%s-%s-01' % ('3' * 32, '4' * 16)
+            with objTracer.span('child') as span:
+                os.write(w, span.traceId().encode())
+            os._exit(0)
+        os.close(w)
+        with os.fdopen(r) as fh:
+            assert(fh.read() == '3' * 32)
+        os.waitpid(pid, 0)
+        assert(objTracer.traceId() == '1' * 32)
+
+        monkeypatch.delenv('TRACEPARENT')
+        assert(objTracer.enabled() is False)
+
+    def test_run_command(self):
+        from ztp.Tracer import tracer
+        fname = getCfg('trace-file')
+        if os.path.isfile(fname):
+            os.remove(fname)
+        tracer.start()
+        with tracer.span('parent') as span:
+            (rc, cmd_stdout, cmd_stderr) = runCommand('printenv TRACEPARENT')
+        assert(rc == 0)
+        spans = readSpans(fname)
+        assert([s.get('name') for s in spans] == ['command', 'parent'])
+        assert(spans[0].get('attributes') == {'command': 'printenv TRACEPARENT', 'exit-code': 0})
+        # Process is given the context of the span covering its execution
+        assert(cmd_stdout[0] == '00-%s-%s-01' % (spans[0].get('trace_id'), spans[0].get('span_id')))
+
+    def test_rotate(self):
+        fname = self.__trace_file()
+        with open(fname, 'w') as fh:
+            fh.write(' ' * (getCfg('trace-max-size') + 1))
+        objTracer = Tracer(fname)
+        objTracer.start()
+        assert(os.path.isfile(fname + '.1'))
+        assert(os.path.isfile(fname) is False)
+        os.remove(fname + '.1')
+
+    def test_chrome_trace(self):
+        fname = self.__trace_file()
+        objTracer = Tracer(fname)
+        objTracer.start()
+        with objTracer.span('outer'):
+            with objTracer.span('inner', {'section': '0001-test'}):
+                pass
+        with open(fname, 'a') as fh:
+            fh.write('{ invalid\n')
+        trace = chromeTrace(readSpans(fname))
+        events = trace.get('traceEvents')
+        assert([e.get('name') for e in events] == ['outer', 'inner'])
+        assert(events[0].get('ph') == 'X')
+        assert(events[0].get('pid') == os.getpid())
+        assert(events[1].get('args').get('section') == '0001-test')
+        assert(events[0].get('ts') <= events[1].get('ts'))
+        assert(events[0].get('ts') + events[0].get('dur') >= events[1].get('ts') + events[1].get('dur'))
+
+        out = getCfg('ztp-tmp') + '/trace_test.json'
+        assert(main([fname, out]) == 0)
+        with open(out) as fh:
+            assert(json.load(fh) == trace)
+        os.remove(out)
+        assert(main([]) == 1)
+        assert(main([fname + '.missing']) == 1)
@@ -361,3 +361,95 @@ class TestClass(object):
         assert(ztpcfg != None)
         assert(ztpcfg.get('foo') == None)
         assert(ztpcfg.get('foo', 'foo') == 'foo')
+
+    def test_snapshot(self, tmpdir):
+        '''!
+        Test configuration snapshot
+        '''
+        from ztp.ZTPLib import getCfg
+        from ztp.defaults import defaultCfg
+        d = tmpdir.mkdir("valid")
+        fh = d.join("test5.json")
+        fh.write("""
+        {
+            "admin-mode"         : "false",
+            "curl-retries"       : "abc",
+            "discovery-interval" : "5",
+            "foo"                : "bar"
+        }
+        """)
+        ztpcfg = ZTPCfg(str(fh))
+        snapshot = ztpcfg.snapshot()
+        assert(snapshot is ztpcfg.snapshot())
+        assert(snapshot.get('admin-mode') is False)
+        assert(snapshot.get('discovery-interval') == 5)
+        assert(snapshot.discovery_interval == 5)
+        assert(snapshot.get('curl-retries') is None)
+        assert(snapshot.get('foo') == 'bar')
+        assert(snapshot.get('log-level') == defaultCfg['log-level'])
+        assert(snapshot.get('not-defined', 'abc') == 'abc')
+        assert('foo' in snapshot)
+        with pytest.raises(AttributeError):
+            snapshot.not_defined
+        with pytest.raises(AttributeError):
+            snapshot.discovery_interval = 10
+        for key in ['admin-mode', 'discovery-interval', 'curl-retries', 'foo', 'log-level']:
+            assert(getCfg(key, ztp_cfg=ztpcfg) == snapshot.get(key))
+
+        # A new snapshot is built when the configuration is changed
+        ztpcfg.set('discovery-interval', 20)
+        assert(snapshot.get('discovery-interval') == 5)
+        assert(ztpcfg.snapshot().get('discovery-interval') == 20)
+
+    def test_reload(self, tmpdir):
+        '''!
+        Test reloading configuration when the configuration file changes
+        '''
+        import time
+        import threading
+        d = tmpdir.mkdir("valid")
+        fh = d.join("test6.json")
+        fh.write('{ "discovery-interval" : 5 }')
+        ztpcfg = ZTPCfg(str(fh))
+        assert(ztpcfg.snapshot().get('discovery-interval') == 5)
+
+        fh.write('{ "discovery-interval" : 7 ')
+        assert(ztpcfg.reload() is False)
+        assert(ztpcfg.snapshot().get('discovery-interval') == 5)
+        fh.write('{ "discovery-interval" : 7 }')
+        assert(ztpcfg.reload() is True)
+        assert(ztpcfg.snapshot().get('discovery-interval') == 7)
+
+        # Configuration with an invalid data type is not applied
+        fh.write('{ "discovery-interval" : "abc", "log-level" : "DEBUG" }')
+        assert(ztpcfg.reload() is False)
+        assert(ztpcfg.snapshot().get('discovery-interval') == 7)
+        assert(ztpcfg.snapshot().get('log-level') != 'DEBUG')
+        fh.write('{ "discovery-interval" : 7 }')
+        assert(ztpcfg.reload() is True)
+
+        reloaded = threading.Event()
+        snapshots = []
+        def callback(snapshot):
+            snapshots.append(snapshot)
+            reloaded.set()
+        assert(ztpcfg.watch(callback) is True)
+        assert(ztpcfg.watch(callback) is True)
+        d.join("other.json").write('{ "discovery-interval" : 1 }')
+        fh.write('{ "discovery-interval" : 9, "log-level" : "DEBUG" }')
+        assert(reloaded.wait(5))
+        assert(snapshots[-1].get('discovery-interval') == 9)
+        assert(ztpcfg.snapshot().get('log-level') == 'DEBUG')
+
+        # Invalid configuration written while the file is watched is ignored
+        reloaded.clear()
+        fh.write('{ "discovery-interval" : "abc" }')
+        assert(reloaded.wait(1) is False)
+        assert(ztpcfg.snapshot().get('discovery-interval') == 9)
+
+        # Configuration file replaced atomically
+        reloaded.clear()
+        d.join("test6.json.tmp").write('{ "discovery-interval" : 11 }')
+        os.replace(str(d.join("test6.json.tmp")), str(fh))
+        assert(reloaded.wait(5))
+        assert(ztpcfg.snapshot().get('discovery-interval') == 11)
@@ -1235,3 +1235,138 @@ class TestClass(object):
 
         plugin_name = ztpjson.plugin('test-provisioning-script')
         assert(plugin_name == None)
+
+    def test_ztp_json_transaction(self, tmpdir):
+        '''!
+        Test that status updates made within a transaction are saved to ZTP JSON file and
+        its shadow file only at the end of the transaction and that shadow file does not
+        contain sensitive data
+        '''
+        self.__init_json()
+        ztpjson = ZTPJson()
+        section = ztpjson['0001-test-plugin']
+        with ztpjson.transaction():
+            section['exit-code'] = 0
+            ztpjson.updateStatus(section, 'SUCCESS')
+            ztpjson['status'] = 'IN-PROGRESS'
+            shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow')))
+            assert(shadow['ztp']['0001-test-plugin']['status'] == 'BOOT')
+            assert(shadow['ztp']['status'] == 'BOOT')
+            data = json.loads(self.__read_file(getCfg('ztp-json')))
+            assert(data['ztp']['0001-test-plugin']['status'] == 'BOOT')
+        data = json.loads(self.__read_file(getCfg('ztp-json')))
+        assert(data['ztp']['0001-test-plugin']['status'] == 'SUCCESS')
+        assert(data['ztp']['0001-test-plugin']['exit-code'] == 0)
+        assert(data['ztp']['status'] == 'IN-PROGRESS')
+        shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow')))
+        assert(shadow['ztp']['0001-test-plugin']['status'] == 'SUCCESS')
+        assert(shadow['ztp']['0001-test-plugin'].get('timestamp') is not None)
+        assert(shadow['ztp']['0001-test-plugin'].get('message') is None)
+        assert(shadow['ztp']['0001-test-plugin'].get('plugin') is None)
+        assert(shadow['ztp']['status'] == 'IN-PROGRESS')
+        assert(os.stat(getCfg('ztp-json-shadow')).st_mode & 0o777 == 0o644)
+
+    def test_ztp_json_checkpoint(self, tmpdir):
+        '''!
+        Test that progress of a configuration section is saved only to the volatile shadow file
+        and that it is saved to persistent storage on durable status changes or on checkpoint
+        '''
+        self.__init_json()
+        ztpjson = ZTPJson()
+        section = ztpjson['0001-test-plugin']
+        ztpjson.updateStatus(section, 'IN-PROGRESS')
+        shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow-volatile')))
+        assert(shadow['ztp']['0001-test-plugin']['status'] == 'IN-PROGRESS')
+        shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow')))
+        assert(shadow['ztp']['0001-test-plugin']['status'] == 'BOOT')
+        data = json.loads(self.__read_file(getCfg('ztp-json')))
+        assert(data['ztp']['0001-test-plugin']['status'] == 'BOOT')
+
+        ztpjson.checkpoint()
+        shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow')))
+        assert(shadow['ztp']['0001-test-plugin']['status'] == 'IN-PROGRESS')
+        data = json.loads(self.__read_file(getCfg('ztp-json')))
+        assert(data['ztp']['0001-test-plugin']['status'] == 'IN-PROGRESS')
+
+        # Durable status changes are saved to persistent storage immediately
+        section = ztpjson['0002-test-plugin']
+        ztpjson.updateStatus(section, 'IN-PROGRESS')
+        ztpjson.updateStatus(section, 'SUSPEND')
+        shadow = json.loads(self.__read_file(getCfg('ztp-json-shadow')))
+        assert(shadow['ztp']['0002-test-plugin']['status'] == 'SUSPEND')
+        data = json.loads(self.__read_file(getCfg('ztp-json')))
+        assert(data['ztp']['0002-test-plugin']['status'] == 'SUSPEND')
+        assert(self.__read_file(getCfg('ztp-json-shadow')) == self.__read_file(getCfg('ztp-json-shadow-volatile')))
+
+        # Nothing to be saved
+        mtime = os.stat(getCfg('ztp-json')).st_mtime_ns
+        ztpjson.checkpoint()
+        assert(os.stat(getCfg('ztp-json')).st_mtime_ns == mtime)
+
+    def test_ztp_json_large_sections(self, tmpdir):
+        '''!
+        Test that data of large configuration sections is kept only in section input files and that
+        ZTP JSON file is an index of status information which is used to resume ZTP session
+        '''
+        payload = 'x' * (getCfg('section-inline-size') + 1)
+        content = {'ztp': {'0001-large-plugin': {'plugin': {'name': 'test-plugin'}, 'payload': payload, 'halt-on-failure': True},
+                           '0002-small-plugin': {'plugin': 'test-plugin', 'message': '0002-small-plugin'}}}
+        self.__write_file(getCfg('ztp-json'), json.dumps(content))
+        ztpjson = ZTPJson()
+        assert(ztpjson.section_names == ['0001-large-plugin', '0002-small-plugin'])
+
+        section = ztpjson['0001-large-plugin']
+        assert(section.get('payload') is None)
+        assert(section.get('inline') is False)
+        assert(section.get('plugin') == {'name': 'test-plugin'})
+        assert(section.get('halt-on-failure') is True)
+        assert(section.get('status') == 'BOOT')
+        assert(ztpjson['0002-small-plugin'].get('message') == '0002-small-plugin')
+        assert(ztpjson.section('0002-small-plugin') is ztpjson['0002-small-plugin'])
+        assert(ztpjson.section('0003-missing-plugin') is None)
+
+        # Plugin input file has all the data
+        section_file = getCfg('ztp-tmp-persistent') + '/0001-large-plugin/' + getCfg('section-input-file')
+        data = json.loads(self.__read_file(section_file))
+        assert(data['0001-large-plugin']['payload'] == payload)
+        assert(os.path.getsize(getCfg('ztp-json')) < len(payload))
+
+        with ztpjson.transaction():
+            section['exit-code'] = 0
+            ztpjson.updateStatus(section, 'SUCCESS')
+        data = ztpjson.section('0001-large-plugin')
+        assert(data.get('payload') == payload)
+        assert(data.get('status') == 'SUCCESS')
+        assert(data.get('exit-code') == 0)
+        assert(data.get('inline') is None)
+        data = json.loads(self.__read_file(getCfg('ztp-json')))
+        assert(data['ztp']['0001-large-plugin']['status'] == 'SUCCESS')
+        assert(data['ztp']['0001-large-plugin'].get('payload') is None)
+
+        # Section input files are kept when ZTP session is resumed
+        ztpjson = ZTPJson()
+        assert(ztpjson['0001-large-plugin'].get('status') == 'SUCCESS')
+        assert(ztpjson.section('0001-large-plugin').get('payload') == payload)
+        ztpjson['status'] = 'BOOT'
+        ztpjson = ZTPJson()
+        assert(ztpjson.section('0001-large-plugin').get('payload') == payload)
+
+    def test_ztp_json_retry_defaults(self, tmpdir):
+        '''!
+        Test that retry settings of configuration sections are validated and that invalid values are
+        removed so that values read from ztp_cfg.json are used
+        '''
+        content = {'ztp': {'0001-test-plugin': {'retry-count': 3, 'retry-interval': '10', 'retry-backoff': 1.5},
+                           '0002-test-plugin': {'retry-count': -1, 'retry-interval': 'abc', 'retry-backoff': 0.5},
+                           '0003-test-plugin': {}}}
+        self.__write_file(getCfg('ztp-json'), json.dumps(content))
+        ztpjson = ZTPJson()
+        section = ztpjson['0001-test-plugin']
+        assert(section.get('retry-count') == 3)
+        assert(section.get('retry-interval') == 10)
+        assert(section.get('retry-backoff') == 1.5)
+        for sec in ['0002-test-plugin', '0003-test-plugin']:
+            section = ztpjson[sec]
+            assert(section.get('retry-count') is None)
+            assert(section.get('retry-interval') is None)
+            assert(section.get('retry-backoff') is None)
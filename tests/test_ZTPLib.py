@@ -19,9 +19,11 @@ import sys
 import signal
 import os
 import stat
+import subprocess
 import pytest
 
-from ztp.ZTPLib import runCommand, getField, getCfg, printable
+from ztp.ZTPLib import runCommand, getField, getCfg, printable, getRusage
+from ztp.ZTPLib import writePidFile, removePidFile, servicePid, serviceUptime, deferReboot
 sys.path.append(getCfg('plugins-dir'))
 
 class TestClass(object):
@@ -74,6 +76,32 @@ class TestClass(object):
         assert((cmd_stdout1 == cmd_stdout2) and (cmd_stdout2 == cmd_stdout3) and (cmd_stdout3 == cmd_stdout4))
         assert((cmd_stderr1 == cmd_stderr2) and (cmd_stderr2 == cmd_stderr3) and (cmd_stderr3 == cmd_stderr4))
 
+    def test_cmd_usage(self, tmpdir):
+        usage = dict()
+        rc = runCommand('/bin/sh -c "dd if=/dev/zero of=/dev/null bs=1M count=16 2>/dev/null; exit 3"', capture_stdout=False, usage=usage)
+        assert(rc == 3)
+        for k in ['user-cpu', 'sys-cpu', 'max-rss', 'block-in', 'block-out']:
+            assert(k in usage)
+        assert(usage.get('max-rss') > 0)
+
+        usage = dict()
+        rc = runCommand(['/bin/true'], capture_stdout=False, usage=usage)
+        assert(rc == 0)
+        assert(usage.get('max-rss') > 0)
+
+        import resource
+        usage = getRusage(resource.getrusage(resource.RUSAGE_SELF))
+        assert(usage.get('user-cpu') >= 0 and usage.get('sys-cpu') >= 0)
+
+    def test_cmd_on_start(self):
+        pids = []
+        (rc, out, err) = runCommand('/bin/sh -c "echo $$"', on_start=pids.append)
+        assert(rc == 0)
+        assert(pids == [int(out[0])])
+        pids = []
+        rc = runCommand(['/bin/true'], capture_stdout=False, on_start=pids.append)
+        assert(rc == 0 and len(pids) == 1)
+
     def test_getField(self):
         data = dict({'key': 'val'})
         assert (getField(data, 'key', str, 'defval') == 'val')
@@ -130,3 +158,58 @@ class TestClass(object):
         assert(printable(None) == None)
         assert(printable({"k": "v"}) == None)
         assert(printable("") == "")
+
+    def test_service_pid(self):
+        pid_file = getCfg('ztp-pid-file')
+        if os.path.isdir(os.path.dirname(pid_file)) is False:
+            os.makedirs(os.path.dirname(pid_file))
+        if os.path.isfile(pid_file):
+            os.remove(pid_file)
+        assert(servicePid() is None)
+
+        # Process id of a process which is not ZTP service
+        writePidFile()
+        assert(servicePid() is None)
+        removePidFile()
+        assert(os.path.isfile(pid_file) is False)
+
+        proc = subprocess.Popen([sys.executable, '-c', 'import time; print("ready", flush=True); time.sleep(30)', 'ztp-engine'],
+                                stdout=subprocess.PIPE)
+        try:
+            proc.stdout.readline()
+            with open(pid_file, 'w') as fh:
+                fh.write('%d\n' % proc.pid)
+            assert(servicePid() == proc.pid)
+            uptime = serviceUptime(proc.pid)
+            assert(uptime is not None and uptime >= 0 and uptime < 30)
+            # Pid file of another process is not removed
+            removePidFile()
+            assert(os.path.isfile(pid_file))
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+        assert(servicePid() is None)
+        assert(serviceUptime(proc.pid) is None)
+        os.remove(pid_file)
+
+    def test_defer_reboot(self, tmpdir):
+        request_file = str(tmpdir.join('reboot-request'))
+        saved_value = os.environ.pop('ZTP_DEFERRED_REBOOT', None)
+        try:
+            # Reboot cannot be deferred if ZTP service does not defer reboots
+            assert(deferReboot('firmware: new image installed') is False)
+            assert(os.path.isfile(request_file) is False)
+
+            os.environ['ZTP_DEFERRED_REBOOT'] = request_file
+            assert(deferReboot('firmware: new image installed'))
+            assert(deferReboot('test-plugin:\nreboot  requested'))
+            with open(request_file) as fh:
+                assert(fh.read() == 'firmware: new image installed\ntest-plugin: reboot requested\n')
+
+            os.environ['ZTP_DEFERRED_REBOOT'] = str(tmpdir.join('missing', 'reboot-request'))
+            assert(deferReboot('firmware: new image installed') is False)
+        finally:
+            os.environ.pop('ZTP_DEFERRED_REBOOT', None)
+            if saved_value is not None:
+                os.environ['ZTP_DEFERRED_REBOOT'] = saved_value
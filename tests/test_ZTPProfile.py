@@ -0,0 +1,252 @@
+'''
+Copyright 2019 Broadcom. The term "Broadcom" refers to Broadcom Inc.
+and/or its subsidiaries.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import sys
+import os
+import fnmatch
+import time
+import json
+import pytest
+
+import ztp.ZTPProfile
+from ztp.ZTPLib import getCfg
+from ztp.ZTPProfile import ZTPProfile
+
+class ConfigDB(object):
+    '''!
+    Config DB connection emulated using a dictionary
+    '''
+    KEY_SEPARATOR = '|'
+    db_name = 'CONFIG_DB'
+
+    def __init__(self, data, scan=True):
+        self.data = data
+        self.scan_calls = 0
+        self.mod_calls = 0
+        self.use_scan = scan
+
+    def get_entry(self, table, key):
+        return dict(self.data.get(table + '|' + key, {}))
+
+    def set_entry(self, table, key, val):
+        if val is None:
+            self.data.pop(table + '|' + key, None)
+        else:
+            self.data[table + '|' + key] = val
+
+    def get_keys(self, table):
+        return [k.split('|', 1)[1] for k in self.data.keys() if k.startswith(table + '|')]
+
+    def get_config(self):
+        config = dict()
+        for (k, v) in self.data.items():
+            (table, key) = k.split('|', 1)
+            config.setdefault(table, dict())[key] = dict(v)
+        return config
+
+    def mod_config(self, config):
+        self.mod_calls += 1
+        for (table, entries) in config.items():
+            for (key, entry) in entries.items():
+                if entry is None:
+                    self.data.pop(table + '|' + key, None)
+                else:
+                    self.data.setdefault(table + '|' + key, dict()).update(entry)
+
+    def get_redis_client(self, db_name):
+        if self.use_scan is False:
+            # Client which does not support SCAN
+            return object()
+        return self
+
+    def scan(self, cursor, match, count):
+        # Return two keys at a time to exercise the cursor
+        self.scan_calls += 1
+        keys = sorted(fnmatch.filter(self.data.keys(), match))
+        batch = keys[cursor:cursor+2]
+        cursor = cursor + 2
+        if cursor >= len(keys):
+            cursor = 0
+        return (cursor, batch)
+
+class TestClass(object):
+
+    '''!
+    \brief This class allow to define unit tests for class ZTPProfile
+
+    Examples of class usage:
+
+    \code
+    pytest-2.7 -v -x test_ZTPProfile.py
+    \endcode
+    '''
+
+    def test_feature_string(self):
+        objProfile = ZTPProfile(ConfigDB({}))
+        assert(objProfile.featureString() == 'ztp;inband:%s;ipv4:%s;ipv6:%s' % \
+               (str(getCfg('feat-inband')).lower(), str(getCfg('feat-ipv4')).lower(), str(getCfg('feat-ipv6')).lower()))
+
+    def test_profile_string(self):
+        db = ConfigDB({})
+        objProfile = ZTPProfile(db)
+        assert(objProfile.profileString() == 'no-ztp')
+        db.set_entry('ZTP', 'mode', {'profile': 'active', 'inband': 'true', 'ipv4': 'true', 'ipv6': 'false'})
+        assert(objProfile.profileString() == 'ztp;inband:true;ipv4:true;ipv6:false')
+        db.set_entry('ZTP', 'mode', {'profile': 'inactive', 'inband': 'true'})
+        assert(objProfile.profileString() == 'no-ztp')
+
+    def test_ports(self):
+        data = {'PORT|Ethernet%d' % (i*4): {'lanes': str(i)} for i in range(5)}
+        data['PORTCHANNEL|PortChannel1'] = {}
+        data['PORT_QOS_MAP|Ethernet0'] = {}
+        db = ConfigDB(data)
+        objProfile = ZTPProfile(db)
+        ports = objProfile.ports()
+        assert(ports == sorted(['Ethernet%d' % (i*4) for i in range(5)]))
+        assert(db.scan_calls == 3)
+
+        # Connector without access to redis client
+        db = ConfigDB(data, scan=False)
+        objProfile = ZTPProfile(db)
+        assert(objProfile.ports() == ports)
+
+    def test_wait_for_system_online(self):
+        objProfile = ZTPProfile(ConfigDB({'PORT|lo': {}}))
+        _start = time.monotonic()
+        assert(objProfile.waitForSystemOnline(timeout=5))
+        assert(time.monotonic() - _start < 5)
+
+        objProfile = ZTPProfile(ConfigDB({'PORT|lo': {}, 'PORT|foo-link0': {}}))
+        _start = time.monotonic()
+        assert(objProfile.waitForSystemOnline(timeout=0.5) is False)
+        assert(time.monotonic() - _start < 5)
+
+    def __profile(self):
+        return {'DEVICE_METADATA': {'localhost': {'hwsku': 'sku1', 'mac': '00:11:22:33:44:55', 'platform': 'x86_64-kvm',
+                                                  'type': 'not-provisioned', 'hostname': 'sonic'}},
+                'PORT': {'Ethernet0': {'index': '0', 'lanes': '25', 'mtu': '9100', 'admin_status': 'up'},
+                         'Ethernet4': {'index': '1', 'lanes': '26', 'mtu': '9100', 'admin_status': 'up'}},
+                'ZTP': {'mode': {'profile': 'active', 'inband': 'true', 'ipv4': 'true', 'ipv6': 'true'}}}
+
+    def __running(self):
+        return {'DEVICE_METADATA|localhost': {'hwsku': 'sku1', 'mac': '00:11:22:33:44:55', 'platform': 'x86_64-kvm',
+                                              'type': 'not-provisioned', 'hostname': 'sonic'},
+                'PORT|Ethernet0': {'index': '0', 'lanes': '25', 'mtu': '9100', 'admin_status': 'down'},
+                'PORT|Ethernet4': {'index': '1', 'lanes': '26', 'mtu': '1500', 'admin_status': 'up'},
+                'VERSIONS|DATABASE': {'VERSION': 'version_1_0_1'}}
+
+    def test_changes(self):
+        db = ConfigDB(self.__running())
+        objProfile = ZTPProfile(db)
+        changes = objProfile.changes(self.__profile())
+        assert(changes == {'PORT': {'Ethernet0': {'admin_status': 'up'}, 'Ethernet4': {'mtu': '9100'}},
+                           'ZTP': {'mode': {'profile': 'active', 'inband': 'true', 'ipv4': 'true', 'ipv6': 'true'}}})
+
+        # Apply changes and verify that nothing is left to be changed
+        db.mod_config(changes)
+        assert(objProfile.changes(self.__profile()) == {})
+
+    def test_changes_reload(self):
+        # Port lanes are different
+        running = self.__running()
+        running['PORT|Ethernet4']['lanes'] = '26,27'
+        assert(ZTPProfile(ConfigDB(running)).changes(self.__profile()) is None)
+
+        # Port is missing
+        running = self.__running()
+        del running['PORT|Ethernet4']
+        assert(ZTPProfile(ConfigDB(running)).changes(self.__profile()) is None)
+
+        # Platform is different
+        running = self.__running()
+        running['DEVICE_METADATA|localhost']['hwsku'] = 'sku2'
+        assert(ZTPProfile(ConfigDB(running)).changes(self.__profile()) is None)
+
+        # Hostname is not a platform field
+        running = self.__running()
+        running['DEVICE_METADATA|localhost']['hostname'] = 'switch1'
+        changes = ZTPProfile(ConfigDB(running)).changes(self.__profile())
+        assert(changes['DEVICE_METADATA'] == {'localhost': {'hostname': 'sonic'}})
+
+        # Platform fields which are not part of the profile can only be removed by a configuration reload
+        running = self.__running()
+        running['PORT|Ethernet0']['fec'] = 'rs'
+        assert(ZTPProfile(ConfigDB(running)).changes(self.__profile()) is None)
+
+    def test_changes_stale_keys(self):
+        # Keys which are not part of the profile are deleted
+        running = self.__running()
+        running['ZTP|old'] = {'profile': 'active'}
+        db = ConfigDB(running)
+        objProfile = ZTPProfile(db)
+        changes = objProfile.changes(self.__profile())
+        assert(changes['ZTP'] == {'old': None, 'mode': {'profile': 'active', 'inband': 'true', 'ipv4': 'true', 'ipv6': 'true'}})
+        db.mod_config(changes)
+        assert('ZTP|old' not in db.data)
+        assert(objProfile.changes(self.__profile()) == {})
+
+    def test_changes_init_cfg(self, tmpdir, monkeypatch):
+        init_cfg = tmpdir.join('init_cfg.json')
+        init_cfg.write('{"FEATURE": {"lldp": {"state": "enabled"}}, "DEVICE_METADATA": {"localhost": {"buffer_model": "traditional"}}}')
+        monkeypatch.setattr(ztp.ZTPProfile, 'INIT_CFG_JSON', str(init_cfg))
+
+        # Tables of init_cfg.json are expected to have the values it defines
+        running = self.__running()
+        running['FEATURE|lldp'] = {'state': 'disabled'}
+        db = ConfigDB(running)
+        objProfile = ZTPProfile(db)
+        changes = objProfile.changes(self.__profile())
+        assert(changes['FEATURE'] == {'lldp': {'state': 'enabled'}})
+        assert(changes['DEVICE_METADATA'] == {'localhost': {'buffer_model': 'traditional'}})
+        db.mod_config(changes)
+        assert(objProfile.changes(self.__profile()) == {})
+
+        # Entries with fields which are not part of the profile are replaced
+        running = self.__running()
+        running['FEATURE|lldp'] = {'state': 'enabled', 'auto_restart': 'enabled'}
+        changes = ZTPProfile(ConfigDB(running)).changes(self.__profile())
+        assert(changes['FEATURE'] == {'lldp': {'state': 'enabled', 'auto_restart': None}})
+
+    def test_apply_running_config(self, tmpdir, monkeypatch):
+        init_cfg = tmpdir.join('init_cfg.json')
+        init_cfg.write('{"FEATURE": {"lldp": {"state": "enabled", "auto_restart": "enabled"}}}')
+        monkeypatch.setattr(ztp.ZTPProfile, 'INIT_CFG_JSON', str(init_cfg))
+        commands = []
+        monkeypatch.setattr(ztp.ZTPProfile, 'runCommand', lambda cmd, **kwargs: commands.append(cmd) or (0, [], []))
+
+        # Configuration of a provisioned switch, restarted with ZTP enabled
+        running = self.__running()
+        running['DEVICE_METADATA|localhost'].update({'hostname': 'leaf1', 'bgp_asn': '65100', 'type': 'LeafRouter'})
+        running['PORT|Ethernet0'].update({'description': 'uplink', 'admin_status': 'up'})
+        running['FEATURE|lldp'] = {'state': 'enabled', 'auto_restart': 'enabled'}
+        running['VLAN|Vlan100'] = {'vlanid': '100'}
+        running['VLAN_MEMBER|Vlan100|Ethernet4'] = {'tagging_mode': 'untagged'}
+        running['BGP_NEIGHBOR|10.0.0.1'] = {'asn': '65200', 'name': 'spine1'}
+        running['LOOPBACK_INTERFACE|Loopback0|10.1.0.1/32'] = {}
+        db = ConfigDB(running)
+        objProfile = ZTPProfile(db)
+        config_file = tmpdir.join('ztp_config_db.json')
+        config_file.write(json.dumps(self.__profile()))
+        assert(objProfile._ZTPProfile__applyConfig(str(config_file)))
+        assert(db.mod_calls == 1)
+        assert(['systemctl', 'restart', 'hostname-config'] in commands)
+
+        # Config DB holds what a configuration reload would have loaded
+        expected = dict([('%s|%s' % (t, k), v) for (t, entries) in self.__profile().items() for (k, v) in entries.items()])
+        expected['FEATURE|lldp'] = {'state': 'enabled', 'auto_restart': 'enabled'}
+        expected['VERSIONS|DATABASE'] = {'VERSION': 'version_1_0_1'}
+        assert(db.data == expected)
+        assert(objProfile.changes(self.__profile()) == {})
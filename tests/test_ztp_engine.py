@@ -129,7 +129,8 @@ class TestClass(object):
         runCommand("systemctl stop ztp")
         # Destroy current provisioning data
         file_list = ["ztp-json-local", "ztp-json-opt67", "ztp-json", "provisioning-script", "opt67-url", "opt59-v6-url", \
-                     "opt239-url", "opt239-v6-url", "ztp-restart-flag", "opt66-tftp-server", "acl-url", "graph-url", "ztp-json-shadow"]
+                     "opt239-url", "opt239-v6-url", "ztp-restart-flag", "opt66-tftp-server", "acl-url", "graph-url", "ztp-json-shadow", \
+                     "ztp-json-shadow-volatile", "ztp-timeline", "ztp-timeline-volatile", "ztp-fingerprints"]
 
         for filename in file_list:
             if os.path.isfile(self.cfgGet(filename)):
@@ -311,6 +312,110 @@ class TestClass(object):
         self.cfgSet('restart-ztp-no-config', True)
 
 
+    def test_ztp_json_with_suspend_backoff(self):
+        '''!
+          ZTP test with a suspended section resumed after suspend-interval seconds with backoff,
+          while the other section is processed
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "message" : "0001-test-plugin",
+           "suspend-exit-code" : 1,
+           "suspend-interval" : 2,
+           "suspend-backoff" : 2,
+           "attempts" : 2,
+           "message-file" : "/etc/ztp.results",
+           "fail" : false
+        },
+        "0002-test-plugin": {
+           "message" : "0002-test-plugin",
+           "message-file" : "/etc/ztp.results",
+           "fail" : false
+        }
+    }
+}"""
+        expected_result = """0001-test-plugin
+0002-test-plugin
+0001-test-plugin
+0001-test-plugin
+"""
+        self.__init_ztp_data()
+
+        runCommand("systemctl stop ztp")
+        self.cfgSet('monitor-startup-config', False)
+        self.cfgSet('restart-ztp-no-config', False)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        start = time.monotonic()
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        # Section is resumed after 2 seconds, then after 4 seconds
+        assert(time.monotonic() - start >= 6)
+        result = self.__read_file("/etc/ztp.results")
+        assert(result == expected_result)
+        os.remove("/tmp/ztp_input.json")
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('suspend-interval') == 2)
+        self.cfgSet('monitor-startup-config', True)
+        self.cfgSet('restart-ztp-no-config', True)
+
+    def test_ztp_json_with_retry(self):
+        '''!
+          ZTP test with a section failing twice and retried in place, and a section failing
+          after its retries are exhausted. halt-on-failure only applies once retries are exhausted.
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "message" : "0001-test-plugin",
+           "retry-count" : 3,
+           "retry-interval" : 1,
+           "fail-attempts" : 2,
+           "halt-on-failure" : true,
+           "message-file" : "/etc/ztp.results"
+        },
+        "0002-test-plugin": {
+           "message" : "0002-test-plugin",
+           "retry-count" : 1,
+           "retry-interval" : 1,
+           "message-file" : "/etc/ztp.results",
+           "fail" : true
+        }
+    }
+}"""
+        expected_result = """0001-test-plugin
+0002-test-plugin
+0001-test-plugin
+0002-test-plugin
+0001-test-plugin
+"""
+        self.__init_ztp_data()
+
+        runCommand("systemctl stop ztp")
+        self.cfgSet('monitor-startup-config', False)
+        self.cfgSet('restart-ztp-no-config', False)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        result = self.__read_file("/etc/ztp.results")
+        assert(result == expected_result)
+        os.remove("/tmp/ztp_input.json")
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json-shadow'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'FAILED')
+        section = jsonDict.get('ztp').get('0001-test-plugin')
+        assert(section.get('status') == 'SUCCESS')
+        assert(len(section.get('retries')) == 2)
+        assert(section.get('retries')[0].get('exit-code') == 1)
+        assert(section.get('retries')[0].get('duration') >= 0)
+        assert(section.get('error') is None)
+        section = jsonDict.get('ztp').get('0002-test-plugin')
+        assert(section.get('status') == 'FAILED')
+        assert(len(section.get('retries')) == 1)
+        assert(section.get('error') == 'Plugin failed')
+        self.cfgSet('monitor-startup-config', True)
+        self.cfgSet('restart-ztp-no-config', True)
+
     def test_ztp_json_failed(self):
         '''!
           Simple ZTP test with 3-sections, Failure in 2 sections, ZTP Failed
@@ -1107,6 +1212,49 @@ exit 0
         self.cfgSet('restart-ztp-no-config', True)
 
 
+    def test_discovery_concurrent(self):
+
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        self.cfgSet('restart-ztp-no-config', False)
+        self.cfgSet('curl-timeout', 10)
+        self.cfgSet('curl-retries', 1)
+        self.__write_file('/tmp/dhcp-opt67', '{"ztp":{"0002-test-plugin":{"message" : "0002-test-plugin","message-file" : "/etc/ztp.results"}}}')
+        self.__write_file('/tmp/dhcp6-opt59', '{"ztp":{"0003-test-plugin":{"message" : "0003-test-plugin","message-file" : "/etc/ztp.results"}}}')
+
+        # Lower precedence source which can not be reached does not delay ZTP
+        self.__write_file(self.cfgGet('opt67-url'), 'file:///tmp/dhcp-opt67')
+        self.__write_file(self.cfgGet('opt59-v6-url'), 'http://10.255.255.1:2000/dhcp6-opt59')
+        _start = time.time()
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        assert(time.time() - _start < 10)
+        result = self.__read_file("/etc/ztp.results")
+        assert(result == "0002-test-plugin\n")
+        assert(os.path.isfile(self.cfgGet('ztp-json-opt59')) is False)
+
+        # Lower precedence source is used only after higher precedence source has failed
+        self.__init_ztp_data()
+        self.__write_file(self.cfgGet('opt67-url'), 'http://10.255.255.1:2000/dhcp-opt67')
+        self.__write_file(self.cfgGet('opt59-v6-url'), 'file:///tmp/dhcp6-opt59')
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        result = self.__read_file("/etc/ztp.results")
+        assert(result == "0003-test-plugin\n")
+        assert(os.path.isfile(self.cfgGet('ztp-json-opt67')) is False)
+
+        # Both sources are available
+        self.__init_ztp_data()
+        self.__write_file(self.cfgGet('opt67-url'), 'file:///tmp/dhcp-opt67')
+        self.__write_file(self.cfgGet('opt59-v6-url'), 'file:///tmp/dhcp6-opt59')
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        result = self.__read_file("/etc/ztp.results")
+        assert(result == "0002-test-plugin\n")
+
+        runCommand("rm -f /tmp/dhcp-opt67 /tmp/dhcp6-opt59")
+        self.cfgSet('curl-timeout', 30)
+        self.cfgSet('curl-retries', 3)
+        self.cfgSet('monitor-startup-config', True)
+        self.cfgSet('restart-ztp-no-config', True)
+
     ## Invalid input json
     def test_invalid_json(self):
 
@@ -1509,6 +1657,106 @@ exit 0
         self.cfgSet('monitor-startup-config', True)
         self.cfgSet('restart-ztp-no-config', True)
 
+    def test_ztp_deferred_reboot(self):
+        '''!
+          Simple ZTP test with reboots deferred till a reboot barrier
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "plugin" : "test-plugin",
+           "message" : "0001-test-plugin",
+           "message-file" : "/etc/ztp.results",
+           "reboot-in-between" : true
+        },
+        "0002-test-plugin": {
+           "plugin" : "test-plugin",
+           "message" : "0002-test-plugin",
+           "message-file" : "/etc/ztp.results",
+           "reboot-on-success" : true,
+           "safe-before-reboot" : true
+        },
+        "0003-test-plugin": {
+           "plugin" : "test-plugin",
+           "message" : "0003-test-plugin",
+           "message-file" : "/etc/ztp.results"
+        },
+        "deferred-reboot" : true
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        self.cfgSet('restart-ztp-no-config', False)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+
+        # Single reboot before processing the configuration section which is not safe-before-reboot
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'IN-PROGRESS')
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0002-test-plugin').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0003-test-plugin').get('status') == 'BOOT')
+
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0003-test-plugin').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('pending-reboot') is None)
+
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)
+        self.cfgSet('restart-ztp-no-config', True)
+
+    def test_ztp_skip_unchanged(self):
+        '''!
+          Simple ZTP test with unchanged configuration sections skipped, but processed again after 'ztp run'
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "plugin" : "test-plugin",
+           "message" : "0001-test-plugin",
+           "message-file" : "/etc/ztp.results"
+        }
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        self.cfgSet('restart-ztp-no-config', False)
+        self.cfgSet('skip-unchanged', True)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('skipped-unchanged') is None)
+
+        # Configuration section is skipped if neither it nor the device state has changed
+        os.remove("/etc/ztp.results")
+        runCommand(COVERAGE + ZTP_CMD + " erase -y")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('skipped-unchanged') == True)
+        assert(os.path.isfile("/etc/ztp.results") == False)
+
+        # 'ztp run' moves the startup configuration away, configuration section is processed again
+        runCommand(COVERAGE + ZTP_CMD + " erase -y")
+        os.rename(getCfg('config-db-json'), getCfg('config-db-json')+'.orig')
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json'), indent=4)
+        assert(jsonDict.get('ztp').get('status') == 'SUCCESS')
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('skipped-unchanged') is None)
+        assert(os.path.isfile("/etc/ztp.results") == True)
+        os.rename(getCfg('config-db-json')+'.orig', getCfg('config-db-json'))
+
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('skip-unchanged', False)
+        self.cfgSet('monitor-startup-config', True)
+        self.cfgSet('restart-ztp-no-config', True)
+
     def test_ztp_restart_ztp_on_invalid_data(self):
         '''!
           Simple ZTP test with reboot-on success
@@ -2165,6 +2413,11 @@ exit 0
         assert('ZTP Status     : Not Started' in output)
         (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status -c')
         assert('2:ACTIVE-DISCOVERY' == output[0])
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --json')
+        status = json.loads('\n'.join(output))
+        assert(status.get('service').get('active') is True)
+        assert(status.get('status-code') == '2:ACTIVE-DISCOVERY')
+        assert(status.get('status') == 'BOOT')
         self.__write_file("/tmp/ztp_input.json", content)
         self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
         os.system("mkdir -p "+self.cfgGet("ztp-run-dir") +"/ztp.lock")
@@ -2178,7 +2431,14 @@ exit 0
         assert('ZTP Status     : IN-PROGRESS' in output)
         (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status -c')
         assert('4:IN-PROGRESS' == output[0])
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --json')
+        status = json.loads('\n'.join(output))
+        assert(status.get('service').get('active') is True and status.get('service').get('pid') is not None)
+        assert(status.get('status') == 'IN-PROGRESS')
+        assert(list(status.get('sections').keys()) == ['0001-test-plugin'])
         os.system("systemctl stop ztp")
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --json')
+        assert(json.loads('\n'.join(output)).get('service').get('active') is False)
         (rc, output, err) = runCommand(COVERAGE + ZTP_CMD)
         assert(rc != 0)
         (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' foo')
@@ -2191,3 +2451,207 @@ exit 0
         self.cfgSet('restart-ztp-interval', 300)
         self.cfgSet('discovery-interval', _discover_interval)
         os.system("rm -rf "+self.cfgGet("ztp-run-dir")+"/ztp.lock")
+
+    def test_ztp_section_timing(self):
+        '''!
+          Test per configuration section timing and resource usage information
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "sleep" : "2"
+        },
+        "0002-test-plugin": {
+           "fail" : true
+        },
+        "restart-ztp-no-config" : false
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-json-shadow'), indent=4)
+        for sec in ['0001-test-plugin', '0002-test-plugin']:
+            section = jsonDict.get('ztp').get(sec)
+            timing = section.get('timing')
+            assert(timing is not None)
+            assert(timing.get('plugin-resolve') >= 0)
+            assert(timing.get('status-persist') > 0)
+            usage = section.get('rusage')
+            assert(usage is not None)
+            assert(usage.get('max-rss') > 0)
+            assert(usage.get('user-cpu') >= 0 and usage.get('sys-cpu') >= 0)
+        assert(jsonDict.get('ztp').get('0001-test-plugin').get('timing').get('plugin-exec') >= 2)
+
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --timing')
+        assert(rc == 0)
+        assert(self.__search_cmd_output(output, 'Max RSS(KB)'))
+        assert(self.__search_cmd_output(output, '0001-test-plugin'))
+        assert(self.__search_cmd_output(output, '0002-test-plugin'))
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status -v')
+        assert(self.__search_cmd_output(output, 'Plugin Exec     : '))
+        assert(self.__search_cmd_output(output, 'CPU (user/sys)  : '))
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)
+
+    def test_ztp_timeline(self):
+        '''!
+          Test milestones recorded in ZTP session timeline
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "sleep" : "1"
+        },
+        "restart-ztp-no-config" : false
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+
+        objJson, jsonDict = JsonReader(self.cfgGet('ztp-timeline'), indent=4)
+        events = [e.get('event') for e in jsonDict.get('timeline')]
+        assert(events == ['service-start', 'dhcp-option', 'ztp-json-downloaded', 'section-start', 'section-end', 'ztp-completed'])
+        boot_times = [e.get('boot-time') for e in jsonDict.get('timeline')]
+        assert(boot_times == sorted(boot_times))
+        assert(jsonDict.get('timeline')[4].get('detail') == '0001-test-plugin SUCCESS')
+
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --timeline')
+        assert(rc == 0)
+        assert(self.__search_cmd_output(output, 'Since Boot(s)'))
+        assert(self.__search_cmd_output(output, 'ztp-json-downloaded'))
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --timeline --json')
+        assert(rc == 0)
+        timeline = json.loads('\n'.join(output)).get('timeline')
+        assert(len(timeline) == 6)
+        assert(timeline[0].get('boot') == 1 and timeline[1].get('delta') >= 0)
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status -v')
+        assert(self.__search_cmd_output(output, 'Recent Activity :'))
+        assert(self.__search_cmd_output(output, 'Processing configuration section 0001-test-plugin'))
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)
+
+    def test_ztp_metrics(self):
+        '''!
+          Test ZTP metrics exported for Prometheus node exporter textfile collector
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "fail" : true
+        },
+        "restart-ztp-no-config" : false
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        metrics_file = self.cfgGet('metrics-file')
+        if os.path.isdir(os.path.dirname(metrics_file)) is False:
+            os.makedirs(os.path.dirname(metrics_file))
+        if os.path.isfile(metrics_file):
+            os.remove(metrics_file)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+
+        with open(metrics_file) as fh:
+            lines = fh.read().splitlines()
+        assert('# TYPE ztp_discovery_iterations_total counter' in lines)
+        assert('ztp_downloads_total{result="success"} 1' in lines)
+        assert('ztp_download_duration_seconds_count{result="success"} 1' in lines)
+        assert('ztp_plugin_exit_codes_total{code="1",section="0001-test-plugin"} 1' in lines)
+        assert(len([l for l in lines if l.startswith('ztp_section_duration_seconds{section="0001-test-plugin"}')]) == 1)
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)
+
+    def test_ztp_trace(self):
+        '''!
+          Test trace spans recorded for engine phases and plugins
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+        },
+        "restart-ztp-no-config" : false
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        if os.path.isfile(self.cfgGet('trace-file')):
+            os.remove(self.cfgGet('trace-file'))
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        runCommand(COVERAGE + ZTP_ENGINE_CMD)
+
+        from ztp.Tracer import readSpans
+        spans = readSpans(self.cfgGet('trace-file'))
+        by_name = dict()
+        for s in spans:
+            by_name.setdefault(s.get('name'), []).append(s)
+        for name in ['discovery-iteration', 'discover', 'download', 'process-ztp-json', 'section', 'command']:
+            assert(by_name.get(name) is not None)
+        assert(len(set([s.get('trace_id') for s in spans])) == 1)
+        section = by_name.get('section')[0]
+        assert(section.get('attributes').get('section') == '0001-test-plugin')
+        assert(section.get('attributes').get('result') == 'SUCCESS')
+        assert(section.get('parent_span_id') == by_name.get('process-ztp-json')[0].get('span_id'))
+        plugin = [s for s in by_name.get('command') if s.get('parent_span_id') == section.get('span_id')]
+        assert(len(plugin) == 1)
+        assert('test-plugin' in plugin[0].get('attributes').get('command'))
+
+        (rc, output, err) = runCommand('python3 -m ztp.Tracer ' + self.cfgGet('trace-file'))
+        assert(rc == 0)
+        trace = json.loads('\n'.join(output))
+        assert(len(trace.get('traceEvents')) == len(spans))
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)
+
+    def test_ztp_status_watch(self):
+        '''!
+          Test ZTP status and events served on the status socket
+        '''
+        content = """{
+    "ztp": {
+        "0001-test-plugin": {
+           "sleep" : "3"
+        },
+        "restart-ztp-no-config" : false
+    }
+}"""
+        self.__init_ztp_data()
+        self.cfgSet('monitor-startup-config', False)
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --watch')
+        assert(rc != 0)
+        assert('ZTP Service is not running' in output)
+        self.__write_file("/tmp/ztp_input.json", content)
+        self.__write_file(self.cfgGet("opt67-url"), "file:///tmp/ztp_input.json")
+        engine = subprocess.Popen(COVERAGE + ZTP_ENGINE_CMD, shell=True)
+        count = 20
+        while count > 0 and os.path.exists(self.cfgGet('ztp-status-socket')) is False:
+            time.sleep(0.5)
+            count -= 1
+        assert(os.path.exists(self.cfgGet('ztp-status-socket')))
+
+        from ztp.StatusServer import query
+        state = query({'request': 'state'})
+        assert(state.get('pid') is not None)
+        assert(query({'request': 'downloads'}) is not None)
+
+        (rc, output, err) = runCommand(COVERAGE + ZTP_CMD + ' status --watch --json')
+        engine.wait()
+        assert(rc == 0)
+        events = [json.loads(l) for l in output if l.strip() != '']
+        assert(events[0].get('event') == 'state')
+        names = [e.get('event') for e in events]
+        assert('activity' in names)
+        assert({'section': '0001-test-plugin', 'status': 'SUCCESS', 'exit-code': 0} in [e.get('data') for e in events])
+        assert([e.get('data').get('status') for e in events if e.get('event') == 'ztp-status'][-1] == 'SUCCESS')
+        assert(os.path.exists(self.cfgGet('ztp-status-socket')) is False)
+        os.remove("/tmp/ztp_input.json")
+        self.cfgSet('monitor-startup-config', True)